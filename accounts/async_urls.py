@@ -0,0 +1,14 @@
+from django.urls import path
+
+from .async_views import user_login
+from .urls import urlpatterns as sync_urlpatterns
+
+
+app_name = 'accounts'
+
+urlpatterns = [
+    path("login/", user_login, name="user_login"),
+] + [
+    pattern for pattern in sync_urlpatterns
+    if pattern.name != 'user_login'
+]
@@ -0,0 +1,72 @@
+"""
+Async login view, served under ASGI (see ``banking_system/asgi_urls.py``).
+
+The password is checked in the hashing pool, so a login does not hold
+up the event loop, nor the one thread Django 3.2 runs every
+``sync_to_async`` call of the process in.
+"""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import login
+from django.contrib.auth.forms import AuthenticationForm
+from django.http import HttpResponseRedirect
+from django.shortcuts import resolve_url
+from django.template.response import TemplateResponse
+from django.utils.http import url_has_allowed_host_and_scheme
+
+from .backends import aauthenticate, aget_user
+from .views import UserLoginView
+
+
+class PreAuthenticatedForm(AuthenticationForm):
+    """
+    Login form whose credentials were checked beforehand, by
+    ``aauthenticate``, instead of in ``clean``.
+    """
+
+    def __init__(self, user, *args, **kwargs):
+        self.authenticated_user = user
+        super().__init__(*args, **kwargs)
+
+    def clean(self):
+        if self.authenticated_user is None:
+            raise self.get_invalid_login_error()
+        self.user_cache = self.authenticated_user
+        self.confirm_login_allowed(self.user_cache)
+        return self.cleaned_data
+
+
+def success_url(request):
+    redirect_to = request.POST.get('next', request.GET.get('next', ''))
+    if url_has_allowed_host_and_scheme(
+        redirect_to, allowed_hosts={request.get_host()},
+        require_https=request.is_secure()
+    ):
+        return redirect_to
+    return resolve_url(settings.LOGIN_REDIRECT_URL)
+
+
+async def user_login(request):
+    if (await aget_user(request)).is_authenticated:
+        return HttpResponseRedirect(success_url(request))
+
+    if request.method == 'POST':
+        username = request.POST.get('username')
+        password = request.POST.get('password')
+        user = None
+        if username and password:
+            user = await aauthenticate(username, password)
+
+        form = PreAuthenticatedForm(user, request, data=request.POST)
+        if form.is_valid():
+            await sync_to_async(login)(
+                request, form.get_user(),
+                backend='accounts.backends.AccountBackend'
+            )
+            return HttpResponseRedirect(success_url(request))
+    else:
+        form = AuthenticationForm(request)
+
+    return TemplateResponse(request, UserLoginView.template_name, {
+        'form': form,
+    })
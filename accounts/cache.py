@@ -0,0 +1,223 @@
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+
+BALANCE_GENERATION_KEY = 'balance:generation'
+ACCOUNT_TYPES_VERSION_KEY = 'account_types:version'
+
+
+class CacheStats:
+    """
+    Process wide hit/miss counters of a cache.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+    def hit(self):
+        with self._lock:
+            self.hits += 1
+
+    def miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
+
+
+balance_cache_stats = CacheStats()
+
+
+def _version_key(user_id):
+    return f'balance:{user_id}:version'
+
+
+def _balance_key(user_id, generation, version):
+    return f'balance:{user_id}:{generation}:{version}'
+
+
+def _incr(key):
+    """
+    Atomically increment a counter key, creating it if needed.
+
+    New counters start from the current time in milliseconds, so a
+    counter that was evicted never hands out a number it used before.
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        return cache.incr(key)
+
+
+def _current(key):
+    """
+    Value of a counter key, creating it if needed.
+    """
+    value = cache.get(key)
+    if value is None:
+        cache.add(key, int(time.time() * 1000), timeout=None)
+        value = cache.get(key)
+    return value
+
+
+def get_balance(user_id):
+    """
+    Balance of the account of ``user_id``, served from the cache when
+    ``BALANCE_CACHE_ENABLED``.
+
+    Balances are cached under a key that contains the account's
+    version, which every posting bumps, so a balance read after a
+    posting has committed never comes from before it. Misses are read
+    from the primary even in read-only views: a lagging replica's
+    balance would be cached under the current version.
+    """
+    from accounts.models import UserBankAccount
+
+    def read():
+        return UserBankAccount.objects.using('default').filter(
+            user_id=user_id
+        ).values_list('balance', flat=True).first()
+
+    if not settings.BALANCE_CACHE_ENABLED:
+        balance = read()
+        return 0 if balance is None else balance
+
+    key = _balance_key(
+        user_id,
+        _current(BALANCE_GENERATION_KEY),
+        _current(_version_key(user_id))
+    )
+
+    balance = cache.get(key)
+    if balance is not None:
+        balance_cache_stats.hit()
+        return balance
+
+    balance_cache_stats.miss()
+    balance = read()
+    if balance is None:
+        return 0
+    # add() never overwrites a value written through by a posting
+    cache.add(key, balance, settings.BALANCE_CACHE_TIMEOUT)
+    return balance
+
+
+def write_through_balance(user_id, balance):
+    """
+    Publish the new balance of a posting.
+
+    Must be called inside the posting's transaction, after the balance
+    update: the version is bumped while the account row is locked, so
+    versions follow commit order, and the value is stored once the
+    transaction has committed.
+    """
+    if not settings.BALANCE_CACHE_ENABLED:
+        return
+
+    key = _balance_key(
+        user_id,
+        _current(BALANCE_GENERATION_KEY),
+        _incr(_version_key(user_id))
+    )
+    transaction.on_commit(
+        lambda: cache.set(key, balance, settings.BALANCE_CACHE_TIMEOUT)
+    )
+
+
+def invalidate_balance(user_id):
+    """
+    Drop the cached balance of ``user_id`` once the current
+    transaction commits.
+    """
+    transaction.on_commit(lambda: _incr(_version_key(user_id)))
+
+
+def invalidate_all_balances():
+    """
+    Drop every cached balance once the current transaction commits.
+
+    Used by bulk writers (interest runs, imports) that change many
+    balances at once.
+    """
+    transaction.on_commit(lambda: _incr(BALANCE_GENERATION_KEY))
+
+
+_account_types = {'version': None, 'loaded': 0.0, 'types': {}}
+_account_types_lock = threading.Lock()
+
+
+def account_types():
+    """
+    ``{pk: BankAccountType}`` of every account type, from a process
+    local copy.
+
+    The copy is reloaded when the shared version key changes, which
+    every save or delete of an account type bumps, so other processes
+    pick up changes on their next lookup. With a cache that is not
+    shared between processes, such as the default local memory cache,
+    other processes only see a change once their copy is
+    ``ACCOUNT_TYPES_MAX_AGE`` seconds old. The instances are shared
+    between threads and must not be modified.
+    """
+    from accounts.models import BankAccountType
+
+    def stale():
+        return (
+            _account_types['version'] != version or
+            time.monotonic() - _account_types['loaded'] >
+            settings.ACCOUNT_TYPES_MAX_AGE
+        )
+
+    version = _current(ACCOUNT_TYPES_VERSION_KEY)
+    if stale():
+        with _account_types_lock:
+            if stale():
+                _account_types['types'] = BankAccountType.objects.in_bulk()
+                _account_types['version'] = version
+                _account_types['loaded'] = time.monotonic()
+    return _account_types['types']
+
+
+def get_account_type(pk):
+    """
+    The ``BankAccountType`` with primary key ``pk``, without a query
+    once the account types are cached.
+    """
+    from accounts.models import BankAccountType
+
+    try:
+        return account_types()[pk]
+    except KeyError:
+        # Created by a transaction that has not bumped the version yet
+        return BankAccountType.objects.get(pk=pk)
+
+
+def invalidate_account_types():
+    """
+    Reload the account types in this process right away and in every
+    process once the current transaction commits.
+    """
+    def bump():
+        _account_types['version'] = None
+        _incr(ACCOUNT_TYPES_VERSION_KEY)
+
+    _account_types['version'] = None
+    transaction.on_commit(bump)
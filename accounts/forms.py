@@ -1,11 +1,53 @@
 from django import forms
-from django.conf import settings
 from django.contrib.auth.forms import UserCreationForm
+from django.core.exceptions import ValidationError
 from django.db import transaction
+from django.forms.models import ModelChoiceIterator
+from .cache import account_types
+from .hashing import make_password
+from .numbers import account_numbers
 from .models import User, BankAccountType, UserBankAccount, UserAddress
 from .constants import GENDER_CHOICE
 
 
+class AccountTypeChoiceIterator(ModelChoiceIterator):
+
+    def __iter__(self):
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for _, account_type in sorted(account_types().items()):
+            yield self.choice(account_type)
+
+    def __len__(self):
+        return len(account_types()) + (self.field.empty_label is not None)
+
+    def __bool__(self):
+        return self.field.empty_label is not None or bool(account_types())
+
+
+class AccountTypeChoiceField(forms.ModelChoiceField):
+    """
+    Account type choice served from the cached account types, so
+    rendering and validating it costs no queries.
+    """
+    iterator = AccountTypeChoiceIterator
+
+    def __init__(self, **kwargs):
+        super().__init__(queryset=BankAccountType.objects.none(), **kwargs)
+
+    def to_python(self, value):
+        if value in self.empty_values:
+            return None
+        try:
+            return account_types()[int(value)]
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+
+
 class UserAddressForm(forms.ModelForm):
 
     class Meta:
@@ -32,9 +74,7 @@ class UserAddressForm(forms.ModelForm):
 
 
 class UserRegistrationForm(UserCreationForm):
-    account_type = forms.ModelChoiceField(
-        queryset=BankAccountType.objects.all()
-    )
+    account_type = AccountTypeChoiceField()
     gender = forms.ChoiceField(choices=GENDER_CHOICE)
     birth_date = forms.DateField()
 
@@ -62,24 +102,26 @@ class UserRegistrationForm(UserCreationForm):
                 )
             })
 
-    @transaction.atomic
     def save(self, commit=True):
-        user = super().save(commit=False)
-        user.set_password(self.cleaned_data["password1"])
+        # Skips UserCreationForm.save, which would hash the password a
+        # second time
+        user = super(UserCreationForm, self).save(commit=False)
+        user.password = make_password(self.cleaned_data["password1"])
         if commit:
-            user.save()
+            # Allocated before the transaction starts, so the number can
+            # come from the process's block of numbers
+            account_no = account_numbers.allocate()
             account_type = self.cleaned_data.get('account_type')
             gender = self.cleaned_data.get('gender')
             birth_date = self.cleaned_data.get('birth_date')
 
-            UserBankAccount.objects.create(
-                user=user,
-                gender=gender,
-                birth_date=birth_date,
-                account_type=account_type,
-                account_no=(
-                    user.id +
-                    settings.ACCOUNT_NUMBER_START_FROM
+            with transaction.atomic():
+                user.save()
+                UserBankAccount.objects.create(
+                    user=user,
+                    gender=gender,
+                    birth_date=birth_date,
+                    account_type=account_type,
+                    account_no=account_no
                 )
-            )
         return user
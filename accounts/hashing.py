@@ -0,0 +1,95 @@
+"""
+Password hashing in a bounded pool of threads.
+
+Hashing is deliberately slow CPU work. Running it in at most
+``PASSWORD_HASHING_WORKERS`` threads per process keeps a burst of
+logins from starving every other request of CPU, and lets async views
+hash without blocking the event loop or the single thread Django 3.2
+runs every ``sync_to_async`` call in. The hashers release the GIL
+(hashlib's PBKDF2, argon2-cffi, bcrypt), so the threads do hash in
+parallel.
+
+Stored hashes made by another hasher than the preferred one of
+``PASSWORD_HASHER_PROFILE``, or with older cost settings, are replaced
+on the next successful check.
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def hashing_pool():
+    global _pool, _pool_pid
+
+    with _lock:
+        # A forked worker can not use the threads of its parent
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ThreadPoolExecutor(
+                max_workers=(
+                    settings.PASSWORD_HASHING_WORKERS or os.cpu_count()
+                ),
+                thread_name_prefix='password-hashing'
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def make_password(password):
+    return hashing_pool().submit(hashers.make_password, password).result()
+
+
+def _verify(user, password):
+    """
+    ``(valid, new_hash)``: whether ``password`` matches the stored hash
+    of ``user`` and, when the stored hash is outdated, its replacement.
+    """
+    upgraded = []
+    valid = hashers.check_password(
+        password, user.password,
+        setter=lambda password: upgraded.append(
+            hashers.make_password(password)
+        )
+    )
+    return valid, upgraded[0] if upgraded else None
+
+
+def _save_upgrade(user, new_hash):
+    user.password = new_hash
+    user.save(update_fields=['password'])
+
+
+def check_password(user, password):
+    """
+    Check ``password`` against ``user``'s hash in the hashing pool and
+    upgrade an outdated hash. The upgrade is saved from the calling
+    thread, on its database connection.
+    """
+    valid, new_hash = hashing_pool().submit(_verify, user, password).result()
+    if new_hash:
+        _save_upgrade(user, new_hash)
+    return valid
+
+
+async def amake_password(password):
+    return await asyncio.get_running_loop().run_in_executor(
+        hashing_pool(), hashers.make_password, password
+    )
+
+
+async def acheck_password(user, password):
+    valid, new_hash = await asyncio.get_running_loop().run_in_executor(
+        hashing_pool(), _verify, user, password
+    )
+    if new_hash:
+        await sync_to_async(_save_upgrade)(user, new_hash)
+    return valid
@@ -0,0 +1,71 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.onboarding import onboard
+from transactions.importer import read_rows
+
+
+class Command(BaseCommand):
+    help = (
+        'Open accounts for a CSV or NDJSON file of customers, with the '
+        'columns email, first_name, last_name, password (may be empty), '
+        'account_type (id or name), gender, birth_date, street_address, '
+        'city, postal_code and country'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to onboard')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'],
+            help='File format, guessed from the extension by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='Customers validated and written per transaction'
+        )
+        parser.add_argument(
+            '--workers', type=int,
+            help='Processes hashing passwords, 0 hashes in this process'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=100,
+            help='Abort after this many invalid rows'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+        )
+
+        created = 0
+        failed = 0
+        started = time.perf_counter()
+
+        with open(path, newline='') as f:
+            for count, errors in onboard(
+                read_rows(f, file_format),
+                batch_size=options['batch_size'],
+                workers=options['workers']
+            ):
+                created += count
+                failed += len(errors)
+
+                for error in errors:
+                    self.stderr.write(str(error))
+                if failed > options['max_errors']:
+                    raise CommandError(
+                        f'Aborted after {failed} invalid rows '
+                        f'({created} customers onboarded)'
+                    )
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{created} customers onboarded, {failed} rejected '
+                    f'({created / elapsed:.0f} customers/sec)'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Onboarded {created} customers, rejected {failed}'
+        ))
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.7 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='userbankaccount',
+            index=models.Index(condition=models.Q(('balance__gt', 0), ('initial_deposit_date__isnull', False)), fields=['interest_start_date'], name='account_interest_due_idx'),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.7 on 2026-10-18 15:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_account_interest_due_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AccountNumberSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('next_serial', models.PositiveBigIntegerField()),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='userbankaccount',
+            name='account_no',
+            field=models.PositiveBigIntegerField(unique=True),
+        ),
+    ]
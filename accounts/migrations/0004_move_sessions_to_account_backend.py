@@ -0,0 +1,36 @@
+from django.contrib.auth import BACKEND_SESSION_KEY
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import migrations
+from django.utils import timezone
+
+
+OLD_BACKEND = 'django.contrib.auth.backends.ModelBackend'
+NEW_BACKEND = 'accounts.backends.AccountBackend'
+
+
+def move_sessions(apps, schema_editor):
+    # Sessions name the backend that logged them in, and are only
+    # valid while it stays in AUTHENTICATION_BACKENDS
+    Session = apps.get_model('sessions', 'Session')
+    sessions = Session.objects.using(schema_editor.connection.alias)
+    store = SessionStore()
+
+    for session in sessions.filter(expire_date__gt=timezone.now()).iterator():
+        data = store.decode(session.session_data)
+        if data.get(BACKEND_SESSION_KEY) == OLD_BACKEND:
+            data[BACKEND_SESSION_KEY] = NEW_BACKEND
+            sessions.filter(pk=session.pk).update(
+                session_data=store.encode(data)
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_account_number_sequence'),
+        ('sessions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(move_sessions, migrations.RunPython.noop),
+    ]
@@ -7,6 +7,7 @@ from django.core.validators import (
 )
 from django.db import models
 
+from .cache import get_balance
 from .constants import GENDER_CHOICE
 from .managers import UserManager
 
@@ -27,9 +28,7 @@ class User(AbstractUser):
 
     @property
     def balance(self):
-        if hasattr(self, 'account'):
-            return self.account.balance
-        return 0
+        return get_balance(self.pk)
 
 
 
@@ -68,6 +67,18 @@ class BankAccountType(models.Model):
 
         return round(interest, 2)
 
+    def calculate_interest_batch(self, principals):
+        """
+        Calculate interest for many principals at once.
+
+        Returns the same values as calling ``calculate_interest`` on
+        each principal, but the periodic rate is worked out only once.
+        """
+        factor = 1 + ((self.annual_interest_rate / 100) /
+                      Decimal(self.interest_calculation_per_year))
+
+        return [round((p * factor) - p, 2) for p in principals]
+
 
 class UserBankAccount(models.Model):
     user = models.OneToOneField(
@@ -80,7 +91,7 @@ class UserBankAccount(models.Model):
         related_name='accounts',
         on_delete=models.CASCADE
     )
-    account_no = models.PositiveIntegerField(unique=True)
+    account_no = models.PositiveBigIntegerField(unique=True)
     gender = models.CharField(max_length=1, choices=GENDER_CHOICE)
     birth_date = models.DateField(null=True, blank=True)
     balance = models.DecimalField(
@@ -99,6 +110,20 @@ class UserBankAccount(models.Model):
     def __str__(self):
         return str(self.account_no)
 
+    class Meta:
+        indexes = [
+            # Only accounts that can earn interest are indexed, which
+            # keeps the month-end scan small.
+            models.Index(
+                fields=['interest_start_date'],
+                condition=models.Q(
+                    balance__gt=0,
+                    initial_deposit_date__isnull=False
+                ),
+                name='account_interest_due_idx'
+            ),
+        ]
+
     def get_interest_calculation_months(self):
         """
         List of month numbers for which the interest will be calculated
@@ -112,6 +137,19 @@ class UserBankAccount(models.Model):
         return [i for i in range(start, 13, interval)]
 
 
+class AccountNumberSequence(models.Model):
+    """
+    Hi/lo counter of account number serials, a single row.
+
+    Processes reserve blocks of serials from it and hand out numbers
+    from their block, see ``accounts.numbers``.
+    """
+    next_serial = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return str(self.next_serial)
+
+
 class UserAddress(models.Model):
     user = models.OneToOneField(
         User,
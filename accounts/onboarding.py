@@ -0,0 +1,289 @@
+import json
+import os
+import secrets
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+
+import django
+from django import forms
+from django.conf import settings
+from django.contrib.auth.hashers import UNUSABLE_PASSWORD_PREFIX, make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+
+from transactions.importer import RowError, batches
+
+from .cache import account_types
+from .constants import GENDER_CHOICE
+from .forms import AccountTypeChoiceField
+from .models import User, UserAddress, UserBankAccount
+from .numbers import account_numbers
+
+
+# Fields of a customer row. They are shared by every row instead of
+# copied per row by a Form, which would cost more than the validation.
+CUSTOMER_FIELDS = {
+    'email': forms.EmailField(max_length=254),
+    'first_name': forms.CharField(max_length=30),
+    'last_name': forms.CharField(max_length=30),
+    # May be left empty, the customer then sets one with a password reset
+    'password': forms.CharField(required=False, strip=False),
+    'account_type': AccountTypeChoiceField(),
+    'gender': forms.ChoiceField(choices=GENDER_CHOICE),
+    'birth_date': forms.DateField(),
+    'street_address': forms.CharField(max_length=512),
+    'city': forms.CharField(max_length=256),
+    'postal_code': forms.IntegerField(min_value=0),
+    'country': forms.CharField(max_length=256),
+}
+
+
+def clean_customer(data):
+    """
+    ``(cleaned_data, errors)`` of one customer row, ``errors`` mapping
+    field names to messages.
+    """
+    cleaned_data = {}
+    errors = {}
+    for name, field in CUSTOMER_FIELDS.items():
+        try:
+            cleaned_data[name] = field.clean(data.get(name, ''))
+        except ValidationError as e:
+            errors[name] = e.messages
+
+    if 'email' in cleaned_data:
+        cleaned_data['email'] = User.objects.normalize_email(
+            cleaned_data['email']
+        )
+        if cleaned_data.get('password'):
+            try:
+                validate_password(cleaned_data['password'], User(
+                    email=cleaned_data['email'],
+                    first_name=cleaned_data.get('first_name', ''),
+                    last_name=cleaned_data.get('last_name', ''),
+                ))
+            except ValidationError as e:
+                errors['password'] = e.messages
+    return cleaned_data, errors
+
+
+def account_type_ids():
+    """
+    Account type ids by id and by lower case name, so files can use
+    either.
+    """
+    ids = {}
+    for pk, account_type in account_types().items():
+        ids[str(pk)] = pk
+        ids[account_type.name.lower()] = pk
+    return ids
+
+
+def validate_batch(rows, seen_emails):
+    """
+    Validate one batch of ``(line_number, row)`` pairs.
+
+    Emails are checked against the database in one query and against
+    ``seen_emails``, the emails of the earlier batches, which is
+    updated. Returns ``(customers, errors)`` with ``(line_number,
+    cleaned_data)`` pairs of the valid rows.
+    """
+    type_ids = account_type_ids()
+    candidates = []
+    errors = []
+
+    for line, row in rows:
+        try:
+            if isinstance(row, str):
+                row = json.loads(row)
+            data = {
+                key: '' if value is None else str(value).strip()
+                for key, value in row.items()
+            }
+        except (AttributeError, ValueError) as e:
+            errors.append(RowError(line, str(e)))
+            continue
+
+        account_type = data.get('account_type', '').lower()
+        data['account_type'] = type_ids.get(account_type, account_type)
+        customer, field_errors = clean_customer(data)
+        if field_errors:
+            errors.append(RowError(line, '; '.join(
+                f'{field}: {" ".join(messages)}'
+                for field, messages in field_errors.items()
+            )))
+            continue
+        candidates.append((line, customer))
+
+    registered = set(User.objects.filter(
+        email__in=[customer['email'] for _, customer in candidates]
+    ).values_list('email', flat=True))
+
+    customers = []
+    for line, customer in candidates:
+        if customer['email'] in registered or customer['email'] in seen_emails:
+            errors.append(RowError(
+                line, f'email {customer["email"]} is already registered'
+            ))
+            continue
+        seen_emails.add(customer['email'])
+        customers.append((line, customer))
+
+    return customers, sorted(errors, key=lambda error: error.line)
+
+
+def create_batch(customers, password_hashes):
+    """
+    Insert the users, accounts and addresses of one validated batch
+    with a ``bulk_create`` per model, in one transaction. Returns the
+    number of customers created.
+    """
+    if not customers:
+        return 0
+
+    numbers = account_numbers.reserve(len(customers))
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            User(
+                email=customer['email'],
+                first_name=customer['first_name'],
+                last_name=customer['last_name'],
+                password=password_hash
+            )
+            for customer, password_hash in zip(customers, password_hashes)
+        )
+        # bulk_create does not return primary keys on every backend
+        user_ids = dict(User.objects.filter(
+            email__in=[customer['email'] for customer in customers]
+        ).values_list('email', 'pk'))
+
+        UserBankAccount.objects.bulk_create(
+            UserBankAccount(
+                user_id=user_ids[customer['email']],
+                account_type=customer['account_type'],
+                account_no=account_no,
+                gender=customer['gender'],
+                birth_date=customer['birth_date']
+            )
+            for customer, account_no in zip(customers, numbers)
+        )
+        UserAddress.objects.bulk_create(
+            UserAddress(
+                user_id=user_ids[customer['email']],
+                street_address=customer['street_address'],
+                city=customer['city'],
+                postal_code=customer['postal_code'],
+                country=customer['country']
+            )
+            for customer in customers
+        )
+
+    return len(customers)
+
+
+def create_or_reject(customers, password_hashes, errors=()):
+    """
+    ``create_batch`` for ``(line_number, cleaned_data)`` pairs, which
+    rejects the customers whose email was registered after their batch
+    was validated instead of failing the batch. Returns ``(created,
+    errors)``, the rejections added to the batch's validation
+    ``errors``.
+    """
+    password_hashes = list(password_hashes)
+    errors = list(errors)
+
+    while True:
+        try:
+            created = create_batch(
+                [customer for _, customer in customers], password_hashes
+            )
+            return created, sorted(errors, key=lambda error: error.line)
+        except IntegrityError:
+            registered = set(User.objects.filter(
+                email__in=[customer['email'] for _, customer in customers]
+            ).values_list('email', flat=True))
+            if not registered:
+                raise
+
+        kept = []
+        for (line, customer), password_hash in zip(customers, password_hashes):
+            if customer['email'] in registered:
+                errors.append(RowError(
+                    line, f'email {customer["email"]} is already registered'
+                ))
+            else:
+                kept.append(((line, customer), password_hash))
+        customers = [pair for pair, _ in kept]
+        password_hashes = [password_hash for _, password_hash in kept]
+
+
+def hash_passwords(passwords, pool=None, workers=1):
+    """
+    Iterator over the hashes of ``passwords``.
+
+    Passwords are hashed by ``pool`` when given, which starts on them
+    right away. Empty passwords get an unusable one, made here.
+    """
+    given = [password for password in passwords if password]
+    if pool is None:
+        hashed = map(make_password, given)
+    else:
+        hashed = pool.map(
+            make_password, given, chunksize=max(1, len(given) // (workers * 4))
+        )
+
+    def merge():
+        for password in passwords:
+            if password:
+                yield next(hashed)
+            else:
+                # What make_password(None) returns, without its slow
+                # per character random choice
+                yield UNUSABLE_PASSWORD_PREFIX + secrets.token_urlsafe(30)
+    return merge()
+
+
+def onboard(rows, batch_size=None, workers=None, pool=None):
+    """
+    Validate and create the customers of ``(line_number, row)`` pairs
+    in batches, yielding ``(created, errors)`` per batch.
+
+    Password hashing dominates the cost, so it runs in a pool of
+    ``workers`` processes (``settings.ONBOARDING_HASH_WORKERS`` by
+    default, 0 hashes in this process) while the previous batch is
+    written. Processes that may not start children, such as Celery's
+    prefork workers, pass an executor of threads as ``pool`` instead.
+    Customers whose email is already registered are rejected, so an
+    interrupted file can be onboarded again.
+    """
+    batch_size = batch_size or settings.ONBOARDING_BATCH_SIZE
+    if pool is not None:
+        workers = 1
+    if workers is None:
+        workers = settings.ONBOARDING_HASH_WORKERS
+    if workers is None:
+        workers = os.cpu_count()
+    seen_emails = set()
+    pending = None
+
+    with ExitStack() as stack:
+        if pool is None and workers != 0:
+            pool = stack.enter_context(ProcessPoolExecutor(
+                max_workers=workers, initializer=django.setup
+            ))
+
+        for batch in batches(rows, batch_size):
+            customers, errors = validate_batch(batch, seen_emails)
+            password_hashes = hash_passwords(
+                [customer['password'] for _, customer in customers],
+                pool, workers
+            )
+
+            if pending:
+                yield create_or_reject(*pending)
+            pending = customers, password_hashes, errors
+
+        if pending:
+            yield create_or_reject(*pending)
@@ -0,0 +1,17 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .cache import invalidate_account_types, invalidate_balance
+from .models import BankAccountType, UserBankAccount
+
+
+@receiver(post_save, sender=UserBankAccount)
+@receiver(post_delete, sender=UserBankAccount)
+def invalidate_account_balance(sender, instance, **kwargs):
+    invalidate_balance(instance.user_id)
+
+
+@receiver(post_save, sender=BankAccountType)
+@receiver(post_delete, sender=BankAccountType)
+def invalidate_account_type_cache(sender, instance, **kwargs):
+    invalidate_account_types()
@@ -0,0 +1,57 @@
+import io
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+
+from celery import shared_task
+from transactions.importer import read_rows
+
+from .hashing import hashing_pool
+from .onboarding import onboard
+
+
+# Errors listed in the summary of an onboarding job
+MAX_ERRORS_REPORTED = 100
+
+
+def upload_storage():
+    """
+    Where uploaded onboarding files wait for a worker; the web and
+    Celery workers must share it.
+    """
+    return FileSystemStorage(location=settings.ONBOARDING_UPLOAD_DIR)
+
+
+@shared_task
+def onboard_customers(name, file_format):
+    """
+    Onboard the customers of the uploaded file ``name`` and delete it.
+
+    Passwords are hashed in the threads of ``accounts.hashing``: the
+    prefork pool's processes are daemonic and may not start the
+    process pool the command hashes in.
+
+    Returns the number of customers created and rejected, with the
+    first ``MAX_ERRORS_REPORTED`` errors.
+    """
+    storage = upload_storage()
+    created = 0
+    errors = []
+
+    try:
+        with storage.open(name, 'rb') as upload:
+            rows = read_rows(
+                io.TextIOWrapper(upload, encoding='utf-8', newline=''),
+                file_format
+            )
+            for count, batch_errors in onboard(rows, pool=hashing_pool()):
+                created += count
+                errors.extend(batch_errors)
+    finally:
+        storage.delete(name)
+
+    return {
+        'created': created,
+        'rejected': len(errors),
+        'errors': [str(error) for error in errors[:MAX_ERRORS_REPORTED]],
+    }
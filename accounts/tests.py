@@ -1,9 +1,37 @@
-from django.test import TestCase
+from django.db import connection, connections, transaction
+from asgiref.sync import async_to_sync
+from django.apps import apps as django_apps
+from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY, authenticate, hashers
+from django.contrib.sessions.backends.db import SessionStore
+from django.test import TestCase, TransactionTestCase, override_settings
+from unittest import mock
+from urllib.parse import urlencode
+import threading
 from django.urls import reverse
 from django.contrib.auth.models import User
 from .forms import UserRegistrationForm, UserAddressForm   
-from .models import User, BankAccountType
+from .models import User, BankAccountType, UserBankAccount
+from .backends import AccountBackend
+from . import hashing, onboarding
+from .numbers import AccountNumberAllocator, account_numbers, check_digit, is_valid_account_number
+from .tasks import onboard_customers
+from .cache import account_types, balance_cache_stats, get_account_type, invalidate_all_balances
 from datetime import date, timedelta
+from decimal import Decimal
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from io import StringIO
+import importlib
+import itertools
+import json
+import random
+import os
+import tempfile
+from transactions.constants import WITHDRAWAL
+from transactions.services import post_transaction
+from core.routers import routing
 
 
 class UserRegistrationFormTests(TestCase):
@@ -499,3 +527,465 @@ class LoginViewTests(TestCase):
         })
         self.assertRedirects(response, reverse('home'))
 
+
+
+@override_settings(BALANCE_CACHE_ENABLED=True)
+class BalanceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        balance_cache_stats.reset()
+        self.user = User.objects.create_user(email='cache@example.com', password='testpass')
+        account_type = BankAccountType.objects.create(
+            name="Basic",
+            maximum_withdrawal_amount=1000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account = UserBankAccount.objects.create(
+                user=self.user, account_type=account_type, balance=100, account_no=1000
+            )
+
+    def test_second_read_is_served_from_cache(self):
+        self.assertEqual(self.user.balance, Decimal('100'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user.balance, Decimal('100'))
+        self.assertEqual(balance_cache_stats.snapshot(), {'hits': 1, 'misses': 1, 'hit_ratio': 0.5})
+
+    def test_posting_writes_through(self):
+        self.assertEqual(self.user.balance, Decimal('100'))
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.account, Decimal('40'), WITHDRAWAL)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user.balance, Decimal('60'))
+
+    def test_stale_value_is_never_served_after_posting(self):
+        self.assertEqual(self.user.balance, Decimal('100'))
+        with self.captureOnCommitCallbacks(execute=True):
+            post_transaction(self.account, Decimal('40'), WITHDRAWAL)
+            # Read between the balance update and the commit
+            self.user.balance
+        self.assertEqual(self.user.balance, Decimal('60'))
+
+    def test_model_save_invalidates(self):
+        self.assertEqual(self.user.balance, Decimal('100'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account.balance = 250
+            self.account.save()
+        self.assertEqual(self.user.balance, Decimal('250'))
+
+    def test_bulk_invalidation(self):
+        self.assertEqual(self.user.balance, Decimal('100'))
+        with self.captureOnCommitCallbacks(execute=True):
+            UserBankAccount.objects.filter(pk=self.account.pk).update(balance=5)
+            invalidate_all_balances()
+        self.assertEqual(self.user.balance, Decimal('5'))
+
+    @override_settings(DATABASE_REPLICAS=['lagging'])
+    def test_replica_balance_is_not_cached(self):
+        # A replica that has not seen the latest posting yet
+        connections.settings['lagging'] = dict(connections.settings['default'], NAME=':memory:')
+        self.addCleanup(connections.settings.pop, 'lagging')
+        self.addCleanup(connections['lagging'].close)
+        with connections['lagging'].cursor() as cursor:
+            cursor.execute('CREATE TABLE accounts_userbankaccount (id integer, user_id integer, balance decimal)')
+            cursor.execute('INSERT INTO accounts_userbankaccount VALUES (%s, %s, 90)', [self.account.pk, self.user.pk])
+
+        with routing() as state:
+            state.read_only = True
+            self.assertEqual(self.user.balance, Decimal('100'))
+        with self.assertNumQueries(0):
+            self.assertEqual(self.user.balance, Decimal('100'))
+
+    def test_evicted_version_is_not_read_as_zero(self):
+        # Every new counter starts from a different time
+        with mock.patch('accounts.cache.time.time', side_effect=itertools.count(1000)):
+            cache.delete('balance:%s:version' % self.user.pk)
+            self.assertEqual(self.user.balance, Decimal('100'))
+            with self.captureOnCommitCallbacks(execute=True):
+                post_transaction(self.account, Decimal('40'), WITHDRAWAL)
+            cache.delete('balance:%s:version' % self.user.pk)
+            self.assertEqual(self.user.balance, Decimal('60'))
+
+    @override_settings(BALANCE_CACHE_ENABLED=False)
+    def test_process_local_cache_is_bypassed(self):
+        self.assertEqual(self.user.balance, Decimal('100'))
+        UserBankAccount.objects.filter(pk=self.account.pk).update(balance=5)
+        self.assertEqual(self.user.balance, Decimal('5'))
+        self.assertEqual(balance_cache_stats.snapshot()['misses'], 0)
+
+
+class AccountBackendTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='backend@example.com', password='testpass')
+        account_type = BankAccountType.objects.create(
+            name="Basic",
+            maximum_withdrawal_amount=1000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+        UserBankAccount.objects.create(
+            user=self.user, account_type=account_type, balance=500, account_no=1000
+        )
+
+    def test_get_user_loads_account_and_type_in_one_query(self):
+        with self.assertNumQueries(1):
+            user = AccountBackend().get_user(self.user.pk)
+            self.assertEqual(user.account.account_type.name, 'Basic')
+
+    def test_get_user_without_account(self):
+        staff = User.objects.create_user(email='staff@example.com', password='testpass')
+        self.assertEqual(AccountBackend().get_user(staff.pk), staff)
+        self.assertIsNone(AccountBackend().get_user(0))
+
+    def test_inactive_user_is_rejected(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        self.assertIsNone(AccountBackend().get_user(self.user.pk))
+
+    def test_withdraw_post_query_count(self):
+        self.client.force_login(self.user)
+        account_types()  # Loaded once per process
+        # Session, user with account and type, then the posting and its outbox event
+        with self.assertNumQueries(8):
+            response = self.client.post(reverse('transactions:withdraw_money'), {'amount': 100})
+        self.assertEqual(response.status_code, 302)
+
+
+class AccountTypeCacheTests(TestCase):
+    def setUp(self):
+        self.account_type = BankAccountType.objects.create(
+            name="Basic",
+            maximum_withdrawal_amount=1000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+
+    def test_lookups_cost_no_queries_once_loaded(self):
+        account_types()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_account_type(self.account_type.pk).name, "Basic")
+            self.assertEqual(list(account_types()), [self.account_type.pk])
+
+    def test_save_and_delete_invalidate(self):
+        account_types()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account_type.maximum_withdrawal_amount = 2000
+            self.account_type.save()
+        self.assertEqual(get_account_type(self.account_type.pk).maximum_withdrawal_amount, 2000)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.account_type.delete()
+        self.assertEqual(account_types(), {})
+
+    def test_version_bump_from_another_process_reloads(self):
+        account_types()
+        BankAccountType.objects.filter(pk=self.account_type.pk).update(name="Renamed")  # No signal
+        self.assertEqual(get_account_type(self.account_type.pk).name, "Basic")
+        cache.incr('account_types:version')  # What another process does on save
+        self.assertEqual(get_account_type(self.account_type.pk).name, "Renamed")
+
+    @override_settings(ACCOUNT_TYPES_MAX_AGE=0)
+    def test_copy_expires_without_version_bump(self):
+        account_types()
+        BankAccountType.objects.filter(pk=self.account_type.pk).update(name="Renamed")  # Saved by a process with its own cache
+        self.assertEqual(get_account_type(self.account_type.pk).name, "Renamed")
+
+    def test_registration_form_choices_cost_no_queries(self):
+        account_types()
+        form = UserRegistrationForm()
+        with self.assertNumQueries(0):
+            self.assertIn(f'value="{self.account_type.pk}"', str(form['account_type']))
+        form = UserRegistrationForm({'account_type': 'bogus'})
+        self.assertIn('account_type', form.errors)
+
+
+class InterestBatchTests(TestCase):
+    def test_batch_matches_scalar_calculation(self):
+        rng = random.Random(0)
+        principals = [Decimal(rng.randint(1, 10 ** 12)) / 100 for _ in range(2000)]
+        # Balances whose interest lands on or next to a half cent
+        principals += [Decimal('1489863.60'), Decimal('1266615.60'), Decimal('1158874.80'),
+                       Decimal('0.01'), Decimal('0.00'), Decimal('120.00'), Decimal('9999999999.99')]
+        for rate, per_year in [(5, 12), (Decimal('4.5'), 4), (Decimal('7.25'), 2), (0, 1), (100, 3)]:
+            account_type = BankAccountType(
+                name="Basic",
+                maximum_withdrawal_amount=1000,
+                annual_interest_rate=Decimal(rate),
+                interest_calculation_per_year=per_year
+            )
+            self.assertEqual(
+                account_type.calculate_interest_batch(principals),
+                [account_type.calculate_interest(p) for p in principals]
+            )
+
+
+class AccountNumberAllocatorTests(TransactionTestCase):
+    def setUp(self):
+        account_numbers.reset()
+        self.account_type = BankAccountType.objects.create(
+            name="Basic",
+            maximum_withdrawal_amount=1000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+
+    def test_check_digit(self):
+        self.assertEqual(check_digit(7992739871), 3)  # The usual Luhn example
+        self.assertTrue(is_valid_account_number(79927398713))
+        self.assertFalse(is_valid_account_number(79927398712))
+        self.assertFalse(is_valid_account_number(79927398731))  # Swapped digits
+
+    def test_processes_get_disjoint_blocks(self):
+        first, second = AccountNumberAllocator(), AccountNumberAllocator()
+        with self.settings(ACCOUNT_NUMBER_BLOCK_SIZE=3):
+            numbers = [allocator.allocate() for _ in range(5) for allocator in (first, second)]
+            numbers += second.reserve(4)
+        self.assertEqual(len(set(numbers)), 14)
+        self.assertTrue(all(is_valid_account_number(n) for n in numbers))
+        self.assertEqual(min(numbers) // 10, settings.ACCOUNT_NUMBER_START_FROM // 10)
+        with self.assertNumQueries(0):
+            first.allocate()  # Still in its second block
+
+    def test_starts_above_existing_numbers(self):
+        user = User.objects.create_user(email='old@example.com', password='testpass')
+        UserBankAccount.objects.create(user=user, account_type=self.account_type, account_no=1000000057)
+        self.assertGreater(account_numbers.allocate(), 1000000057)
+
+    def test_block_of_a_rolled_back_transaction_is_not_kept(self):
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            rolled_back = account_numbers.allocate()
+            raise RuntimeError
+        self.assertEqual(account_numbers.allocate(), rolled_back)  # Handed out again, never twice
+        self.assertNotEqual(AccountNumberAllocator().allocate(), rolled_back)
+
+    def test_forked_process_drops_inherited_block(self):
+        account_numbers.allocate()
+        account_numbers._pid = -1  # As seen from a child process
+        other = AccountNumberAllocator()
+        self.assertNotEqual(account_numbers.allocate(), other.allocate())
+
+    def test_registration_uses_allocator(self):
+        form = UserRegistrationForm(data={
+            'first_name': 'John',
+            'last_name': 'Doe',
+            'email': 'john@example.com',
+            'password1': 'SecurePassword123',
+            'password2': 'SecurePassword123',
+            'account_type': self.account_type.pk,
+            'gender': 'M',
+            'birth_date': '1990-01-01'
+        })
+        self.assertTrue(form.is_valid(), msg=form.errors)
+        user = form.save()
+        self.assertTrue(is_valid_account_number(user.account.account_no))
+
+
+ONBOARDING_CSV = (
+    'email,first_name,last_name,password,account_type,gender,birth_date,street_address,city,postal_code,country\n'
+    'ann@example.com,Ann,Lee,Tr1cky-Passw0rd,Basic,F,1990-01-01,1 Main St,Springfield,12345,USA\n'
+    'bob@Example.COM,Bob,Ray,,{type_id},M,1985-05-05,2 Main St,Springfield,12345,USA\n'
+    'ann@example.com,Ann,Again,,Basic,F,1990-01-01,1 Main St,Springfield,12345,USA\n'
+    'cat@example.com,Cat,Fox,password,Basic,F,1990-01-01,3 Main St,Springfield,12345,USA\n'
+    'dan@example.com,Dan,Fox,,Gold,M,not a date,4 Main St,Springfield,12345,USA\n'
+)
+
+
+@override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'])
+class CustomerOnboardingTests(TestCase):
+    def setUp(self):
+        self.account_type = BankAccountType.objects.create(
+            name="Basic",
+            maximum_withdrawal_amount=1000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+        self.csv = ONBOARDING_CSV.format(type_id=self.account_type.pk)
+
+    def onboard_file(self, content, suffix='.csv', **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        stderr = StringIO()
+        call_command('onboard_customers', f.name, stdout=StringIO(), stderr=stderr, **options)
+        return stderr.getvalue()
+
+    def test_command_creates_valid_customers(self):
+        errors = self.onboard_file(self.csv, workers=0, batch_size=2)
+        self.assertEqual(sorted(User.objects.values_list('email', flat=True)), ['ann@example.com', 'bob@example.com'])
+        ann = User.objects.get(email='ann@example.com')
+        self.assertTrue(ann.check_password('Tr1cky-Passw0rd'))
+        self.assertEqual(ann.address.city, 'Springfield')
+        self.assertEqual(ann.account.account_type, self.account_type)
+        self.assertTrue(is_valid_account_number(ann.account.account_no))
+        self.assertFalse(User.objects.get(email='bob@example.com').has_usable_password())
+        self.assertIn('line 4: email ann@example.com is already registered', errors)
+        self.assertIn('line 5: password:', errors)  # Too common
+        self.assertIn('line 6: account_type:', errors)
+        self.assertIn('birth_date:', errors)
+
+    def test_command_hashes_in_a_process_pool(self):
+        rows = ''.join(
+            f'{{"email": "user{i}@example.com", "first_name": "U", "last_name": "{i}", "password": "Pool-Passw0rd-{i}", '
+            f'"account_type": "Basic", "gender": "M", "birth_date": "1990-01-01", "street_address": "1 Main St", '
+            f'"city": "Springfield", "postal_code": 12345, "country": "USA"}}\n'
+            for i in range(7)
+        )
+        self.onboard_file(rows, suffix='.ndjson', workers=2, batch_size=3)
+        self.assertEqual(UserBankAccount.objects.count(), 7)
+        self.assertTrue(User.objects.get(email='user6@example.com').check_password('Pool-Passw0rd-6'))
+
+    def test_rerun_skips_onboarded_customers(self):
+        self.onboard_file(self.csv, workers=0)
+        errors = self.onboard_file(self.csv, workers=0)
+        self.assertEqual(User.objects.count(), 2)
+        self.assertIn('line 2: email ann@example.com is already registered', errors)
+
+    def test_concurrent_registration_rejects_the_row(self):
+        validate_batch = onboarding.validate_batch
+
+        def register_meanwhile(*args):
+            validated = validate_batch(*args)
+            User.objects.create_user(email='ann@example.com', password='testpass')
+            return validated
+
+        with mock.patch.object(onboarding, 'validate_batch', side_effect=register_meanwhile):
+            errors = self.onboard_file(self.csv, workers=0)
+        self.assertIn('line 2: email ann@example.com is already registered', errors)
+        self.assertTrue(User.objects.filter(email='bob@example.com').exists())  # The rest of the batch is created
+        self.assertFalse(UserBankAccount.objects.filter(user__email='ann@example.com').exists())
+
+    def test_command_aborts_after_max_errors(self):
+        with self.assertRaises(CommandError):
+            self.onboard_file(self.csv, workers=0, max_errors=1)
+
+    def test_endpoint_is_staff_only(self):
+        user = User.objects.create_user(email='staff@example.com', password='testpass')
+        self.client.force_login(user)
+        upload = SimpleUploadedFile('customers.csv', self.csv.encode())
+        response = self.client.post(reverse('accounts:onboard_customers'), {'file': upload})
+        self.assertEqual(response.status_code, 403)
+        response = self.client.get(reverse('accounts:onboarding_job', args=['job']))
+        self.assertEqual(response.status_code, 403)
+
+    def test_endpoint_queues_a_job(self):
+        user = User.objects.create_user(email='staff@example.com', password='testpass', is_staff=True)
+        self.client.force_login(user)
+        upload_dir = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, upload_dir)
+
+        jobs = []
+
+        def run_now(*args):
+            job = onboard_customers.apply(args=args)
+            jobs.append(job)
+            self.assertEqual(os.listdir(upload_dir), [])  # The upload is deleted once onboarded
+            return job
+
+        upload = SimpleUploadedFile('customers.csv', self.csv.encode())
+        # Prefork workers are daemonic and can not start a process pool
+        daemonic = AssertionError('daemonic processes are not allowed to have children')
+        with self.settings(ONBOARDING_UPLOAD_DIR=upload_dir), \
+                mock.patch.object(onboarding, 'ProcessPoolExecutor', side_effect=daemonic), \
+                mock.patch.object(onboard_customers, 'delay', side_effect=run_now) as delay:
+            response = self.client.post(reverse('accounts:onboard_customers'), {'file': upload})
+        self.assertEqual(response.status_code, 202)
+        job = json.loads(response.content)
+        self.assertEqual(delay.call_args.args[1], 'csv')
+        self.assertEqual(User.objects.filter(is_staff=False).count(), 2)
+        self.assertTrue(User.objects.get(email='ann@example.com').check_password('Tr1cky-Passw0rd'))
+
+        with mock.patch.object(onboard_customers, 'AsyncResult', return_value=jobs[0]):
+            response = self.client.get(job['status_url'])
+        summary = json.loads(response.content)
+        self.assertEqual(summary['state'], 'SUCCESS')
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual(summary['rejected'], 3)
+        self.assertTrue(summary['errors'][0].startswith('line 4:'))
+
+@override_settings(PASSWORD_HASHERS=[
+    'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.MD5PasswordHasher',
+])
+class PasswordHashingTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email='hash@example.com', password='unused')
+        # Stored under an older profile
+        User.objects.filter(pk=self.user.pk).update(
+            password=hashers.make_password('Old-Passw0rd', hasher='md5')
+        )
+
+    def test_login_upgrades_outdated_hash(self):
+        self.assertIsNone(authenticate(email='hash@example.com', password='wrong'))
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('md5$'))  # Untouched by a failed login
+        user = authenticate(email='hash@example.com', password='Old-Passw0rd')
+        self.assertEqual(user, self.user)
+        stored = User.objects.get(pk=self.user.pk).password
+        self.assertTrue(stored.startswith('pbkdf2_sha256$'))
+        self.assertEqual(authenticate(email='hash@example.com', password='Old-Passw0rd'), self.user)
+        self.assertEqual(User.objects.get(pk=self.user.pk).password, stored)  # Upgraded once
+
+    def test_hashing_runs_in_the_pool(self):
+        threads = []
+        check_password = hashers.check_password
+
+        def recording(*args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return check_password(*args, **kwargs)
+
+        with mock.patch.object(hashing.hashers, 'check_password', side_effect=recording):
+            authenticate(email='hash@example.com', password='Old-Passw0rd')
+        self.assertTrue(threads[0].startswith('password-hashing'))
+
+    def test_failed_login_hashes_once_in_the_pool(self):
+        User.objects.create_user(email='pbkdf2@example.com', password='Right-Passw0rd')
+        threads = []
+        encode = hashers.PBKDF2PasswordHasher.encode
+
+        def recording(hasher, *args, **kwargs):
+            threads.append(threading.current_thread().name)
+            return encode(hasher, *args, **kwargs)
+
+        with mock.patch.object(hashers.PBKDF2PasswordHasher, 'encode', autospec=True, side_effect=recording):
+            self.assertIsNone(authenticate(email='pbkdf2@example.com', password='wrong'))
+            self.assertIsNone(authenticate(email='nobody@example.com', password='wrong'))
+        self.assertEqual(len(threads), 2)  # One hash per failed login
+        self.assertTrue(all(name.startswith('password-hashing') for name in threads))
+
+    def test_model_backend_sessions_are_moved(self):
+        migration = importlib.import_module('accounts.migrations.0004_move_sessions_to_account_backend')
+        old = SessionStore()
+        old.update({SESSION_KEY: str(self.user.pk), BACKEND_SESSION_KEY: migration.OLD_BACKEND})
+        old.create()
+        migration.move_sessions(django_apps, connection.schema_editor())
+        self.assertEqual(SessionStore(old.session_key).load()[BACKEND_SESSION_KEY], migration.NEW_BACKEND)
+
+    def test_registration_hashes_once(self):
+        account_type = BankAccountType.objects.create(
+            name="Basic", maximum_withdrawal_amount=1000, annual_interest_rate=5, interest_calculation_per_year=12
+        )
+        form = UserRegistrationForm(data={
+            'first_name': 'John', 'last_name': 'Doe', 'email': 'john@example.com',
+            'password1': 'SecurePassword123', 'password2': 'SecurePassword123',
+            'account_type': account_type.pk, 'gender': 'M', 'birth_date': '1990-01-01'
+        })
+        self.assertTrue(form.is_valid(), msg=form.errors)
+        with mock.patch.object(hashing.hashers, 'make_password', wraps=hashers.make_password) as make_password:
+            user = form.save()
+        self.assertEqual(make_password.call_count, 1)
+        self.assertTrue(user.check_password('SecurePassword123'))
+
+    @override_settings(ROOT_URLCONF='banking_system.asgi_urls')
+    def test_async_login(self):
+        def post(password):
+            return async_to_sync(self.async_client.post)(
+                reverse('accounts:user_login'),
+                urlencode({'username': 'hash@example.com', 'password': password}),
+                content_type='application/x-www-form-urlencoded'
+            )
+
+        response = post('wrong')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Please enter a correct')
+        response = post('Old-Passw0rd')
+        self.assertRedirects(response, reverse(settings.LOGIN_REDIRECT_URL), fetch_redirect_response=False)
+        self.assertEqual(int(self.async_client.session['_auth_user_id']), self.user.pk)
+        self.assertTrue(User.objects.get(pk=self.user.pk).password.startswith('pbkdf2_sha256$'))
@@ -1,6 +1,12 @@
 from django.urls import path
 
-from .views import UserRegistrationView, LogoutView, UserLoginView
+from .views import (
+    CustomerOnboardingView,
+    LogoutView,
+    OnboardingJobView,
+    UserLoginView,
+    UserRegistrationView,
+)
 
 
 app_name = 'accounts'
@@ -18,4 +24,12 @@ urlpatterns = [
         "register/", UserRegistrationView.as_view(),
         name="user_registration"
     ),
+    path(
+        "onboard/", CustomerOnboardingView.as_view(),
+        name="onboard_customers"
+    ),
+    path(
+        "onboard/<str:job_id>/", OnboardingJobView.as_view(),
+        name="onboarding_job"
+    ),
 ]
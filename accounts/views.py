@@ -1,11 +1,17 @@
+import uuid
+
 from django.contrib import messages
 from django.contrib.auth import get_user_model, login, logout
+from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import LoginView
+from django.http import JsonResponse
 from django.shortcuts import HttpResponseRedirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
+from django.views import View
 from django.views.generic import TemplateView, RedirectView
 
 from .forms import UserRegistrationForm, UserAddressForm
+from .tasks import onboard_customers, upload_storage
 
 
 User = get_user_model()
@@ -33,7 +39,10 @@ class UserRegistrationView(TemplateView):
             address.user = user
             address.save()
 
-            login(self.request, user)
+            login(
+                self.request, user,
+                backend='accounts.backends.AccountBackend'
+            )
             messages.success(
                 self.request,
                 (
@@ -73,3 +82,54 @@ class LogoutView(RedirectView):
         if self.request.user.is_authenticated:
             logout(self.request)
         return super().get_redirect_url(*args, **kwargs)
+
+
+class CustomerOnboardingView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Staff only: queue an uploaded CSV or NDJSON file of customers for
+    onboarding by a Celery worker (see the ``onboard_customers`` command
+    for the columns) and answer with the job's id. The job's summary is
+    served by ``OnboardingJobView``.
+    """
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def post(self, request, *args, **kwargs):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return JsonResponse({'error': 'No file uploaded'}, status=400)
+
+        file_format = request.POST.get('format') or (
+            'ndjson' if upload.name.endswith(('.ndjson', '.jsonl')) else 'csv'
+        )
+        if file_format not in ('csv', 'ndjson'):
+            return JsonResponse({'error': 'Unsupported format'}, status=400)
+
+        name = upload_storage().save(f'{uuid.uuid4().hex}.{file_format}', upload)
+        job = onboard_customers.delay(name, file_format)
+        return JsonResponse({
+            'job': job.id,
+            'status_url': reverse('accounts:onboarding_job', args=[job.id]),
+        }, status=202)
+
+
+class OnboardingJobView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """
+    Staff only: state of an onboarding job and, once it has finished,
+    its summary.
+    """
+    raise_exception = True
+
+    def test_func(self):
+        return self.request.user.is_staff
+
+    def get(self, request, job_id, *args, **kwargs):
+        job = onboard_customers.AsyncResult(job_id)
+        response = {'job': job_id, 'state': job.state}
+        if job.successful():
+            response.update(job.result)
+        elif job.failed():
+            response['error'] = str(job.result)
+        return JsonResponse(response)
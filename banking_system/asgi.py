@@ -2,6 +2,10 @@
 ASGI config for banking_system project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+The transaction views are served by their async versions, set
+ASYNC_VIEWS=0 to use the sync ones.
+
+    uvicorn banking_system.asgi:application --workers 4
 
 For more information on this file, see
 https://docs.djangoproject.com/en/3.1/howto/deployment/asgi/
@@ -12,5 +16,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking_system.settings')
+os.environ.setdefault('ASYNC_VIEWS', '1')
 
 application = get_asgi_application()
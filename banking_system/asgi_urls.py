@@ -0,0 +1,24 @@
+"""
+URL configuration of ASGI deployments.
+
+The same URLs as ``banking_system.urls``, with the login and
+transaction views served by their async versions.
+"""
+from django.urls import include, path
+
+from .urls import urlpatterns as wsgi_urlpatterns
+
+
+urlpatterns = [
+    path(
+        'accounts/',
+        include('accounts.async_urls', namespace='accounts')
+    ),
+    path(
+        'transactions/',
+        include('transactions.async_urls', namespace='transactions')
+    ),
+] + [
+    pattern for pattern in wsgi_urlpatterns
+    if getattr(pattern, 'namespace', None) not in ('accounts', 'transactions')
+]
@@ -21,10 +21,20 @@ app.autodiscover_tasks()
 
 app.conf.beat_schedule = {
     'calculate_interest': {
-        'task': 'calculate_interest',
+        'task': 'transactions.tasks.calculate_interest_fanout',
         # http://docs.celeryproject.org/en/latest/userguide/periodic-tasks.html
         'schedule': crontab(0, 0, day_of_month='1'),
-    }
+    },
+    'update_balance_snapshots': {
+        'task': 'transactions.tasks.update_balance_snapshots',
+        'schedule': crontab(minute='*/15'),
+    },
+    'relay_outbox': {
+        'task': 'transactions.tasks.relay_outbox',
+        'schedule': 5.0,
+        # A run that waited longer than this was overtaken by later ones
+        'options': {'expires': 5.0},
+    },
 }
 
 
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/3.1/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,17 +47,27 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
-ROOT_URLCONF = 'banking_system.urls'
+# ASGI deployments (banking_system/asgi.py) serve the async views
+ROOT_URLCONF = (
+    'banking_system.asgi_urls' if os.environ.get('ASYNC_VIEWS') == '1'
+    else 'banking_system.urls'
+)
 AUTH_USER_MODEL = 'accounts.User'
+# Only one backend, so a failed login is hashed once, in the hashing
+# pool. Sessions of the former ModelBackend are moved over by a
+# migration (accounts 0004).
+AUTHENTICATION_BACKENDS = ['accounts.backends.AccountBackend']
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 TEMPLATES = [
@@ -81,13 +92,123 @@ WSGI_APPLICATION = 'banking_system.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/3.1/ref/settings/#databases
 
-DATABASES = {
+# Configured from the environment. DB_ENGINE=postgresql uses DB_NAME,
+# DB_USER, DB_PASSWORD, DB_HOST and DB_PORT; the default is a SQLite
+# file for single node installs.
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite3')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'banking'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            # PgBouncer in transaction pooling mode can not keep the
+            # server-side cursors of QuerySet.iterator() open
+            'DISABLE_SERVER_SIDE_CURSORS': (
+                os.environ.get('DB_POOLER') == 'pgbouncer'
+            ),
+        }
+    }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+        }
+    }
+
+# Seconds a database connection is kept open between requests
+DATABASES['default']['CONN_MAX_AGE'] = int(
+    os.environ.get('DB_CONN_MAX_AGE', 60)
+)
+
+# Read replicas: comma separated hosts for PostgreSQL or files for
+# SQLite. They are only read from, by the views in REPLICA_VIEWS.
+DATABASE_REPLICAS = []
+for i, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(','))):
+    alias = f'replica{i}'
+    DATABASES[alias] = dict(
+        DATABASES['default'],
+        **{'HOST' if DB_ENGINE == 'postgresql' else 'NAME': replica},
+        TEST={'MIRROR': 'default'}
+    )
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Views whose reads may be served by a replica
+REPLICA_VIEWS = [
+    'transactions:transaction_report',
+    'transactions:transaction_export',
+    'admin:transactions_transaction_changelist',
+]
+# Seconds a browser reads from the primary after a request that wrote,
+# so users always see their own postings
+REPLICA_PIN_SECONDS = 10
+# Check that a kept connection still works before each request
+DB_HEALTH_CHECKS = os.environ.get('DB_HEALTH_CHECKS', '1') == '1'
+
+# Applied to every new SQLite connection. WAL lets readers run next to
+# the single writer, synchronous=NORMAL only syncs at checkpoints and
+# busy_timeout (ms) makes writers wait for the lock instead of failing.
+# SQLITE_TUNING=0 keeps SQLite's defaults.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+} if os.environ.get('SQLITE_TUNING', '1') == '1' else {}
+
+
+# Cache
+# https://docs.djangoproject.com/en/3.1/topics/cache/
+# Configured from the environment, e.g. CACHE_BACKEND=django.core.cache.
+# backends.memcached.PyMemcacheCache with CACHE_LOCATION=127.0.0.1:11211.
+# The default local memory cache is private to each process.
+
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': os.environ.get(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.environ.get('CACHE_LOCATION', ''),
     }
 }
 
+# Balances are cached write-through, which is only correct in a cache
+# every process shares: with a process local cache they are read from
+# the database.
+BALANCE_CACHE_ENABLED = CACHES['default']['BACKEND'] not in (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+# Password hashing
+# https://docs.djangoproject.com/en/3.1/topics/auth/passwords/
+
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2': 'django.contrib.auth.hashers.PBKDF2PasswordHasher',
+    # Need argon2-cffi and bcrypt
+    'argon2': 'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'bcrypt': 'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    # Tests and benchmarks only, it is not a safe password hash
+    'fast': 'django.contrib.auth.hashers.MD5PasswordHasher',
+}
+PASSWORD_HASHER_PROFILE = os.environ.get('PASSWORD_HASHER_PROFILE', 'pbkdf2')
+# The profile's hasher makes new hashes. The others still check the
+# hashes stored before a profile change, which are replaced on the
+# user's next login; fast hashes are only accepted by the fast profile.
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]] + [
+    hasher for profile, hasher in PASSWORD_HASHER_PROFILES.items()
+    if profile not in (PASSWORD_HASHER_PROFILE, 'fast')
+]
+# Threads per process hashing passwords at login and registration,
+# None uses one per CPU
+PASSWORD_HASHING_WORKERS = None
 
 # Password validation
 # https://docs.djangoproject.com/en/3.1/ref/settings/#auth-password-validators
@@ -128,9 +249,74 @@ USE_TZ = True
 STATIC_URL = '/static/'
 
 ACCOUNT_NUMBER_START_FROM = 1000000000
+# Account numbers a process reserves at a time for registrations
+ACCOUNT_NUMBER_BLOCK_SIZE = 100
 MINIMUM_DEPOSIT_AMOUNT = 10
 MINIMUM_WITHDRAWAL_AMOUNT = 10
 
+# Number of transactions shown on one page of the transaction report
+TRANSACTION_REPORT_PAGE_SIZE = 50
+# Rows fetched per round trip when streaming a statement export
+TRANSACTION_EXPORT_CHUNK_SIZE = 2000
+
+# Seconds a cached account balance is kept
+BALANCE_CACHE_TIMEOUT = 300
+# Seconds a process keeps its copy of the account types when no other
+# process bumped their version in the cache
+ACCOUNT_TYPES_MAX_AGE = 60
+
+# How many times a posting is retried when the database is locked
+POSTING_MAX_RETRIES = 3
+
+# Number of accounts credited per transaction by the interest task
+INTEREST_CHUNK_SIZE = 1000
+# Number of account ids handled by one parallel interest shard
+INTEREST_SHARD_SIZE = 100000
+
+# Rows read and written per batch when rebuilding daily balance snapshots
+SNAPSHOT_BATCH_SIZE = 5000
+
+# Events handed to the consumers per relay_outbox batch
+OUTBOX_BATCH_SIZE = 500
+# Seconds a relay owns the events it claimed before another may retry them
+OUTBOX_LEASE_SECONDS = 60
+# Seconds a consumer may take over a batch before the batch counts as
+# failed, well within the lease so the batch is never delivered twice
+OUTBOX_CONSUMER_TIMEOUT = 30
+# Seconds a relay_outbox run may take before it is interrupted, and
+# before its worker process is killed
+OUTBOX_RELAY_SOFT_TIME_LIMIT = 120
+OUTBOX_RELAY_TIME_LIMIT = 150
+# Deliveries tried before an event is left undelivered for inspection
+OUTBOX_MAX_ATTEMPTS = 5
+# Days delivered events are kept
+OUTBOX_RETENTION_DAYS = 7
+# Consumers called after commit with the batch of events of each topic
+OUTBOX_CONSUMERS = {
+    'transaction.posted': [
+        'transactions.snapshots.refresh_posted_snapshots',
+    ],
+}
+
+# Rows validated and written per transaction by import_transactions
+IMPORT_BATCH_SIZE = 10000
+
+# Customers validated and written per transaction by onboard_customers
+ONBOARDING_BATCH_SIZE = 2000
+# Processes hashing onboarding passwords, None uses every CPU and 0 none
+ONBOARDING_HASH_WORKERS = None
+# Uploads of /accounts/onboard/ until a Celery worker onboards them,
+# shared between the web and Celery workers
+ONBOARDING_UPLOAD_DIR = os.environ.get(
+    'ONBOARDING_UPLOAD_DIR', BASE_DIR / 'onboarding_uploads'
+)
+
+# Requests issuing more queries than this are logged, None disables it
+QUERY_BUDGET = 20
+# Bearer token allowing a scraper to read /metrics/ without a staff
+# login, None lets only staff users read it
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN') or None
+
 # Login redirect
 LOGIN_REDIRECT_URL = 'home'
 
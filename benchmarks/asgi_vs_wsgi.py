@@ -0,0 +1,300 @@
+"""
+Requests/sec, latency and memory per concurrent connection of the
+transaction endpoints served by WSGI (gunicorn, threaded workers) and
+ASGI (uvicorn, async views).
+
+Both servers run the project against the same SQLite database, seeded
+with one customer per concurrent connection. Every connection is a
+keep-alive client logged in as its own customer. Memory is the resident
+set size of the server's whole process tree: idle before the run and
+the peak during it, so ``(peak - idle) / concurrency`` is what one more
+concurrent connection costs.
+
+    pip install gunicorn uvicorn
+    python benchmarks/asgi_vs_wsgi.py --concurrency 1,16,64 --duration 5
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from io import StringIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking_system.settings')
+
+PAGE_SIZE = os.sysconf('SC_PAGE_SIZE')
+
+ENDPOINTS = {
+    'report': ('GET', '/transactions/report/', None),
+    'deposit': ('POST', '/transactions/deposit/', b'amount=10&transaction_type=1'),
+}
+
+
+def server_command(mode, port, workers, threads):
+    if mode == 'wsgi':
+        return [
+            sys.executable, '-m', 'gunicorn', 'banking_system.wsgi:application',
+            '--bind', f'127.0.0.1:{port}', '--workers', str(workers),
+            '--worker-class', 'gthread', '--threads', str(threads),
+            '--log-level', 'warning',
+        ]
+    return [
+        sys.executable, '-m', 'uvicorn', 'banking_system.asgi:application',
+        '--port', str(port), '--workers', str(workers),
+        '--log-level', 'warning', '--no-access-log',
+    ]
+
+
+def prepare(db, customers):
+    """
+    Migrate and seed ``db`` and return a ``(session, csrf token)``
+    cookie pair per customer.
+    """
+    os.environ.update({'DB_ENGINE': 'sqlite3', 'DB_NAME': db})
+
+    import django
+    django.setup()
+
+    from django.contrib.auth import (
+        BACKEND_SESSION_KEY,
+        HASH_SESSION_KEY,
+        SESSION_KEY,
+    )
+    from django.contrib.sessions.backends.db import SessionStore
+    from django.core.management import call_command
+    from django.middleware.csrf import _get_new_csrf_token
+
+    from accounts.models import User
+
+    call_command('migrate', verbosity=0)
+    call_command(
+        'seed_bank', users=customers, tx_per_account=50,
+        email_pattern='{}@asgi.bench.example.com', stdout=StringIO()
+    )
+
+    cookies = []
+    for user in User.objects.filter(
+        email__endswith='@asgi.bench.example.com'
+    ).order_by('pk'):
+        session = SessionStore()
+        session[SESSION_KEY] = str(user.pk)
+        session[BACKEND_SESSION_KEY] = 'accounts.backends.AccountBackend'
+        session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+        session.create()
+        cookies.append((session.session_key, _get_new_csrf_token()))
+    return cookies
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Server on port {port} did not start')
+
+
+def tree_rss(pid):
+    """
+    Resident set size in bytes of ``pid`` and all its descendants.
+    """
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        children.setdefault(ppid, []).append(int(entry))
+
+    total = 0
+    pending = [pid]
+    while pending:
+        current = pending.pop()
+        pending.extend(children.get(current, []))
+        try:
+            with open(f'/proc/{current}/statm') as f:
+                total += int(f.read().split()[1]) * PAGE_SIZE
+        except OSError:
+            pass
+    return total
+
+
+async def client(port, endpoint, cookie, deadline, latencies, errors):
+    method, path, body = ENDPOINTS[endpoint]
+    session, csrf = cookie
+    request = (
+        f'{method} {path} HTTP/1.1\r\n'
+        f'Host: 127.0.0.1:{port}\r\n'
+        f'Cookie: sessionid={session}; csrftoken={csrf}\r\n'
+        f'X-CSRFToken: {csrf}\r\n'
+    )
+    if body:
+        request += (
+            'Content-Type: application/x-www-form-urlencoded\r\n'
+            f'Content-Length: {len(body)}\r\n'
+        )
+    request = request.encode() + b'\r\n' + (body or b'')
+
+    reader, writer = await asyncio.open_connection('127.0.0.1', port)
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            writer.write(request)
+            status, close = await read_response(reader)
+            latencies.append(time.perf_counter() - started)
+            if status >= 400:
+                errors.append(status)
+            if close:
+                writer.close()
+                reader, writer = await asyncio.open_connection(
+                    '127.0.0.1', port
+                )
+    finally:
+        writer.close()
+
+
+async def read_response(reader):
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode('latin-1').split('\r\n')
+    status = int(lines[0].split()[1])
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            name, value = line.split(':', 1)
+            headers[name.strip().lower()] = value.strip()
+
+    if headers.get('transfer-encoding') == 'chunked':
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            await reader.readexactly(size + 2)
+            if not size:
+                break
+    else:
+        await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers.get('connection', '').lower() == 'close'
+
+
+async def load(port, endpoint, cookies, duration, server_pid):
+    latencies = []
+    errors = []
+    peak = 0
+    deadline = time.monotonic() + duration
+
+    async def sample():
+        nonlocal peak
+        while time.monotonic() < deadline:
+            peak = max(peak, tree_rss(server_pid))
+            await asyncio.sleep(0.1)
+
+    started = time.perf_counter()
+    await asyncio.gather(sample(), *(
+        client(port, endpoint, cookie, deadline, latencies, errors)
+        for cookie in cookies
+    ))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, elapsed, peak
+
+
+def measure(mode, args, cookies, db):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DB_ENGINE='sqlite3',
+        DB_NAME=db,
+        ASYNC_VIEWS='1' if mode == 'asgi' else '0',
+    )
+    server = subprocess.Popen(
+        server_command(mode, port, args.workers, args.threads),
+        cwd=ROOT, env=env
+    )
+    results = {}
+    try:
+        wait_for(port)
+        for endpoint in args.endpoints.split(','):
+            for concurrency in args.concurrency:
+                # Warm every worker up before taking the idle size
+                asyncio.run(load(port, endpoint, cookies[:4], 0.5, server.pid))
+                idle = tree_rss(server.pid)
+                latencies, errors, elapsed, peak = asyncio.run(load(
+                    port, endpoint, cookies[:concurrency], args.duration,
+                    server.pid
+                ))
+                latencies.sort()
+                results.setdefault(endpoint, {})[concurrency] = {
+                    'requests_per_sec': len(latencies) / elapsed,
+                    'p50_ms': latencies[len(latencies) // 2] * 1000,
+                    'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000,
+                    'errors': len(errors),
+                    'idle_rss_mb': idle / 2 ** 20,
+                    'peak_rss_mb': peak / 2 ** 20,
+                    'rss_per_connection_kb': max(peak - idle, 0) / concurrency / 1024,
+                }
+                print(
+                    f'{mode} {endpoint:>8} x{concurrency:<4}: '
+                    f'{results[endpoint][concurrency]["requests_per_sec"]:8.1f} req/sec, '
+                    f'p50 {results[endpoint][concurrency]["p50_ms"]:7.1f} ms, '
+                    f'p99 {results[endpoint][concurrency]["p99_ms"]:7.1f} ms, '
+                    f'{len(errors)} errors, '
+                    f'rss {idle / 2 ** 20:.0f} -> {peak / 2 ** 20:.0f} MB, '
+                    f'{results[endpoint][concurrency]["rss_per_connection_kb"]:.0f} KB/connection'
+                )
+    finally:
+        server.terminate()
+        server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument(
+        '--endpoints', default='report,deposit',
+        help='Comma separated endpoints: ' + ', '.join(ENDPOINTS)
+    )
+    parser.add_argument(
+        '--concurrency', default='1,16,64',
+        type=lambda value: [int(n) for n in value.split(',')],
+        help='Comma separated numbers of concurrent connections'
+    )
+    parser.add_argument(
+        '--duration', type=float, default=5, help='Seconds per run'
+    )
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument(
+        '--threads', type=int, default=16, help='Threads per WSGI worker'
+    )
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'bench.sqlite3')
+        cookies = prepare(db, max(args.concurrency))
+        for mode in args.modes.split(','):
+            results[mode] = measure(mode, args, cookies, db)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
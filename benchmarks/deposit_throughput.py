@@ -0,0 +1,176 @@
+"""
+Deposit throughput of the posting engine under concurrent writers, per
+database mode.
+
+Every mode runs in its own process against its own database:
+
+    sqlite-default  a fresh SQLite file with SQLite's default settings
+    sqlite-tuned    a fresh SQLite file with settings.SQLITE_PRAGMAS
+    env             the database configured by the DB_* environment
+                    variables, e.g. DB_ENGINE=postgresql
+
+    python benchmarks/deposit_throughput.py --threads 8 --deposits 200
+    DB_ENGINE=postgresql DB_NAME=bench python benchmarks/deposit_throughput.py --modes env
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking_system.settings')
+
+MODES = {
+    'sqlite-default': {'DB_ENGINE': 'sqlite3', 'SQLITE_TUNING': '0'},
+    'sqlite-tuned': {'DB_ENGINE': 'sqlite3', 'SQLITE_TUNING': '1'},
+    'env': {},
+}
+
+
+def accounts(count):
+    from django.core.management import call_command
+
+    from accounts.models import UserBankAccount
+
+    queryset = UserBankAccount.objects.filter(
+        user__email__endswith='@deposit.bench.example.com'
+    ).select_related('account_type').order_by('pk')
+    if queryset.count() < count:
+        call_command(
+            'seed_bank',
+            users=count - queryset.count(),
+            start=queryset.count(),
+            tx_per_account=1,
+            email_pattern='{}@deposit.bench.example.com',
+            stdout=StringIO()
+        )
+    return list(queryset[:count])
+
+
+def run(threads, deposits, account_count):
+    """
+    Post ``deposits`` deposits from each of ``threads`` threads and
+    return throughput and latency figures.
+    """
+    import django
+    django.setup()
+
+    from django.core.management import call_command
+    from django.db import OperationalError, connection
+
+    from transactions.constants import DEPOSIT
+    from transactions.services import post_transaction, posting_stats
+
+    call_command('migrate', verbosity=0)
+    targets = accounts(account_count)
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def worker(account):
+        mine = []
+        failed = 0
+        try:
+            for _ in range(deposits):
+                started = time.perf_counter()
+                try:
+                    post_transaction(account, Decimal('10'), DEPOSIT)
+                except OperationalError:
+                    failed += 1
+                    continue
+                mine.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(mine)
+            failures.append(failed)
+
+    workers = [
+        threading.Thread(target=worker, args=(targets[i % len(targets)],))
+        for i in range(threads)
+    ]
+    posting_stats.reset()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'database': connection.vendor,
+        'threads': threads,
+        'accounts': len(targets),
+        'deposits': len(latencies),
+        'failed': sum(failures),
+        'conflicts': posting_stats.snapshot()['conflicts'],
+        'deposits_per_sec': len(latencies) / elapsed,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--modes', default='sqlite-default,sqlite-tuned',
+        help='Comma separated modes: ' + ', '.join(MODES)
+    )
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument(
+        '--deposits', type=int, default=200, help='Deposits per thread'
+    )
+    parser.add_argument(
+        '--accounts', type=int,
+        help='Accounts the threads post to, default one per thread; '
+             '1 measures contention on a single account'
+    )
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    account_count = args.accounts or args.threads
+
+    if args.run:
+        print(json.dumps(run(args.threads, args.deposits, account_count)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode in args.modes.split(','):
+            env = dict(os.environ, **MODES[mode])
+            if mode != 'env':
+                env['DB_NAME'] = os.path.join(tmp, f'{mode}.sqlite3')
+            output = subprocess.run(
+                [
+                    sys.executable, __file__, '--run',
+                    '--threads', str(args.threads),
+                    '--deposits', str(args.deposits),
+                    '--accounts', str(account_count),
+                ],
+                env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results[mode] = json.loads(output.strip().splitlines()[-1])
+            print(
+                f'{mode:>15}: {results[mode]["deposits_per_sec"]:8.1f} deposits/sec, '
+                f'p50 {results[mode]["p50_ms"]:.1f} ms, '
+                f'p99 {results[mode]["p99_ms"]:.1f} ms, '
+                f'{results[mode]["failed"]} failed, '
+                f'{results[mode]["conflicts"]} retried'
+            )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+"""
+Timings of the application's hot paths, saved as JSON for comparing
+commits.
+
+Micro benchmarks time the model and form helpers in memory; macro
+benchmarks post deposits and withdrawals and render the transaction
+report through the test client, and run the interest task, against a
+database seeded with ``seed_bank``.
+
+    python benchmarks/hot_paths.py --json results/$(git rev-parse --short HEAD).json
+    python benchmarks/hot_paths.py --compare results/main.json
+
+With ``--compare`` every benchmark whose median is more than
+``--threshold`` slower than in the given results is reported and the
+script exits with status 1.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from io import StringIO
+from pathlib import Path
+
+import django
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking_system.settings')
+
+
+def setup(db):
+    from django.conf import settings
+    from django.test.utils import setup_test_environment
+
+    settings.DATABASES['default']['NAME'] = db
+    # Logins are not what is measured here
+    settings.PASSWORD_HASHERS = [
+        'django.contrib.auth.hashers.MD5PasswordHasher',
+    ]
+    django.setup()
+    setup_test_environment()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+
+def timeit(run, repeat, number):
+    """
+    Seconds per call of ``run``: ``repeat`` rounds of ``number`` calls.
+    """
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            run()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        'min': min(timings),
+        'median': statistics.median(timings),
+        'mean': statistics.mean(timings),
+        'stdev': statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        'rounds': repeat,
+        'calls_per_round': number,
+    }
+
+
+def seed_customers(prefix, users, tx_per_account):
+    """
+    Seed ``users`` customers once and return their accounts.
+    """
+    from django.core.management import call_command
+
+    from accounts.models import UserBankAccount
+
+    pattern = f'{prefix}{{}}@bench.example.com'
+    accounts = UserBankAccount.objects.filter(
+        user__email__endswith='@bench.example.com',
+        user__email__startswith=prefix
+    ).order_by('pk')
+    if not accounts.exists():
+        call_command(
+            'seed_bank',
+            users=users,
+            tx_per_account=tx_per_account,
+            email_pattern=pattern,
+            stdout=StringIO()
+        )
+    return accounts
+
+
+def micro_benchmarks(repeat):
+    from accounts.models import BankAccountType, UserBankAccount
+    from transactions.forms import TransactionDateRangeForm
+
+    account_type = BankAccountType(
+        name='Benchmark',
+        maximum_withdrawal_amount=5000,
+        annual_interest_rate=Decimal('4.5'),
+        interest_calculation_per_year=4
+    )
+    account = UserBankAccount(
+        account_type=account_type,
+        interest_start_date=datetime.date(2024, 2, 1)
+    )
+    principals = [Decimal(i * 7919 % 10 ** 7) / 100 for i in range(1000)]
+    form = TransactionDateRangeForm()
+    form.cleaned_data = {'daterange': '2024-01-01 - 2024-12-31'}
+
+    return {
+        'calculate_interest': timeit(
+            lambda: account_type.calculate_interest(Decimal('12345.67')),
+            repeat, 10000
+        ),
+        # Per call for 1000 balances, compare with 1000 x calculate_interest
+        'calculate_interest_batch[1000]': timeit(
+            lambda: account_type.calculate_interest_batch(principals),
+            repeat, 10
+        ),
+        'get_interest_calculation_months': timeit(
+            account.get_interest_calculation_months, repeat, 10000
+        ),
+        'clean_daterange': timeit(form.clean_daterange, repeat, 10000),
+    }
+
+
+def posting_benchmarks(repeat):
+    from django.test import Client
+    from django.urls import reverse
+
+    account = seed_customers('posting', 1, 1).get()
+    client = Client()
+    client.force_login(account.user)
+    deposit_url = reverse('transactions:deposit_money')
+    withdraw_url = reverse('transactions:withdraw_money')
+
+    return {
+        # Every withdrawal takes back the previous deposit, so the
+        # balance stays put across rounds.
+        'deposit': timeit(
+            lambda: client.post(deposit_url, {'amount': 100}), repeat, 50
+        ),
+        'withdraw': timeit(
+            lambda: client.post(withdraw_url, {'amount': 100}), repeat, 50
+        ),
+    }
+
+
+def report_benchmarks(repeat, history_sizes):
+    from django.test import Client
+    from django.urls import reverse
+
+    url = reverse('transactions:transaction_report')
+    results = {}
+    for size in history_sizes:
+        account = seed_customers(f'report{size}-', 1, size).get()
+        client = Client()
+        client.force_login(account.user)
+        daterange = '2000-01-01 - {}'.format(datetime.date.today())
+
+        results[f'report[{size}]'] = timeit(
+            lambda: client.get(url), repeat, 10
+        )
+        results[f'report_daterange[{size}]'] = timeit(
+            lambda: client.get(url, {'daterange': daterange}), repeat, 10
+        )
+    return results
+
+
+def interest_benchmarks(repeat, account_counts):
+    from django.db import transaction
+    from django.db.models import Max, Min
+    from django.utils import timezone
+
+    from accounts.models import BankAccountType
+    from transactions.tasks import calculate_interest_shard
+
+    today = timezone.localdate()
+    monthly, _ = BankAccountType.objects.get_or_create(
+        name='Benchmark monthly',
+        defaults={
+            'maximum_withdrawal_amount': 5000,
+            'annual_interest_rate': 5,
+            'interest_calculation_per_year': 12,
+        }
+    )
+
+    results = {}
+    for count in account_counts:
+        accounts = seed_customers(f'interest{count}-', count, 1)
+        # Monthly interest starting this month: every account is due
+        accounts.update(
+            account_type=monthly,
+            interest_start_date=today.replace(day=1)
+        )
+        bounds = accounts.aggregate(first=Min('pk'), last=Max('pk'))
+
+        def run():
+            # Rolled back, so every round credits the same accounts
+            with transaction.atomic():
+                summary = calculate_interest_shard.apply(args=(
+                    today.isoformat(), bounds['first'], bounds['last'] + 1
+                )).get()
+                assert summary['accounts'] == count, summary
+                transaction.set_rollback(True)
+
+        results[f'interest_task[{count}]'] = timeit(run, repeat, 1)
+    return results
+
+
+def metadata():
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', 'HEAD'], cwd=ROOT,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    from django.db import connection
+
+    return {
+        'commit': commit,
+        'date': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'machine': platform.machine(),
+    }
+
+
+def compare(results, baseline_path, threshold):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['results']
+
+    regressions = []
+    for name, stats in results.items():
+        if name not in baseline:
+            continue
+        change = stats['median'] / baseline[name]['median'] - 1
+        print(f'{name:>40}: {change:+7.1%}')
+        if change > threshold:
+            regressions.append(name)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--db', help='SQLite file to seed and reuse, default: a temporary file'
+    )
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument(
+        '--history-sizes', type=lambda value: [int(v) for v in value.split(',')],
+        default=[100, 1000, 10000],
+        help='Transactions in the account of each report benchmark'
+    )
+    parser.add_argument(
+        '--account-counts', type=lambda value: [int(v) for v in value.split(',')],
+        default=[100, 1000, 10000],
+        help='Due accounts of each interest task benchmark'
+    )
+    parser.add_argument(
+        '--only', choices=['micro', 'posting', 'report', 'interest'],
+        action='append', help='Run only these groups'
+    )
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--compare', help='Results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(args.db or os.path.join(tmp, 'bench.sqlite3'))
+
+        groups = {
+            'micro': lambda: micro_benchmarks(args.repeat),
+            'posting': lambda: posting_benchmarks(args.repeat),
+            'report': lambda: report_benchmarks(args.repeat, args.history_sizes),
+            'interest': lambda: interest_benchmarks(args.repeat, args.account_counts),
+        }
+        results = {}
+        for group, run in groups.items():
+            if args.only and group not in args.only:
+                continue
+            for name, stats in run().items():
+                results[name] = stats
+                print(
+                    f'{name:>40}: {stats["median"] * 1e6:12.1f} us '
+                    f'(min {stats["min"] * 1e6:.1f})'
+                )
+        meta = metadata()
+
+    if args.json:
+        Path(args.json).parent.mkdir(parents=True, exist_ok=True)
+        with open(args.json, 'w') as f:
+            json.dump({'meta': meta, 'results': results}, f, indent=2)
+
+    if args.compare:
+        regressions = compare(results, args.compare, args.threshold)
+        if regressions:
+            print(f'Slower than {args.compare}: {", ".join(regressions)}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+"""
+Login throughput per password hasher profile.
+
+Every profile runs in its own process against its own SQLite database,
+with ``PASSWORD_HASHER_PROFILE`` set. Threads post the login form with
+a client each, as different customers. Logins per CPU second is the
+throughput one core sustains, the figure to size login capacity with.
+
+With ``--upgrade-from``, customers start with hashes of that profile,
+so every first login also replaces the hash with one of the measured
+profile.
+
+    python benchmarks/login_throughput.py --profiles pbkdf2,argon2,bcrypt
+    python benchmarks/login_throughput.py --profiles argon2 --upgrade-from pbkdf2
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking_system.settings')
+
+PASSWORD = 'Bench-Passw0rd'
+
+
+def customers(count, upgrade_from):
+    from django.conf import settings
+    from django.utils.module_loading import import_string
+
+    from accounts.hashing import make_password
+    from accounts.models import User
+
+    if upgrade_from:
+        hasher = import_string(
+            settings.PASSWORD_HASHER_PROFILES[upgrade_from]
+        )()
+        password_hash = hasher.encode(PASSWORD, hasher.salt())
+    else:
+        password_hash = make_password(PASSWORD)
+
+    User.objects.bulk_create(
+        User(email=f'{i}@login.bench.example.com', password=password_hash)
+        for i in range(count)
+    )
+    return [f'{i}@login.bench.example.com' for i in range(count)]
+
+
+def run(threads, logins, upgrade_from):
+    """
+    Log in ``logins`` times from each of ``threads`` threads and return
+    throughput and latency figures.
+    """
+    import django
+    django.setup()
+
+    from django.contrib.auth.hashers import get_hasher
+    from django.core.management import call_command
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    from accounts.models import User
+
+    setup_test_environment()
+    call_command('migrate', verbosity=0)
+    emails = customers(threads * logins, upgrade_from)
+    latencies = []
+    failures = []
+    lock = threading.Lock()
+
+    def worker(index):
+        mine = []
+        failed = 0
+        try:
+            for email in emails[index::threads]:
+                client = Client()
+                started = time.perf_counter()
+                response = client.post(
+                    '/accounts/login/',
+                    {'username': email, 'password': PASSWORD}
+                )
+                if response.status_code != 302:
+                    failed += 1
+                    continue
+                mine.append(time.perf_counter() - started)
+        finally:
+            connection.close()
+        with lock:
+            latencies.extend(mine)
+            failures.append(failed)
+
+    workers = [
+        threading.Thread(target=worker, args=(i,)) for i in range(threads)
+    ]
+    cpu_started = time.process_time()
+    started = time.perf_counter()
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    cpu = time.process_time() - cpu_started
+
+    algorithm = get_hasher().algorithm
+    latencies.sort()
+    return {
+        'hasher': algorithm,
+        'threads': threads,
+        'cpus': os.cpu_count(),
+        'logins': len(latencies),
+        'failed': sum(failures),
+        'upgraded': User.objects.filter(
+            email__in=emails, password__startswith=algorithm + '$'
+        ).count() if upgrade_from else 0,
+        'logins_per_sec': len(latencies) / elapsed,
+        'logins_per_cpu_sec': len(latencies) / cpu,
+        'p50_ms': latencies[len(latencies) // 2] * 1000 if latencies else None,
+        'p99_ms': latencies[int(len(latencies) * 0.99)] * 1000 if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--profiles', default='pbkdf2,argon2,bcrypt',
+        help='Comma separated settings.PASSWORD_HASHER_PROFILES'
+    )
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument(
+        '--logins', type=int, default=10, help='Logins per thread'
+    )
+    parser.add_argument(
+        '--upgrade-from',
+        help='Profile the stored hashes are made with, default the measured one'
+    )
+    parser.add_argument('--json', help='Write the results to this file')
+    parser.add_argument('--run', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run:
+        print(json.dumps(run(args.threads, args.logins, args.upgrade_from)))
+        return
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for profile in args.profiles.split(','):
+            env = dict(
+                os.environ,
+                PASSWORD_HASHER_PROFILE=profile,
+                DB_ENGINE='sqlite3',
+                DB_NAME=os.path.join(tmp, f'{profile}.sqlite3'),
+            )
+            command = [
+                sys.executable, __file__, '--run',
+                '--threads', str(args.threads),
+                '--logins', str(args.logins),
+            ]
+            if args.upgrade_from:
+                command += ['--upgrade-from', args.upgrade_from]
+            output = subprocess.run(
+                command, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            results[profile] = json.loads(output.strip().splitlines()[-1])
+            print(
+                f'{profile:>8}: {results[profile]["logins_per_sec"]:7.1f} logins/sec, '
+                f'{results[profile]["logins_per_cpu_sec"]:7.1f} logins/cpu sec, '
+                f'p50 {results[profile]["p50_ms"]:.1f} ms, '
+                f'p99 {results[profile]["p99_ms"]:.1f} ms, '
+                f'{results[profile]["failed"]} failed, '
+                f'{results[profile]["upgraded"]} upgraded'
+            )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
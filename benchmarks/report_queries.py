@@ -0,0 +1,253 @@
+"""
+Query plans and timings of the transaction report queries, without and
+with the composite transaction indexes.
+
+Seeds (or reuses) a SQLite database with ``--rows`` transactions spread
+over ``--accounts`` accounts and several years, then compares the old
+``timestamp__date__range`` filter with the half-open timestamp range and
+the keyset-paginated first page. The database is a temporary file unless
+``--db`` names one; the script refuses to touch a database holding other
+accounts than the ones it seeded.
+
+    python benchmarks/report_queries.py --rows 10000000 --db /tmp/bench.sqlite3
+"""
+import argparse
+import datetime
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+from decimal import Decimal
+from pathlib import Path
+
+import django
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'banking_system.settings')
+
+EMAIL_DOMAIN = '@report.bench.example.com'
+
+
+def setup(db):
+    from django.conf import settings
+
+    settings.DATABASES['default'] = dict(
+        settings.DATABASES['default'],
+        ENGINE='django.db.backends.sqlite3',
+        NAME=db
+    )
+    django.setup()
+
+    from django.core.management import call_command
+    call_command('migrate', verbosity=0)
+
+    from accounts.models import UserBankAccount
+    if UserBankAccount.objects.exclude(
+        user__email__endswith=EMAIL_DOMAIN
+    ).exists():
+        sys.exit(f'{db} holds accounts this benchmark did not seed')
+
+
+def seed(rows, accounts, years, batch_size=50000):
+    from django.db import connection, transaction
+
+    from accounts.models import BankAccountType, User, UserBankAccount
+    from accounts.numbers import account_numbers
+    from transactions.constants import DEPOSIT, WITHDRAWAL
+    from transactions.models import Transaction
+
+    account_type, _ = BankAccountType.objects.get_or_create(
+        name='Benchmark',
+        defaults={
+            'maximum_withdrawal_amount': 5000,
+            'annual_interest_rate': 5,
+            'interest_calculation_per_year': 12,
+        }
+    )
+
+    bench_accounts = UserBankAccount.objects.filter(
+        user__email__endswith=EMAIL_DOMAIN
+    )
+    existing = bench_accounts.count()
+    if existing < accounts:
+        users = User.objects.bulk_create(
+            User(
+                email=f'{i}{EMAIL_DOMAIN}',
+                password='!',
+                first_name='Bench',
+                last_name=str(i)
+            )
+            for i in range(existing, accounts)
+        )
+        if users[0].pk is None:
+            users = User.objects.filter(
+                email__in=[user.email for user in users]
+            )
+        UserBankAccount.objects.bulk_create(
+            UserBankAccount(
+                user=user,
+                account_type=account_type,
+                account_no=account_no
+            )
+            for user, account_no in zip(
+                users, account_numbers.reserve(len(users))
+            )
+        )
+
+    account_ids = list(bench_accounts.values_list('pk', flat=True))
+    missing = rows - Transaction.objects.filter(
+        account_id__in=bench_accounts.values('pk')
+    ).count()
+    if missing <= 0:
+        return
+
+    rng = random.Random(0)
+    end = datetime.datetime.now(datetime.timezone.utc)
+    span = int(datetime.timedelta(days=365 * years).total_seconds())
+    adapt = connection.ops.adapt_datetimefield_value
+    sql = (
+        f'INSERT INTO {Transaction._meta.db_table} '
+        '(account_id, amount, balance_after_transaction, '
+        'transaction_type, timestamp) VALUES (%s, %s, %s, %s, %s)'
+    )
+
+    started = time.perf_counter()
+    with connection.cursor() as cursor:
+        for offset in range(0, missing, batch_size):
+            with transaction.atomic():
+                cursor.executemany(sql, [
+                    (
+                        rng.choice(account_ids),
+                        Decimal(rng.randint(1000, 100000)) / 100,
+                        Decimal(rng.randint(0, 10000000)) / 100,
+                        rng.choice((DEPOSIT, WITHDRAWAL)),
+                        adapt(end - datetime.timedelta(
+                            seconds=rng.randint(0, span)
+                        )),
+                    )
+                    for _ in range(min(batch_size, missing - offset))
+                ])
+            print(
+                f'seeded {min(offset + batch_size, missing):,} / {missing:,} rows '
+                f'({time.perf_counter() - started:.0f}s)',
+                end='\r'
+            )
+        cursor.execute('ANALYZE')
+    print()
+
+
+def set_indexes(enabled):
+    from django.db import connection
+
+    from transactions.models import Transaction
+
+    with connection.cursor() as cursor:
+        existing = connection.introspection.get_constraints(
+            cursor, Transaction._meta.db_table
+        )
+
+    with connection.schema_editor() as schema_editor:
+        for index in Transaction._meta.indexes:
+            if enabled and index.name not in existing:
+                schema_editor.add_index(Transaction, index)
+            elif not enabled and index.name in existing:
+                schema_editor.remove_index(Transaction, index)
+
+
+def queries(days):
+    from django.db.models import Count
+    from django.utils import timezone
+
+    from transactions.models import Transaction
+    from transactions.pagination import keyset_page
+
+    account_id = Transaction.objects.values('account').annotate(
+        rows=Count('pk')
+    ).order_by('-rows').values_list('account', flat=True)[0]
+    last = timezone.localdate() - datetime.timedelta(days=30)
+    first = last - datetime.timedelta(days=days - 1)
+    start = timezone.make_aware(
+        datetime.datetime.combine(first, datetime.time())
+    )
+    end = timezone.make_aware(
+        datetime.datetime.combine(last, datetime.time())
+    ) + datetime.timedelta(days=1)
+
+    history = Transaction.objects.filter(account_id=account_id)
+    date_range = history.filter(
+        timestamp__date__range=[first.isoformat(), last.isoformat()]
+    ).distinct()
+    half_open = history.filter(timestamp__gte=start, timestamp__lt=end)
+
+    # ``.all()`` clones the queryset so every run hits the database.
+    return {
+        'date_range': (date_range, lambda: list(date_range.all())),
+        'half_open': (half_open, lambda: list(half_open.all())),
+        'keyset_page': (
+            half_open.order_by('timestamp', 'pk')[:51],
+            lambda: keyset_page(half_open, None, 50)
+        ),
+    }
+
+
+def measure(repeat, days, verbose):
+    results = {}
+    for name, (queryset, run) in queries(days).items():
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append(time.perf_counter() - started)
+        results[name] = {
+            'best_ms': min(timings) * 1000,
+            'plan': queryset.explain(),
+        }
+        if verbose:
+            print(f'-- {name}: {results[name]["best_ms"]:.2f} ms')
+            print(results[name]['plan'])
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument(
+        '--db', help='SQLite file to seed and reuse, default: a temporary file'
+    )
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--accounts', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--days', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--json', help='Write the results to this file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        setup(args.db or os.path.join(tmp, 'bench.sqlite3'))
+        seed(args.rows, args.accounts, args.years)
+
+        results = {}
+        try:
+            for label, enabled in (('before', False), ('after', True)):
+                print(f'== {label} (indexes {"on" if enabled else "off"})')
+                set_indexes(enabled)
+                results[label] = measure(args.repeat, args.days, verbose=True)
+        finally:
+            # Never leave a reused database without its indexes
+            set_indexes(True)
+
+    print('== summary (best of %d, ms)' % args.repeat)
+    for name in results['after']:
+        print(
+            f'{name:>12}: {results["before"][name]["best_ms"]:10.2f} '
+            f'-> {results["after"][name]["best_ms"]:10.2f}'
+        )
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
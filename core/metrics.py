@@ -0,0 +1,123 @@
+import threading
+from collections import defaultdict
+
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+
+
+class ViewStats:
+    """
+    Totals and a latency histogram of the requests served by one view.
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.template_seconds = 0.0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+
+class RequestMetrics:
+    """
+    Process wide per-view request metrics.
+
+    Every worker process keeps its own numbers, so a scraper has to
+    collect them from each process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.views = defaultdict(ViewStats)
+
+    def record(self, view, seconds, queries, db_seconds, template_seconds):
+        with self._lock:
+            stats = self.views[view]
+            stats.requests += 1
+            stats.queries += queries
+            stats.db_seconds += db_seconds
+            stats.template_seconds += template_seconds
+            stats.seconds += seconds
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    stats.buckets[i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                view: {
+                    'requests': stats.requests,
+                    'queries': stats.queries,
+                    'db_seconds': stats.db_seconds,
+                    'template_seconds': stats.template_seconds,
+                    'seconds': stats.seconds,
+                    'buckets': list(stats.buckets),
+                }
+                for view, stats in self.views.items()
+            }
+
+
+request_metrics = RequestMetrics()
+
+
+def _metric(lines, name, metric_type, help_text, samples):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} {metric_type}')
+    for labels, value in samples:
+        label_text = ','.join(f'{key}="{val}"' for key, val in labels.items())
+        lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+
+def render_prometheus():
+    """
+    The request, posting and balance cache metrics of this process in
+    the Prometheus text exposition format.
+    """
+    from accounts.cache import balance_cache_stats
+    from transactions.services import posting_stats
+
+    views = request_metrics.snapshot()
+    lines = []
+
+    lines.append('# HELP banking_request_duration_seconds Request latency per view.')
+    lines.append('# TYPE banking_request_duration_seconds histogram')
+    for view, stats in views.items():
+        for bound, count in zip(LATENCY_BUCKETS, stats['buckets']):
+            lines.append(
+                f'banking_request_duration_seconds_bucket{{view="{view}",le="{bound}"}} {count}'
+            )
+        lines.append(
+            f'banking_request_duration_seconds_bucket{{view="{view}",le="+Inf"}} {stats["requests"]}'
+        )
+        lines.append(f'banking_request_duration_seconds_sum{{view="{view}"}} {stats["seconds"]}')
+        lines.append(f'banking_request_duration_seconds_count{{view="{view}"}} {stats["requests"]}')
+
+    for name, key, help_text in (
+        ('banking_db_queries_total', 'queries', 'SQL queries issued per view.'),
+        ('banking_db_seconds_total', 'db_seconds', 'Time spent in SQL queries per view.'),
+        ('banking_template_seconds_total', 'template_seconds', 'Time spent rendering templates per view.'),
+    ):
+        _metric(lines, name, 'counter', help_text, [
+            ({'view': view}, stats[key]) for view, stats in views.items()
+        ])
+
+    postings = posting_stats.snapshot()
+    for key, help_text in (
+        ('postings', 'Postings applied.'),
+        ('rejected', 'Postings rejected by the overdraft guard.'),
+        ('conflicts', 'Posting attempts retried on a locked database.'),
+    ):
+        _metric(lines, f'banking_{key}_total', 'counter', help_text, [({}, postings[key])])
+
+    cache = balance_cache_stats.snapshot()
+    _metric(lines, 'banking_balance_cache_hits_total', 'counter',
+            'Balance lookups served from the cache.', [({}, cache['hits'])])
+    _metric(lines, 'banking_balance_cache_misses_total', 'counter',
+            'Balance lookups read from the database.', [({}, cache['misses'])])
+
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+from .metrics import request_metrics
+from .routers import current_routing, routing
+
+
+logger = logging.getLogger(__name__)
+
+
+class QueryCounter:
+    """
+    Query count and database time of one request.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_query_counter = ContextVar('query_counter', default=None)
+
+
+def count_queries(execute, sql, params, many, context):
+    """
+    Database execute wrapper adding every query to the ``QueryCounter``
+    of the current request.
+
+    It is installed on every connection (see ``core.signals``) and finds
+    the counter through a context variable, so queries an async view
+    runs through ``sync_to_async`` are counted for the right request.
+    """
+    counter = _query_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        counter.seconds += time.perf_counter() - started
+        counter.queries += 1
+
+
+class RequestMetricsMiddleware:
+    """
+    Record query count, database time, template render time and total
+    latency of every request per URL name.
+
+    The numbers are added to ``core.metrics.request_metrics`` and sent
+    back in a ``Server-Timing`` header. Requests issuing more than
+    ``settings.QUERY_BUDGET`` queries are logged as warnings.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, the way
+            # MiddlewareMixin does, so the async handler awaits it.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        counter, token, started = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        return self.finish(request, response, counter, started)
+
+    async def __acall__(self, request):
+        counter, token, started = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _query_counter.reset(token)
+        return self.finish(request, response, counter, started)
+
+    def start(self, request):
+        counter = QueryCounter()
+        request._template_seconds = 0.0
+        return counter, _query_counter.set(counter), time.perf_counter()
+
+    def finish(self, request, response, counter, started):
+        seconds = time.perf_counter() - started
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+
+        request_metrics.record(
+            view, seconds, counter.queries, counter.seconds,
+            request._template_seconds
+        )
+        response['Server-Timing'] = (
+            f'db;dur={counter.seconds * 1000:.1f};desc="{counter.queries} queries", '
+            f'tpl;dur={request._template_seconds * 1000:.1f}, '
+            f'total;dur={seconds * 1000:.1f}'
+        )
+
+        budget = settings.QUERY_BUDGET
+        if budget is not None and counter.queries > budget:
+            logger.warning(
+                '%s %s (%s) issued %d queries, budget is %d',
+                request.method, request.path, view, counter.queries, budget
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # Template responses are rendered right after this hook, so the
+        # post-render callback sees the whole render.
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._template_seconds += time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Route the reads of ``settings.REPLICA_VIEWS`` to a read replica.
+
+    A request that writes pins the browser session to the primary for
+    ``settings.REPLICA_PIN_SECONDS``, so the user's next pages include
+    their own postings even if the replicas lag behind. The pin is a
+    short-lived cookie rather than a session key, which would cost a
+    session write on every posting.
+    """
+    cookie_name = 'replica_pin'
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+
+        with routing(pinned=self.cookie_name in request.COOKIES) as state:
+            response = self.get_response(request)
+        return self.set_pin(response, state)
+
+    async def __acall__(self, request):
+        # The routing state is a context variable, the sync_to_async
+        # calls of the view see it too.
+        with routing(pinned=self.cookie_name in request.COOKIES) as state:
+            response = await self.get_response(request)
+        return self.set_pin(response, state)
+
+    def set_pin(self, response, state):
+        if state.wrote:
+            response.set_cookie(
+                self.cookie_name, '1',
+                max_age=settings.REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite='Lax'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.resolver_match.view_name in settings.REPLICA_VIEWS:
+            current_routing().read_only = True
@@ -0,0 +1,77 @@
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+_routing = contextvars.ContextVar('replica_routing', default=None)
+
+
+class RoutingState:
+    """
+    How the queries of the current request are routed.
+
+    ``replica`` is chosen once per request so all reads of a page see
+    the same replica, ``pinned`` keeps a session that wrote recently on
+    the primary and ``wrote`` records that this request wrote.
+    """
+
+    def __init__(self, pinned):
+        self.pinned = pinned
+        self.read_only = False
+        self.wrote = False
+        self.replica = (
+            random.choice(settings.DATABASE_REPLICAS)
+            if settings.DATABASE_REPLICAS else None
+        )
+
+
+@contextmanager
+def routing(pinned=False):
+    state = RoutingState(pinned)
+    token = _routing.set(state)
+    try:
+        yield state
+    finally:
+        _routing.reset(token)
+
+
+def current_routing():
+    return _routing.get()
+
+
+class ReplicaRouter:
+    """
+    Send the reads of read-only views to a replica and everything else
+    to the primary (``default``).
+
+    Reads only go to a replica inside a request marked read-only by
+    ``ReplicaRoutingMiddleware``, and not while the session is pinned
+    to the primary after a write. Sessions are always read from the
+    primary: a login newer than the replica would otherwise be lost.
+    """
+    primary_apps = {'sessions'}
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if (
+            state is None or not state.read_only or
+            state.pinned or state.replica is None or
+            model._meta.app_label in self.primary_apps
+        ):
+            return 'default'
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state.wrote = True
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
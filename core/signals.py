@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .middleware import count_queries
+
+
+@receiver(connection_created)
+def tune_sqlite(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for pragma, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute(f'PRAGMA {pragma} = {value}')
+
+
+@receiver(connection_created)
+def track_queries(sender, connection, **kwargs):
+    # Connected after tune_sqlite, so its pragmas are not counted.
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+
+
+@receiver(request_started)
+def check_persistent_connections(sender, **kwargs):
+    """
+    Close kept connections that stopped working (database restart,
+    pooler or firewall timeout), so the request opens a fresh one
+    instead of failing on its first query.
+    """
+    if not settings.DB_HEALTH_CHECKS:
+        return
+    for connection in connections.all():
+        if (
+            connection.connection is not None and
+            not connection.in_atomic_block and
+            not connection.is_usable()
+        ):
+            connection.close()
@@ -1,3 +1,164 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.sessions.models import Session
+from django.core.signals import request_started
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from accounts.models import BankAccountType, User, UserBankAccount
+from core.metrics import request_metrics
+from core.routers import ReplicaRouter, current_routing, routing
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        request_metrics.reset()
+        account_type = BankAccountType.objects.create(
+            name='Saving',
+            maximum_withdrawal_amount=5000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+        self.user = User.objects.create_user(
+            email='metrics@example.com', password='testpass'
+        )
+        UserBankAccount.objects.create(
+            user=self.user, account_type=account_type, account_no=1000
+        )
+        self.client.force_login(self.user)
+
+    def test_records_queries_and_timings_per_view(self):
+        response = self.client.get(reverse('transactions:transaction_report'))
+        self.assertIn('db;dur=', response['Server-Timing'])
+        self.assertIn('tpl;dur=', response['Server-Timing'])
+        self.assertIn('total;dur=', response['Server-Timing'])
+
+        stats = request_metrics.snapshot()['transactions:transaction_report']
+        self.assertEqual(stats['requests'], 1)
+        self.assertGreater(stats['queries'], 0)
+        self.assertGreater(stats['template_seconds'], 0)
+        self.assertGreaterEqual(stats['seconds'], stats['db_seconds'])
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint(self):
+        self.client.get(reverse('transactions:deposit_money'))
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn(
+            'banking_request_duration_seconds_count{view="transactions:deposit_money"} 1',
+            body
+        )
+        self.assertIn('banking_db_queries_total{view="transactions:deposit_money"}', body)
+        self.assertIn('banking_postings_total', body)
+        self.assertIn('banking_balance_cache_hits_total', body)
+
+    @override_settings(METRICS_TOKEN='scrape-token')
+    def test_metrics_endpoint_is_not_public(self):
+        response = self.client.get(reverse('metrics'))  # Neither staff nor token, even from localhost
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 404)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-tökén')
+        self.assertEqual(response.status_code, 404)  # Not a server error
+        self.client.logout()
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer scrape-token')
+        self.assertEqual(response.status_code, 200)
+
+    def test_metrics_endpoint_without_token(self):
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 404)
+        self.user.is_staff = True
+        self.user.save()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 200)
+
+    @override_settings(QUERY_BUDGET=1)
+    def test_logs_views_over_the_query_budget(self):
+        with self.assertLogs('core.middleware', 'WARNING') as logs:
+            self.client.get(reverse('transactions:transaction_report'))
+        self.assertIn('transactions:transaction_report', logs.output[0])
+
+
+class DatabaseConnectionTest(TransactionTestCase):
+    def test_sqlite_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+
+    def test_unusable_connection_is_closed_before_request(self):
+        connection.ensure_connection()
+        with mock.patch.object(connection, 'is_usable', return_value=False), \
+                mock.patch.object(connection, 'close') as close:
+            request_started.send(sender=self.__class__)
+        close.assert_called()
+
+    @override_settings(DB_HEALTH_CHECKS=False)
+    def test_health_checks_can_be_disabled(self):
+        connection.ensure_connection()
+        with mock.patch.object(connection, 'is_usable') as is_usable:
+            request_started.send(sender=self.__class__)
+        is_usable.assert_not_called()
+
+
+class ReplicaRoutingTest(TestCase):
+    def setUp(self):
+        account_type = BankAccountType.objects.create(
+            name='Saving',
+            maximum_withdrawal_amount=5000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+        self.user = User.objects.create_user(
+            email='replica@example.com', password='testpass'
+        )
+        UserBankAccount.objects.create(
+            user=self.user, account_type=account_type, account_no=1000
+        )
+        self.client.force_login(self.user)
+
+    @override_settings(DATABASE_REPLICAS=['replica0'])
+    def test_router(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(User), 'default')  # Outside a request
+        with routing() as state:
+            self.assertEqual(router.db_for_read(User), 'default')  # Not a read-only view
+            state.read_only = True
+            self.assertEqual(router.db_for_read(User), 'replica0')
+            self.assertEqual(router.db_for_read(Session), 'default')  # Logins must not lag
+            self.assertEqual(router.db_for_write(User), 'default')
+            self.assertTrue(state.wrote)
+        with routing(pinned=True) as state:
+            state.read_only = True
+            self.assertEqual(router.db_for_read(User), 'default')
+        self.assertFalse(router.allow_migrate('replica0', 'accounts'))
+        self.assertTrue(router.allow_migrate('default', 'accounts'))
+
+    def reads(self, method, url, data=None):
+        """
+        ``(read_only, pinned)`` of the routing of every read of a request.
+        """
+        seen = []
+
+        def record(router, model, **hints):
+            state = current_routing()
+            seen.append((state.read_only, state.pinned))
+            return 'default'
+
+        with mock.patch.object(ReplicaRouter, 'db_for_read', autospec=True, side_effect=record):
+            getattr(self.client, method)(url, data)
+        return set(seen)
+
+    def test_report_reads_are_read_only(self):
+        self.assertEqual(self.reads('get', reverse('transactions:transaction_report')), {(True, False)})
+        self.assertEqual(self.reads('get', reverse('transactions:deposit_money')), {(False, False)})
+
+    def test_posting_pins_the_browser_to_the_primary(self):
+        response = self.client.post(reverse('transactions:deposit_money'), {'amount': 100})
+        self.assertEqual(response.cookies['replica_pin']['max-age'], 10)
+        self.assertEqual(self.reads('get', reverse('transactions:transaction_report')), {(True, True)})
+
+        response = self.client.get(reverse('transactions:transaction_report'))
+        self.assertNotIn('replica_pin', response.cookies)  # Reads do not extend the pin
@@ -1,5 +1,34 @@
+import hmac
+
+from django.conf import settings
+from django.http import Http404, HttpResponse
 from django.views.generic import TemplateView
 
+from .metrics import render_prometheus
+
 
 class HomeView(TemplateView):
     template_name = 'core/index.html'
+
+
+def metrics(request):
+    """
+    Request, posting and cache metrics of this process for Prometheus.
+
+    Only served to staff users and to scrapers sending
+    ``Authorization: Bearer <METRICS_TOKEN>``.
+    """
+    token = settings.METRICS_TOKEN
+    if not (
+        request.user.is_staff or
+        # Bytes, as compare_digest() refuses non-ASCII strings
+        token and hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', '').encode(),
+            f'Bearer {token}'.encode()
+        )
+    ):
+        raise Http404
+    return HttpResponse(
+        render_prometheus(),
+        content_type='text/plain; version=0.0.4; charset=utf-8'
+    )
@@ -0,0 +1,56 @@
+import collections
+
+
+class LatencyHistogram:
+    """
+    Fixed-memory latency histogram in the style of HdrHistogram.
+
+    Values are recorded in microseconds into log-linear buckets: each
+    power of two is split into ``2 ** (significant_bits - 1)`` equal
+    buckets, so every recorded value is kept with a relative error
+    below ``2 ** -(significant_bits - 1)`` (under 1% by default) and
+    memory depends on the value range, not the number of samples.
+    """
+
+    def __init__(self, significant_bits=8):
+        self.significant_bits = significant_bits
+        self.counts = collections.Counter()
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def _bucket(self, value):
+        shift = max(0, value.bit_length() - self.significant_bits)
+        return (value >> shift) << shift
+
+    def record(self, milliseconds):
+        value = max(0, int(milliseconds * 1000))
+        self.counts[self._bucket(value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """
+        Latency in milliseconds below which ``percent`` of samples fall.
+        """
+        if not self.total:
+            return 0.0
+
+        rank = percent / 100 * self.total
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return bucket / 1000
+        return self.max / 1000
+
+    def summary(self):
+        return {
+            'count': self.total,
+            'mean_ms': self.sum / self.total / 1000 if self.total else 0.0,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max / 1000,
+        }
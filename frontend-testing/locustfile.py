@@ -1,46 +1,153 @@
-from locust import HttpUser, task, between, events
-import matplotlib.pyplot as plt
+"""
+Load test of the full banking workflow.
+
+Each simulated user logs in (or registers first) and then runs weighted
+deposit, withdraw and report tasks. Latencies are kept per endpoint in
+fixed-memory histograms and written as JSON when the run ends, so runs
+of different releases can be compared.
+
+Configuration through environment variables:
+
+    LOCUST_USER_POOL      email pattern of pre-seeded users, e.g.
+                          "bench{}@example.com"; users register
+                          themselves when unset
+    LOCUST_POOL_SIZE      number of users in the pool (default 1000)
+    LOCUST_PASSWORD       password of the pool users
+    LOCUST_HOT_ACCOUNT    email every simulated user logs in as, to
+                          measure contention on a single account
+    LOCUST_ACCOUNT_TYPE   account type id used when registering
+    LOCUST_SUMMARY        summary file (default locust_summary.json)
+    LOCUST_RELEASE        label stored in the summary
+
+    locust -f locustfile.py --headless -u 100 -r 10 -t 5m \\
+        --host http://127.0.0.1:8000
+
+Run it in standalone mode: with --processes or master/worker runs each
+worker keeps its own histograms.
+"""
+import json
+import os
+import random
+import time
+import uuid
+
+from locust import HttpUser, between, events, task
+
+from latency_histogram import LatencyHistogram
+
+
+USER_POOL = os.environ.get('LOCUST_USER_POOL')
+POOL_SIZE = int(os.environ.get('LOCUST_POOL_SIZE', 1000))
+PASSWORD = os.environ.get('LOCUST_PASSWORD', 'Locust-Pass-123')
+HOT_ACCOUNT = os.environ.get('LOCUST_HOT_ACCOUNT')
+ACCOUNT_TYPE = os.environ.get('LOCUST_ACCOUNT_TYPE', '1')
+SUMMARY_PATH = os.environ.get('LOCUST_SUMMARY', 'locust_summary.json')
+
+histograms = {}
+failures = {}
+started = time.time()
 
-latency_data = []
 
 @events.request.add_listener
-def on_request_success(request_type, name, response_time, response_length, **kwargs):
-    latency_data.append(response_time)
-
-class WebsiteUser(HttpUser):
-    wait_time = between(1, 3)  # Simulate wait time between requests
-
-    @task(2)  # Higher weight for login
-    def login(self):
-        # Replace with actual login data
-        self.client.post("/accounts/login/", {
-            "username": "email@example.com",
-            "password": "poiu0192",
-            "csrfmiddlewaretoken": "is1kTN8cifJ3AjBDBiBwKwSj133JQ3R4xGsoILB1RfM4lk20dCvfWHdBApgEtEL6",
-        })
-
-    # @task(1)  # Lower weight for registration
-    # def register(self):
-    #     # Replace with actual registration data
-    #     self.client.post("/accounts/register/", {
-    #         "username": "newuser",
-    #         "password": "newpassword",
-    #         "email": "newuser@example.com"
-    #     })
+def on_request(request_type, name, response_time, exception=None, **kwargs):
+    key = f'{request_type} {name}'
+    if exception:
+        failures[key] = failures.get(key, 0) + 1
+        return
+    histograms.setdefault(key, LatencyHistogram()).record(response_time)
 
-    def on_start(self):
-        # This method runs when a simulated user starts
-        pass
 
 @events.quitting.add_listener
 def on_quitting(environment, **kwargs):
-    # Plot latency results when the test is done
-    plt.figure(figsize=(10, 5))
-    plt.plot(latency_data, label='Response Time (ms)', color='blue')
-    plt.title('Response Time for Login and Registration over Time')
-    plt.xlabel('Requests')
-    plt.ylabel('Response Time (ms)')
-    plt.legend()
-    plt.grid(True)
-    plt.savefig('latency_plot.png')  # Save the plot as an image
-    plt.show()  # Show the plot
+    endpoints = {}
+    for key in sorted(set(histograms) | set(failures)):
+        endpoints[key] = histograms.get(key, LatencyHistogram()).summary()
+        endpoints[key]['failures'] = failures.get(key, 0)
+
+    with open(SUMMARY_PATH, 'w') as f:
+        json.dump({
+            'release': os.environ.get('LOCUST_RELEASE'),
+            'host': environment.host,
+            'hot_account': HOT_ACCOUNT,
+            'duration_s': time.time() - started,
+            'endpoints': endpoints,
+        }, f, indent=2)
+
+
+class BankUser(HttpUser):
+    wait_time = between(1, 3)
+
+    def csrf_post(self, form_url, url, data, name):
+        """
+        Fetch ``form_url`` for a fresh CSRF cookie, then post ``data``.
+        """
+        self.client.get(form_url, name=f'{name} (form)')
+        data['csrfmiddlewaretoken'] = self.client.cookies.get('csrftoken', '')
+        return self.client.post(
+            url, data,
+            headers={'Referer': self.host + form_url},
+            name=name,
+            allow_redirects=False
+        )
+
+    def register(self):
+        email = f'locust-{uuid.uuid4().hex}@example.com'
+        response = self.csrf_post(
+            '/accounts/register/', '/accounts/register/', {
+                'first_name': 'Load',
+                'last_name': 'Test',
+                'email': email,
+                'password1': PASSWORD,
+                'password2': PASSWORD,
+                'account_type': ACCOUNT_TYPE,
+                'gender': 'M',
+                'birth_date': '1990-01-01',
+                'street_address': '1 Load Street',
+                'city': 'Benchmark',
+                'postal_code': '12345',
+                'country': 'Testland',
+            }, name='register'
+        )
+        # Registration logs the new user in
+        return response.status_code == 302
+
+    def login(self, email):
+        response = self.csrf_post(
+            '/accounts/login/', '/accounts/login/', {
+                'username': email,
+                'password': PASSWORD,
+            }, name='login'
+        )
+        return response.status_code == 302
+
+    def on_start(self):
+        if HOT_ACCOUNT:
+            self.login(HOT_ACCOUNT)
+        elif USER_POOL:
+            self.login(USER_POOL.format(random.randrange(POOL_SIZE)))
+        else:
+            self.register()
+            # The first deposit makes withdrawals possible
+            self.deposit(amount=1000)
+
+    @task(3)
+    def deposit(self, amount=None):
+        self.csrf_post(
+            '/transactions/deposit/', '/transactions/deposit/', {
+                'amount': amount or random.randint(10, 500),
+                'transaction_type': 1,
+            }, name='deposit'
+        )
+
+    @task(2)
+    def withdraw(self):
+        self.csrf_post(
+            '/transactions/withdraw/', '/transactions/withdraw/', {
+                'amount': random.randint(10, 100),
+                'transaction_type': 2,
+            }, name='withdraw'
+        )
+
+    @task(4)
+    def report(self):
+        self.client.get('/transactions/report/', name='report')
@@ -0,0 +1,182 @@
+"""
+End-to-end user flows, run in-process through Django's test client.
+
+These replace the Selenium scripts that drove a real Chrome against a
+running dev server: no browser, server or network is needed, pages are
+navigated by link text rather than absolute XPaths, and every flow is
+a test case class of its own on ``UserFlowTestCase``, so the flows run
+in parallel with
+
+    python manage.py test functional_tests --parallel
+"""
+import re
+from decimal import Decimal
+from html.parser import HTMLParser
+
+from django.test import TestCase, override_settings
+
+from accounts.models import BankAccountType, User, UserBankAccount
+
+
+class PageParser(HTMLParser):
+    """
+    Collects the links and table rows of a rendered page.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.links = {}
+        self.rows = []
+        self._href = None
+        self._row = None
+        self._cell = None
+        self._text = []
+
+    def handle_starttag(self, tag, attrs):
+        attrs = dict(attrs)
+        if tag == 'a':
+            self._href = attrs.get('href')
+            self._text = []
+        elif tag == 'tr':
+            self._row = []
+        elif tag in ('td', 'th') and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == 'a' and self._href is not None:
+            self.links[' '.join(''.join(self._text).split())] = self._href
+            self._href = None
+        elif tag in ('td', 'th') and self._cell is not None:
+            self._row.append(' '.join(''.join(self._cell).split()))
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            self.rows.append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._href is not None:
+            self._text.append(data)
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def parse(response):
+    parser = PageParser()
+    parser.feed(response.content.decode())
+    return parser
+
+
+def money(text):
+    return Decimal(re.sub(r'[^\d.]', '', text))
+
+
+@override_settings(
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']
+)
+class UserFlowTestCase(TestCase):
+    """
+    A customer with an empty saving account, and the steps of a flow.
+    """
+    email = 'email@example.com'
+    password = 'poiu0192'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.account_type = BankAccountType.objects.create(
+            name='saving',
+            maximum_withdrawal_amount=5000,
+            annual_interest_rate=5,
+            interest_calculation_per_year=12
+        )
+        user = User.objects.create_user(email=cls.email, password=cls.password)
+        UserBankAccount.objects.create(
+            user=user,
+            account_type=cls.account_type,
+            account_no=1000000001
+        )
+
+    def click(self, response, text):
+        """
+        Follow the link labelled ``text`` on the page of ``response``.
+        """
+        links = parse(response).links
+        self.assertIn(text, links, f'No "{text}" link on the page')
+        return self.client.get(links[text])
+
+    def login(self):
+        home = self.client.get('/')
+        login_page = self.click(home, 'Login')
+        response = self.client.post(
+            login_page.request['PATH_INFO'],
+            {'username': self.email, 'password': self.password},
+            follow=True
+        )
+        self.assertTrue(response.context['user'].is_authenticated)
+        return response
+
+    def submit_amount(self, page, amount):
+        return self.client.post(
+            page.request['PATH_INFO'], {'amount': amount}, follow=True
+        )
+
+
+class RegistrationFlowTests(UserFlowTestCase):
+    def test_register(self):
+        register_page = self.click(self.client.get('/'), 'Register')
+        response = self.client.post(register_page.request['PATH_INFO'], {
+            'first_name': 'FirstName',
+            'last_name': 'LastName',
+            'email': 'email5@example.com',
+            'account_type': self.account_type.pk,
+            'gender': 'M',
+            'birth_date': '1990-01-01',
+            'password1': 'Poiu-0192-x',
+            'password2': 'Poiu-0192-x',
+            'street_address': '123 Street',
+            'city': 'CityName',
+            'postal_code': '12345',
+            'country': 'CountryName',
+        }, follow=True)
+        self.assertContains(response, 'Thank You For Creating A Bank Account')
+
+
+class LoginFlowTests(UserFlowTestCase):
+    def test_login_shows_banking_links(self):
+        links = parse(self.login()).links
+        for text in ('Transaction Report', 'Deposit', 'Withdraw', 'Logout'):
+            self.assertIn(text, links)
+
+
+class DepositFlowTests(UserFlowTestCase):
+    def test_deposit(self):
+        deposit_page = self.click(self.login(), 'Deposit')
+        response = self.submit_amount(deposit_page, 100)
+        self.assertContains(response, '100$ was deposited to your account')
+
+
+class WithdrawFlowTests(UserFlowTestCase):
+    def test_withdraw(self):
+        home = self.login()
+        self.submit_amount(self.click(home, 'Deposit'), 500)
+        response = self.submit_amount(self.click(home, 'Withdraw'), 200)
+        self.assertContains(response, 'Successfully withdrawn 200$')
+
+
+class TransactionReportFlowTests(UserFlowTestCase):
+    def test_balance_matches_transactions(self):
+        home = self.login()
+        for link, amount in [('Deposit', 300), ('Withdraw', 120), ('Deposit', 45)]:
+            self.submit_amount(self.click(home, link), amount)
+
+        rows = parse(self.click(home, 'Transaction Report')).rows
+        calculated = Decimal(0)
+        for cells in rows:
+            if len(cells) == 4 and cells[0] == 'Deposit':
+                calculated += money(cells[2])
+            elif len(cells) == 4 and cells[0] == 'Withdrawal':
+                calculated -= money(cells[2])
+        final_balance = next(
+            money(cells[1]) for cells in rows if cells[0] == 'Final Balance'
+        )
+        self.assertEqual(calculated, Decimal('225'))
+        self.assertEqual(final_balance, calculated)
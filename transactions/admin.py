@@ -1,5 +1,13 @@
 from django.contrib import admin
 
-from transactions.models import Transaction
+from transactions.models import (
+    DailyBalanceSnapshot,
+    InterestRun,
+    OutboxEvent,
+    Transaction,
+)
 
+admin.site.register(DailyBalanceSnapshot)
+admin.site.register(InterestRun)
+admin.site.register(OutboxEvent)
 admin.site.register(Transaction)
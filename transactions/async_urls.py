@@ -0,0 +1,15 @@
+from django.urls import path
+
+from .async_views import deposit_money, transaction_report, withdraw_money
+from .views import TransactionExportView
+
+
+app_name = 'transactions'
+
+
+urlpatterns = [
+    path("deposit/", deposit_money, name="deposit_money"),
+    path("export/", TransactionExportView.as_view(), name="transaction_export"),
+    path("report/", transaction_report, name="transaction_report"),
+    path("withdraw/", withdraw_money, name="withdraw_money"),
+]
@@ -0,0 +1,89 @@
+"""
+Async versions of the deposit, withdraw and report views, served when
+the project runs under ASGI (see ``banking_system/asgi_urls.py``).
+
+Django 3.2 has no async ORM, so each view loads the user once through
+``aget_user`` and runs its database work in ``sync_to_async`` calls;
+the event loop is free while those run. Template responses are
+returned unrendered and rendered by Django's async handler.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
+from django.urls import reverse
+
+from accounts.backends import aget_user
+from transactions.constants import DEPOSIT, WITHDRAWAL
+from transactions.forms import DepositForm, WithdrawForm
+from transactions.services import InsufficientFunds, post_transaction
+from transactions.views import (
+    DepositMoneyView,
+    TransactionRepostView,
+    WithdrawMoneyView,
+)
+
+
+def login_required(view):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        user = await aget_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+async def create_transaction(request, form_class, transaction_type, view_class):
+    account = request.user.account
+    form = form_class(
+        request.POST if request.method == 'POST' else None,
+        account=account,
+        initial={'transaction_type': transaction_type}
+    )
+
+    if request.method == 'POST' and await sync_to_async(form.is_valid)():
+        amount = form.cleaned_data['amount']
+        try:
+            await sync_to_async(post_transaction)(
+                account, amount, transaction_type
+            )
+        except InsufficientFunds as e:
+            form.add_error('amount', str(e))
+        else:
+            messages.success(
+                request, view_class.success_message.format(amount=amount)
+            )
+            return HttpResponseRedirect(
+                reverse('transactions:transaction_report')
+            )
+
+    return TemplateResponse(request, view_class.template_name, {
+        'form': form,
+        'title': view_class.title,
+    })
+
+
+@login_required
+async def deposit_money(request):
+    return await create_transaction(
+        request, DepositForm, DEPOSIT, DepositMoneyView
+    )
+
+
+@login_required
+async def withdraw_money(request):
+    return await create_transaction(
+        request, WithdrawForm, WITHDRAWAL, WithdrawMoneyView
+    )
+
+
+@login_required
+async def transaction_report(request):
+    # The report's queries all run in one worker thread call
+    view = TransactionRepostView()
+    view.setup(request)
+    return await sync_to_async(view.get)(request)
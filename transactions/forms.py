@@ -2,7 +2,9 @@ import datetime
 
 from django import forms
 from django.conf import settings
+from django.utils import timezone
 
+from accounts.cache import get_account_type
 from .models import Transaction
 
 
@@ -48,7 +50,7 @@ class WithdrawForm(TransactionForm):
         account = self.account
         min_withdraw_amount = settings.MINIMUM_WITHDRAWAL_AMOUNT
         max_withdraw_amount = (
-            account.account_type.maximum_withdrawal_amount
+            get_account_type(account.account_type_id).maximum_withdrawal_amount
         )
         balance = account.balance
 
@@ -78,11 +80,9 @@ class TransactionDateRangeForm(forms.Form):
 
     def clean_daterange(self):
         daterange = self.cleaned_data.get("daterange")
-        print(daterange)
 
         try:
             daterange = daterange.split(' - ')
-            print(daterange)
             if len(daterange) == 2:
                 for date in daterange:
                     datetime.datetime.strptime(date, '%Y-%m-%d')
@@ -91,3 +91,23 @@ class TransactionDateRangeForm(forms.Form):
                 raise forms.ValidationError("Please select a date range.")
         except (ValueError, AttributeError):
             raise forms.ValidationError("Invalid date range")
+
+    def get_timestamp_range(self):
+        """
+        The selected dates as a half-open ``[start, end)`` datetime range.
+
+        Filtering with ``timestamp >= start AND timestamp < end`` keeps
+        the column bare, so the database can use an index on it (unlike
+        ``timestamp__date__range``). Returns ``None`` if no range is set.
+        """
+        daterange = self.cleaned_data.get('daterange')
+        if not daterange:
+            return None
+
+        start, end = (
+            datetime.datetime.strptime(date, '%Y-%m-%d') for date in daterange
+        )
+        return (
+            timezone.make_aware(start),
+            timezone.make_aware(end + datetime.timedelta(days=1))
+        )
@@ -0,0 +1,188 @@
+import csv
+import datetime
+import json
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from dateutil.relativedelta import relativedelta
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from accounts.cache import get_account_type, invalidate_all_balances
+from accounts.models import UserBankAccount
+from transactions.constants import (
+    DEPOSIT, TRANSACTION_TYPE_CHOICES, WITHDRAWAL
+)
+from transactions.models import Transaction
+
+
+AMOUNT_FIELD = Transaction._meta.get_field('amount')
+
+TRANSACTION_TYPES = {
+    label.lower(): value for value, label in TRANSACTION_TYPE_CHOICES
+}
+TRANSACTION_TYPES.update({
+    str(value): value for value, _ in TRANSACTION_TYPE_CHOICES
+})
+
+
+class RowError(Exception):
+    """
+    A row of the import file that can not be posted.
+    """
+
+    def __init__(self, line, message):
+        self.line = line
+        super().__init__(f'line {line}: {message}')
+
+
+def read_rows(f, file_format):
+    """
+    Yield ``(line_number, row)`` pairs from a CSV or NDJSON file.
+
+    Rows have ``account_no``, ``timestamp``, ``transaction_type`` and
+    ``amount`` keys and must be in chronological order per account:
+    rows older than their account's latest transaction are rejected.
+    """
+    if file_format == 'csv':
+        # Line 1 is the header
+        yield from enumerate(csv.DictReader(f), start=2)
+    else:
+        for line, text in enumerate(f, start=1):
+            if text.strip():
+                yield line, text
+
+
+def parse_row(line, row):
+    """
+    ``(account_no, timestamp, transaction_type, amount)`` from a raw row.
+    """
+    try:
+        if isinstance(row, str):
+            row = json.loads(row)
+        account_no = int(row['account_no'])
+        timestamp = datetime.datetime.fromisoformat(row['timestamp'])
+        transaction_type = TRANSACTION_TYPES[
+            str(row['transaction_type']).strip().lower()
+        ]
+        amount = Decimal(str(row['amount']))
+        # NaN and infinities do not compare or quantize
+        if not amount.is_finite() or amount <= 0:
+            raise RowError(line, 'amount must be positive')
+        amount = amount.quantize(Decimal('0.01'))
+        # More digits than the column holds
+        AMOUNT_FIELD.run_validators(amount)
+    except KeyError as e:
+        raise RowError(line, f'missing or unknown value {e}')
+    except (TypeError, ValueError, InvalidOperation) as e:
+        raise RowError(line, str(e))
+    except ValidationError as e:
+        raise RowError(line, ' '.join(e.messages))
+
+    if timezone.is_naive(timestamp):
+        timestamp = timezone.make_aware(timestamp)
+
+    return account_no, timestamp, transaction_type, amount
+
+
+def import_batch(rows):
+    """
+    Validate and post one batch of ``(line_number, row)`` pairs.
+
+    The batch's accounts are locked and read once, each row's
+    ``balance_after_transaction`` is computed from the running balance,
+    transactions are written with one ``bulk_create`` and every touched
+    account's balance with one ``bulk_update``. The first deposit sets
+    the account's ``initial_deposit_date`` and ``interest_start_date``
+    as ``post_transaction`` does, from the row's date. Rows that fail
+    validation or are older than their account's latest transaction
+    are skipped. Returns ``(imported, errors)``.
+    """
+    parsed = []
+    errors = []
+    for line, row in rows:
+        try:
+            parsed.append((line, parse_row(line, row)))
+        except RowError as e:
+            errors.append(e)
+
+    with transaction.atomic():
+        accounts = UserBankAccount.objects.select_for_update().in_bulk(
+            {account_no for _, (account_no, *_) in parsed},
+            field_name='account_no'
+        )
+        latest = dict(
+            Transaction.objects.filter(
+                account__in=accounts.values()
+            ).values('account').annotate(
+                latest=Max('timestamp')
+            ).values_list('account', 'latest')
+        )
+        transactions = []
+
+        for line, (account_no, timestamp, transaction_type, amount) in parsed:
+            account = accounts.get(account_no)
+            if account is None:
+                errors.append(RowError(line, f'unknown account {account_no}'))
+                continue
+
+            if account.pk in latest and timestamp < latest[account.pk]:
+                errors.append(RowError(
+                    line, f'{timestamp.isoformat()} is before the latest '
+                    f'transaction of account {account_no}'
+                ))
+                continue
+
+            if transaction_type == WITHDRAWAL:
+                if amount > account.balance:
+                    errors.append(RowError(
+                        line, f'withdrawal of {amount} exceeds balance '
+                        f'{account.balance} of account {account_no}'
+                    ))
+                    continue
+                account.balance -= amount
+            else:
+                account.balance += amount
+
+            if transaction_type == DEPOSIT:
+                day = timezone.localdate(timestamp)
+                next_interest_month = int(
+                    12 / get_account_type(
+                        account.account_type_id
+                    ).interest_calculation_per_year
+                )
+                if account.initial_deposit_date is None:
+                    account.initial_deposit_date = day
+                if account.interest_start_date is None:
+                    account.interest_start_date = (
+                        day + relativedelta(months=+next_interest_month)
+                    )
+
+            latest[account.pk] = timestamp
+            transactions.append(Transaction(
+                account=account,
+                amount=amount,
+                transaction_type=transaction_type,
+                balance_after_transaction=account.balance,
+                timestamp=timestamp
+            ))
+
+        Transaction.objects.bulk_create(transactions)
+        UserBankAccount.objects.bulk_update(
+            accounts.values(),
+            ['balance', 'initial_deposit_date', 'interest_start_date']
+        )
+        invalidate_all_balances()
+
+    return len(transactions), sorted(errors, key=lambda error: error.line)
+
+
+def batches(rows, batch_size):
+    rows = iter(rows)
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            return
+        yield batch
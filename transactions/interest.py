@@ -0,0 +1,244 @@
+import datetime
+import logging
+import resource
+import sys
+import time
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, Max, Min, OuterRef, Subquery, Value
+from django.db.models.functions import ExtractMonth, Mod
+from django.utils import timezone
+
+from accounts.cache import invalidate_all_balances
+from accounts.models import BankAccountType, UserBankAccount
+from transactions.constants import INTEREST
+from transactions.models import InterestRun, Transaction
+
+
+logger = logging.getLogger(__name__)
+
+
+def interest_period(today):
+    """
+    The interest period ``today`` is in, as the first day of its month.
+    """
+    return datetime.date(today.year, today.month, 1)
+
+
+def max_rss():
+    """
+    Peak resident set size of this process so far, in bytes.
+    """
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage if sys.platform == 'darwin' else usage * 1024
+
+
+def due_accounts(today):
+    """
+    Accounts that should be credited with interest in ``today``'s month.
+
+    This is the SQL form of ``get_interest_calculation_months()``:
+    an account is due when the current month is on or after the month
+    of ``interest_start_date`` and a whole number of intervals away.
+    Accounts with an ``InterestRun`` for this period are left out, so
+    running the same period again only picks up what is left.
+    """
+    credited = InterestRun.objects.filter(
+        account=OuterRef('pk'),
+        period=interest_period(today)
+    )
+
+    return UserBankAccount.objects.filter(
+        balance__gt=0,
+        interest_start_date__lte=today,
+        initial_deposit_date__isnull=False
+    ).annotate(
+        month_offset=(
+            Value(today.month) - ExtractMonth('interest_start_date')
+        ),
+        interval=(
+            Value(12) / F('account_type__interest_calculation_per_year')
+        ),
+    ).filter(
+        month_offset__gte=0
+    ).annotate(
+        interval_offset=Mod('month_offset', 'interval')
+    ).filter(
+        interval_offset=0
+    ).exclude(
+        Exists(credited)
+    )
+
+
+def shard_ranges(shard_size):
+    """
+    Split the account primary key space into ``[start, end)`` ranges
+    of at most ``shard_size`` ids each.
+    """
+    bounds = UserBankAccount.objects.aggregate(
+        first=Min('pk'), last=Max('pk')
+    )
+    if bounds['first'] is None:
+        return []
+
+    return [
+        (start, min(start + shard_size, bounds['last'] + 1))
+        for start in range(bounds['first'], bounds['last'] + 1, shard_size)
+    ]
+
+
+def next_chunk(queryset, last_pk, chunk_size):
+    """
+    The next ``chunk_size`` rows of ``queryset`` after ``last_pk``.
+
+    Uses keyset pagination (``pk > last_pk``) so every chunk is an
+    index range scan no matter how deep into the table we are. The
+    rows are locked until the surrounding transaction ends.
+    """
+    return list(
+        queryset.select_for_update(of=('self',)).filter(
+            pk__gt=last_pk
+        ).order_by('pk').values_list(
+            'pk', 'balance', 'account_type_id'
+        )[:chunk_size]
+    )
+
+
+def compute_interest(chunk, account_types):
+    """
+    Interest for every ``(pk, balance, account_type_id)`` row of a chunk.
+
+    Balances are grouped by account type and each group is handed to
+    the ``calculate_interest_batch`` of its type in ``account_types``.
+    """
+    groups = defaultdict(list)
+    for i, (_, _, account_type_id) in enumerate(chunk):
+        groups[account_type_id].append(i)
+
+    interests = [None] * len(chunk)
+    for account_type_id, indexes in groups.items():
+        batch = account_types[account_type_id].calculate_interest_batch(
+            [chunk[i][1] for i in indexes]
+        )
+        for i, interest in zip(indexes, batch):
+            interests[i] = interest
+    return interests
+
+
+def credit_chunk(chunk, period, account_types):
+    """
+    Credit interest to one chunk of accounts.
+
+    Every account gets an ``InterestRun`` row for ``period``, balances
+    are increased by their ledger amount in one ``UPDATE`` and the
+    ``INTEREST`` transactions are written with one ``bulk_create``.
+    Must run inside the same transaction as the chunk read: the
+    ledger's unique constraint turns a concurrent second credit into an
+    ``IntegrityError``. Returns the number of accounts credited and the
+    total interest paid.
+    """
+    interests = compute_interest(chunk, account_types)
+    credited = []
+    transactions = []
+
+    InterestRun.objects.bulk_create([
+        InterestRun(account_id=pk, period=period, amount=interest)
+        for (pk, _, _), interest in zip(chunk, interests)
+    ])
+
+    for (pk, balance, _), interest in zip(chunk, interests):
+        if not interest:
+            continue
+        new_balance = balance + interest
+        credited.append(pk)
+        transactions.append(
+            Transaction(
+                account_id=pk,
+                transaction_type=INTEREST,
+                amount=interest,
+                balance_after_transaction=new_balance
+            )
+        )
+
+    if credited:
+        # One set-based UPDATE instead of bulk_update's CASE WHEN per
+        # row; the chunk is locked, so the balances are still the ones
+        # the interest was computed from.
+        UserBankAccount.objects.filter(pk__in=credited).update(
+            balance=F('balance') + Subquery(
+                InterestRun.objects.filter(
+                    account=OuterRef('pk'), period=period
+                ).values('amount')
+            )
+        )
+        Transaction.objects.bulk_create(transactions)
+        invalidate_all_balances()
+
+    return len(credited), sum(
+        (transaction_obj.amount for transaction_obj in transactions),
+        Decimal(0)
+    )
+
+
+def run_interest(today=None, chunk_size=None, start_pk=None, end_pk=None,
+                 max_chunks=None):
+    """
+    Credit interest to every account that is due this month.
+
+    ``start_pk`` and ``end_pk`` restrict the run to one ``[start, end)``
+    shard of the account id space and ``max_chunks`` stops the run
+    early, so a period can be worked through in small batches. Each
+    chunk is locked, computed and written in its own short transaction.
+    Returns a summary with per chunk rows/sec and the process's peak
+    resident set size (in bytes) after the chunk.
+    """
+    today = today or timezone.localdate()
+    period = interest_period(today)
+    chunk_size = chunk_size or settings.INTEREST_CHUNK_SIZE
+    queryset = due_accounts(today)
+
+    if start_pk is not None:
+        queryset = queryset.filter(pk__gte=start_pk)
+    if end_pk is not None:
+        queryset = queryset.filter(pk__lt=end_pk)
+
+    # Read once per run from the database, not from the process cache
+    # of account types, which a worker may hold since before a rate
+    # change made in another process
+    account_types = BankAccountType.objects.in_bulk()
+    summary = {
+        'accounts': 0,
+        'interest': Decimal(0),
+        'chunks': [],
+    }
+
+    last_pk = 0
+    while max_chunks is None or len(summary['chunks']) < max_chunks:
+        started = time.perf_counter()
+
+        with transaction.atomic():
+            chunk = next_chunk(queryset, last_pk, chunk_size)
+            if not chunk:
+                break
+            credited, interest = credit_chunk(chunk, period, account_types)
+
+        elapsed = time.perf_counter() - started
+        last_pk = chunk[-1][0]
+        chunk_stats = {
+            'last_pk': last_pk,
+            'rows': len(chunk),
+            'credited': credited,
+            'rows_per_sec': len(chunk) / elapsed if elapsed else 0.0,
+            'max_rss': max_rss(),
+        }
+        logger.info('Interest chunk: %s', chunk_stats)
+
+        summary['accounts'] += credited
+        summary['interest'] += interest
+        summary['chunks'].append(chunk_stats)
+
+    return summary
@@ -0,0 +1,45 @@
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from transactions.interest import shard_ranges
+from transactions.models import Transaction
+from transactions.snapshots import rebuild_snapshots, record_progress
+
+
+class Command(BaseCommand):
+    help = 'Rebuild daily balance snapshots from the transaction history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--start', type=datetime.date.fromisoformat,
+            help='First day to rebuild (YYYY-MM-DD), default: all history'
+        )
+        parser.add_argument(
+            '--end', type=datetime.date.fromisoformat,
+            help='Last day to rebuild (YYYY-MM-DD), default: today'
+        )
+        parser.add_argument(
+            '--accounts-per-batch', type=int,
+            default=settings.SNAPSHOT_BATCH_SIZE,
+            help='Number of account ids rebuilt per transaction'
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        # Later transactions are left to update_balance_snapshots
+        latest = Transaction.objects.aggregate(latest=Max('pk'))['latest']
+        for start_pk, end_pk in shard_ranges(options['accounts_per_batch']):
+            total += rebuild_snapshots(
+                start_date=options['start'],
+                end_date=options['end'],
+                start_pk=start_pk,
+                end_pk=end_pk
+            )
+            self.stdout.write(f'accounts {start_pk}-{end_pk - 1}: {total} snapshots')
+
+        if options['start'] is None and options['end'] is None:
+            record_progress(latest or 0)
+        self.stdout.write(self.style.SUCCESS(f'Wrote {total} snapshots'))
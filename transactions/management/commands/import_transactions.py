@@ -0,0 +1,59 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from transactions.importer import batches, import_batch, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Bulk import transactions from a CSV or NDJSON ledger file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='File to import')
+        parser.add_argument(
+            '--format', choices=['csv', 'ndjson'],
+            help='File format, guessed from the extension by default'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=settings.IMPORT_BATCH_SIZE,
+            help='Rows validated and written per transaction'
+        )
+        parser.add_argument(
+            '--max-errors', type=int, default=100,
+            help='Abort after this many invalid rows'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        file_format = options['format'] or (
+            'ndjson' if path.endswith(('.ndjson', '.jsonl')) else 'csv'
+        )
+
+        imported = 0
+        failed = 0
+        started = time.perf_counter()
+
+        with open(path, newline='') as f:
+            for batch in batches(read_rows(f, file_format), options['batch_size']):
+                count, errors = import_batch(batch)
+                imported += count
+                failed += len(errors)
+
+                for error in errors:
+                    self.stderr.write(str(error))
+                if failed > options['max_errors']:
+                    raise CommandError(
+                        f'Aborted after {failed} invalid rows '
+                        f'({imported} rows imported)'
+                    )
+
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{imported} rows imported, {failed} rejected '
+                    f'({imported / elapsed:.0f} rows/sec)'
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} transactions, rejected {failed}'
+        ))
@@ -0,0 +1,98 @@
+import datetime
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from accounts.models import User
+from transactions.seeding import account_types, seed_batch
+from transactions.snapshots import start_of_day
+
+
+class Command(BaseCommand):
+    help = 'Seed the database with synthetic customers for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Number of customers to create'
+        )
+        parser.add_argument(
+            '--tx-per-account', type=int, default=20,
+            help='Transactions in the history of each account'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed, the same seed always produces the same data'
+        )
+        parser.add_argument(
+            '--start', type=int, default=0,
+            help='Index of the first customer, to add to an earlier seeding'
+        )
+        parser.add_argument(
+            '--days', type=int, default=730,
+            help='Accounts are opened over this many days before --until'
+        )
+        parser.add_argument(
+            '--until', type=datetime.date.fromisoformat,
+            help='Day the generated history ends (YYYY-MM-DD), default: today'
+        )
+        parser.add_argument(
+            '--email-pattern', default='user{}@example.com',
+            help='Email of customer N, "{}" is replaced by N'
+        )
+        parser.add_argument(
+            '--password', default='password',
+            help='Password of every seeded customer'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Customers written per transaction'
+        )
+
+    def handle(self, *args, **options):
+        users = options['users']
+        if users < 1 or options['tx_per_account'] < 1:
+            raise CommandError('--users and --tx-per-account must be positive')
+
+        first_email = options['email_pattern'].format(options['start'])
+        if User.objects.filter(email=first_email).exists():
+            raise CommandError(
+                f'{first_email} already exists, pass a different --start '
+                'or --email-pattern'
+            )
+
+        types = account_types()
+        # Hashing is deliberately slow, so every customer shares one hash
+        password_hash = make_password(options['password'])
+        now = start_of_day(options['until'] or timezone.localdate())
+        batch_size = options['batch_size']
+        end = options['start'] + users
+
+        created = 0
+        transactions = 0
+        started = time.perf_counter()
+        for first in range(options['start'], end, batch_size):
+            indexes = range(first, min(first + batch_size, end))
+            transactions += seed_batch(
+                indexes,
+                email_pattern=options['email_pattern'],
+                password_hash=password_hash,
+                seed=options['seed'],
+                types=types,
+                now=now,
+                days=options['days'],
+                tx_per_account=options['tx_per_account']
+            )
+            created += len(indexes)
+
+            elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'{created} customers, {transactions} transactions '
+                f'({transactions / elapsed:.0f} transactions/sec)'
+            )
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {created} customers with {transactions} transactions'
+        ))
@@ -0,0 +1,29 @@
+# Generated by Django 3.2.7 on 2026-10-18 09:26
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+        ('transactions', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InterestRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.DateField(help_text='First day of the month the interest was credited for')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='interest_runs', to='accounts.userbankaccount')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='interestrun',
+            constraint=models.UniqueConstraint(fields=('account', 'period'), name='unique_interest_run_per_period'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 3.2.7 on 2026-10-18 09:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0003_transaction_account_ts_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['account', 'transaction_type', 'timestamp'], name='transaction_account_type_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2.7 on 2026-10-18 10:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_account_interest_due_idx'),
+        ('transactions', '0004_transaction_account_type_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyBalanceSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('balance', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('account', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='balance_snapshots', to='accounts.userbankaccount')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='dailybalancesnapshot',
+            constraint=models.UniqueConstraint(fields=('account', 'date'), name='unique_balance_snapshot_per_day'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['timestamp'], name='transaction_timestamp_idx'),
+        ),
+    ]
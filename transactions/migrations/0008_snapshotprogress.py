@@ -0,0 +1,21 @@
+# Generated by Django 3.2.7 on 2026-10-18 18:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('transactions', '0007_outboxevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SnapshotProgress',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_transaction_id', models.PositiveBigIntegerField()),
+                ('pending_transaction_id', models.PositiveBigIntegerField()),
+            ],
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 
 from .constants import TRANSACTION_TYPE_CHOICES
 from accounts.models import UserBankAccount
@@ -21,10 +22,126 @@ class Transaction(models.Model):
     transaction_type = models.PositiveSmallIntegerField(
         choices=TRANSACTION_TYPE_CHOICES
     )
-    timestamp = models.DateTimeField(auto_now_add=True)
+    # Not auto_now_add, so bulk imports can keep the original timestamps
+    timestamp = models.DateTimeField(default=timezone.now, editable=False)
 
     def __str__(self):
         return str(self.account.account_no)
 
     class Meta:
         ordering = ['timestamp']
+        indexes = [
+            models.Index(
+                fields=['account', 'timestamp', 'id'],
+                name='transaction_account_ts_idx'
+            ),
+            models.Index(
+                fields=['account', 'transaction_type', 'timestamp'],
+                name='transaction_account_type_idx'
+            ),
+            models.Index(
+                fields=['timestamp'],
+                name='transaction_timestamp_idx'
+            ),
+        ]
+
+
+class InterestRun(models.Model):
+    """
+    Ledger of interest already credited, one row per account and period.
+    """
+    account = models.ForeignKey(
+        UserBankAccount,
+        related_name='interest_runs',
+        on_delete=models.CASCADE,
+    )
+    period = models.DateField(
+        help_text='First day of the month the interest was credited for'
+    )
+    amount = models.DecimalField(
+        decimal_places=2,
+        max_digits=12
+    )
+    timestamp = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.account.account_no} {self.period:%Y-%m}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'period'],
+                name='unique_interest_run_per_period'
+            ),
+        ]
+
+
+class DailyBalanceSnapshot(models.Model):
+    """
+    Closing balance of an account on a day it had transactions.
+    """
+    account = models.ForeignKey(
+        UserBankAccount,
+        related_name='balance_snapshots',
+        on_delete=models.CASCADE,
+    )
+    date = models.DateField()
+    balance = models.DecimalField(
+        decimal_places=2,
+        max_digits=12
+    )
+
+    def __str__(self):
+        return f'{self.account.account_no} {self.date}'
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['account', 'date'],
+                name='unique_balance_snapshot_per_day'
+            ),
+        ]
+
+
+class SnapshotProgress(models.Model):
+    """
+    How far the transaction history is reflected in the daily balance
+    snapshots, a single row.
+
+    Every transaction up to ``last_transaction_id`` is reflected; the
+    ones up to ``pending_transaction_id`` are refreshed by the next run
+    of ``update_balance_snapshots``, see ``transactions.snapshots``.
+    """
+    last_transaction_id = models.PositiveBigIntegerField()
+    pending_transaction_id = models.PositiveBigIntegerField()
+
+    def __str__(self):
+        return f'{self.last_transaction_id}-{self.pending_transaction_id}'
+
+
+class OutboxEvent(models.Model):
+    """
+    Side effect of a posting, written in the posting's database
+    transaction and delivered to the outbox consumers after commit by
+    ``transactions.tasks.relay_outbox``.
+    """
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    # A relay owns the event until then; unset when not claimed
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'{self.topic} #{self.pk}'
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                condition=models.Q(processed_at__isnull=True),
+                name='outbox_pending_idx'
+            ),
+        ]
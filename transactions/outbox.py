@@ -0,0 +1,199 @@
+import datetime
+import logging
+import signal
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+
+from celery.exceptions import SoftTimeLimitExceeded
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from transactions.models import OutboxEvent
+
+
+logger = logging.getLogger(__name__)
+
+TRANSACTION_POSTED = 'transaction.posted'
+
+
+class ConsumerTimeout(Exception):
+    """
+    A consumer took longer than ``OUTBOX_CONSUMER_TIMEOUT`` over a batch.
+    """
+
+
+def record(topic, payload):
+    """
+    Write an outbox event; call it inside the transaction of the change
+    it describes, so the event exists exactly when the change commits.
+    """
+    return OutboxEvent.objects.create(topic=topic, payload=payload)
+
+
+def consumers(topic):
+    return [
+        import_string(path)
+        for path in settings.OUTBOX_CONSUMERS.get(topic, [])
+    ]
+
+
+@contextmanager
+def time_limit(seconds):
+    """
+    Raise ``ConsumerTimeout`` in the block once it has run ``seconds``.
+
+    Uses ``SIGALRM``, which only the main thread receives: in other
+    threads, or without ``seconds``, the block runs unlimited.
+    """
+    if (
+        not seconds or not hasattr(signal, 'setitimer') or
+        threading.current_thread() is not threading.main_thread()
+    ):
+        yield
+        return
+
+    def expired(signum, frame):
+        raise ConsumerTimeout(f'Consumer ran longer than {seconds} seconds')
+
+    previous = signal.signal(signal.SIGALRM, expired)
+    signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+def pending_events(now):
+    return OutboxEvent.objects.filter(
+        Q(locked_until__isnull=True) | Q(locked_until__lt=now),
+        processed_at__isnull=True,
+        attempts__lt=settings.OUTBOX_MAX_ATTEMPTS,
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Lease up to ``batch_size`` pending events to the calling relay.
+
+    The claim is a short transaction of its own, consumers run outside
+    any transaction, so neither holds locks postings have to wait for.
+    Concurrent relays skip each other's rows; an event whose relay died
+    is claimed again once its lease has run out.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            pending_events(now).select_for_update(
+                skip_locked=True
+            ).order_by('pk').values_list('pk', flat=True)[:batch_size]
+        )
+        OutboxEvent.objects.filter(pk__in=ids).update(
+            locked_until=now + datetime.timedelta(
+                seconds=settings.OUTBOX_LEASE_SECONDS
+            ),
+            attempts=F('attempts') + 1
+        )
+    return list(OutboxEvent.objects.filter(pk__in=ids).order_by('pk'))
+
+
+def deliver(events):
+    """
+    Hand every topic's events to its consumers, in order, and return
+    ``(delivered, failed)`` events.
+
+    A consumer gets the whole batch of its topic, so it can coalesce
+    work. When one raises, the batch of that topic is retried later
+    with every consumer of the topic: consumers must be idempotent.
+    A consumer still running after ``OUTBOX_CONSUMER_TIMEOUT`` seconds
+    is interrupted and counts as failed.
+    """
+    by_topic = defaultdict(list)
+    for event in events:
+        by_topic[event.topic].append(event)
+
+    delivered = []
+    failed = []
+    for topic, topic_events in by_topic.items():
+        try:
+            for consumer in consumers(topic):
+                with time_limit(settings.OUTBOX_CONSUMER_TIMEOUT):
+                    consumer(topic_events)
+        except SoftTimeLimitExceeded:
+            # The relay task is out of time, its leases run out instead
+            raise
+        except Exception as e:
+            logger.exception(
+                'Outbox consumer failed on %d %s events',
+                len(topic_events), topic
+            )
+            for event in topic_events:
+                event.last_error = repr(e)
+            failed.extend(topic_events)
+        else:
+            delivered.extend(topic_events)
+    return delivered, failed
+
+
+def relay_batch(batch_size=None):
+    """
+    Claim, deliver and settle one batch of outbox events. Returns the
+    number of events delivered and failed.
+    """
+    events = claim_batch(batch_size or settings.OUTBOX_BATCH_SIZE)
+    if not events:
+        return 0, 0
+
+    delivered, failed = deliver(events)
+    now = timezone.now()
+
+    with transaction.atomic():
+        OutboxEvent.objects.filter(
+            pk__in=[event.pk for event in delivered]
+        ).update(processed_at=now, locked_until=None)
+        for event in failed:
+            # Exponential backoff: 2, 4, 8, ... seconds
+            event.locked_until = now + datetime.timedelta(
+                seconds=2 ** event.attempts
+            )
+        OutboxEvent.objects.bulk_update(
+            failed, ['last_error', 'locked_until']
+        )
+
+    for event in failed:
+        if event.attempts >= settings.OUTBOX_MAX_ATTEMPTS:
+            logger.error(
+                'Outbox event %s gave up after %d attempts: %s',
+                event.pk, event.attempts, event.last_error
+            )
+    return len(delivered), len(failed)
+
+
+def relay(batch_size=None, max_batches=None):
+    """
+    Relay outbox events in batches until none are pending, or until
+    ``max_batches`` batches were relayed.
+    """
+    summary = {'batches': 0, 'delivered': 0, 'failed': 0}
+    while max_batches is None or summary['batches'] < max_batches:
+        delivered, failed = relay_batch(batch_size)
+        if not delivered and not failed:
+            break
+        summary['batches'] += 1
+        summary['delivered'] += delivered
+        summary['failed'] += failed
+        if not delivered:
+            # Everything left is failing, wait for the backoff
+            break
+    return summary
+
+
+def purge_processed(before):
+    """
+    Delete events delivered before ``before``. Returns how many.
+    """
+    return OutboxEvent.objects.filter(processed_at__lt=before).delete()[0]
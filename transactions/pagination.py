@@ -0,0 +1,48 @@
+import datetime
+
+from django.db.models import Q
+from django.utils.http import urlsafe_base64_decode, urlsafe_base64_encode
+
+
+def encode_cursor(transaction_obj):
+    """
+    Opaque cursor pointing just after ``transaction_obj``.
+    """
+    key = f'{transaction_obj.timestamp.isoformat()}|{transaction_obj.pk}'
+    return urlsafe_base64_encode(key.encode())
+
+
+def decode_cursor(cursor):
+    """
+    ``(timestamp, pk)`` from a cursor made by ``encode_cursor``.
+
+    Raises ``ValueError`` for anything else.
+    """
+    try:
+        timestamp, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        return datetime.datetime.fromisoformat(timestamp), int(pk)
+    except (TypeError, UnicodeDecodeError):
+        raise ValueError('Invalid cursor')
+
+
+def keyset_page(queryset, cursor, page_size):
+    """
+    One page of ``queryset`` ordered by ``(timestamp, id)``.
+
+    Instead of an ``OFFSET`` the page starts right after the cursor
+    row, so every page is an index range scan of ``page_size`` rows.
+    Returns the page and the cursor of the next page (or ``None``).
+    """
+    queryset = queryset.order_by('timestamp', 'pk')
+
+    if cursor:
+        timestamp, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(timestamp__gt=timestamp) | Q(timestamp=timestamp, pk__gt=pk)
+        )
+
+    page = list(queryset[:page_size + 1])
+    if len(page) > page_size:
+        page = page[:page_size]
+        return page, encode_cursor(page[-1])
+    return page, None
@@ -0,0 +1,212 @@
+import datetime
+import math
+import random
+from decimal import Decimal
+
+from dateutil.relativedelta import relativedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.utils import timezone
+
+from accounts.cache import invalidate_all_balances
+from accounts.models import BankAccountType, User, UserAddress, UserBankAccount
+from accounts.numbers import account_numbers
+from transactions.constants import DEPOSIT, WITHDRAWAL
+from transactions.models import Transaction
+
+
+DEFAULT_ACCOUNT_TYPES = [
+    {
+        'name': 'Savings',
+        'maximum_withdrawal_amount': 5000,
+        'annual_interest_rate': 4,
+        'interest_calculation_per_year': 12,
+    },
+    {
+        'name': 'Current',
+        'maximum_withdrawal_amount': 50000,
+        'annual_interest_rate': 0,
+        'interest_calculation_per_year': 1,
+    },
+    {
+        'name': 'Fixed',
+        'maximum_withdrawal_amount': 1000,
+        'annual_interest_rate': 7,
+        'interest_calculation_per_year': 4,
+    },
+    {
+        'name': 'Student',
+        'maximum_withdrawal_amount': 2000,
+        'annual_interest_rate': 3,
+        'interest_calculation_per_year': 2,
+    },
+]
+
+FIRST_NAMES = [
+    'Aarav', 'Ana', 'Chen', 'David', 'Fatima', 'Grace', 'Hiro', 'Ivan',
+    'Kofi', 'Lena', 'Maria', 'Noah', 'Olga', 'Priya', 'Sam', 'Yusuf',
+]
+LAST_NAMES = [
+    'Ahmed', 'Brown', 'Garcia', 'Ivanov', 'Kim', 'Kumar', 'Mensah',
+    'Muller', 'Nguyen', 'Okafor', 'Rossi', 'Sato', 'Silva', 'Smith',
+]
+STREETS = ['Main', 'High', 'Park', 'Oak', 'Station', 'Church', 'Mill']
+CITIES = [
+    ('Chennai', 'India'), ('Mumbai', 'India'), ('London', 'UK'),
+    ('Leeds', 'UK'), ('Austin', 'USA'), ('Denver', 'USA'),
+    ('Lagos', 'Nigeria'), ('Osaka', 'Japan'),
+]
+
+TRANSACTION_COLUMNS = [
+    'account_id', 'amount', 'balance_after_transaction',
+    'transaction_type', 'timestamp',
+]
+
+
+def account_types():
+    """
+    The account types seeded accounts are spread over, creating a
+    default set when the database has none.
+    """
+    types = list(BankAccountType.objects.order_by('pk'))
+    if not types:
+        types = [
+            BankAccountType.objects.create(**fields)
+            for fields in DEFAULT_ACCOUNT_TYPES
+        ]
+    return types
+
+
+def generate_customer(seed, index, types, now, days, tx_per_account):
+    """
+    Everything seeded for customer ``index``, from its own random
+    stream so the data does not depend on batch sizes or on which
+    customers are generated together.
+    """
+    rng = random.Random(f'{seed}:{index}')
+    account_type = rng.choice(types)
+    city, country = rng.choice(CITIES)
+    opened = now - datetime.timedelta(seconds=rng.randint(0, days * 86400))
+    lifetime = int((now - opened).total_seconds())
+
+    # Activity is spread over the account's lifetime; the first
+    # transaction is always the opening deposit.
+    offsets = sorted(
+        int(rng.random() * lifetime) for _ in range(tx_per_account - 1)
+    )
+    max_withdrawal = int(account_type.maximum_withdrawal_amount * 100)
+    min_withdrawal = settings.MINIMUM_WITHDRAWAL_AMOUNT * 100
+    min_deposit = settings.MINIMUM_DEPOSIT_AMOUNT * 100
+
+    balance = 0
+    transactions = []
+    for offset in [0] + offsets:
+        if transactions and balance >= min_withdrawal and rng.random() < 0.4:
+            transaction_type = WITHDRAWAL
+            amount = rng.randint(min_withdrawal, min(balance, max_withdrawal))
+            balance -= amount
+        else:
+            transaction_type = DEPOSIT
+            # Log-normal amounts: mostly small deposits, a few large ones
+            amount = max(min_deposit, int(rng.lognormvariate(math.log(20000), 1)))
+            balance += amount
+        transactions.append((
+            Decimal(amount) / 100,
+            Decimal(balance) / 100,
+            transaction_type,
+            opened + datetime.timedelta(seconds=offset),
+        ))
+
+    interval = int(12 / account_type.interest_calculation_per_year)
+    opened_date = timezone.localdate(opened)
+    return {
+        'user': {
+            'first_name': rng.choice(FIRST_NAMES),
+            'last_name': rng.choice(LAST_NAMES),
+            'date_joined': opened,
+        },
+        'account': {
+            'account_type': account_type,
+            'gender': rng.choice('MF'),
+            'birth_date': opened_date - datetime.timedelta(
+                days=rng.randint(18 * 365, 80 * 365)
+            ),
+            'balance': Decimal(balance) / 100,
+            'initial_deposit_date': opened_date,
+            'interest_start_date': opened_date + relativedelta(months=+interval),
+        },
+        'address': {
+            'street_address': f'{rng.randint(1, 999)} {rng.choice(STREETS)} Street',
+            'city': city,
+            'postal_code': rng.randint(10000, 99999),
+            'country': country,
+        },
+        'transactions': transactions,
+    }
+
+
+def seed_batch(indexes, email_pattern, password_hash, seed, types, now,
+               days, tx_per_account):
+    """
+    Create the customers ``indexes`` with their addresses, accounts and
+    transaction history in one database transaction.
+
+    Users, accounts and addresses are written with ``bulk_create`` and
+    transactions with a raw ``executemany``, the fastest insert path
+    that still goes through Django's connection. Returns the number of
+    transactions written.
+    """
+    customers = {
+        email_pattern.format(index): generate_customer(
+            seed, index, types, now, days, tx_per_account
+        )
+        for index in indexes
+    }
+
+    numbers = dict(zip(customers, account_numbers.reserve(len(customers))))
+
+    with transaction.atomic():
+        User.objects.bulk_create(
+            User(email=email, password=password_hash, **customer['user'])
+            for email, customer in customers.items()
+        )
+        # bulk_create does not return primary keys on every backend
+        user_ids = dict(
+            User.objects.filter(email__in=customers).values_list('email', 'pk')
+        )
+
+        UserAddress.objects.bulk_create(
+            UserAddress(user_id=user_ids[email], **customer['address'])
+            for email, customer in customers.items()
+        )
+        UserBankAccount.objects.bulk_create(
+            UserBankAccount(
+                user_id=user_ids[email],
+                account_no=numbers[email],
+                **customer['account']
+            )
+            for email, customer in customers.items()
+        )
+        account_ids = dict(
+            UserBankAccount.objects.filter(
+                user_id__in=user_ids.values()
+            ).values_list('user_id', 'pk')
+        )
+
+        adapt = connection.ops.adapt_datetimefield_value
+        rows = [
+            (account_ids[user_ids[email]], amount, balance, transaction_type, adapt(timestamp))
+            for email, customer in customers.items()
+            for amount, balance, transaction_type, timestamp in customer['transactions']
+        ]
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {Transaction._meta.db_table} '
+                f'({", ".join(TRANSACTION_COLUMNS)}) '
+                f'VALUES ({", ".join(["%s"] * len(TRANSACTION_COLUMNS))})',
+                rows
+            )
+        invalidate_all_balances()
+
+    return len(rows)
@@ -0,0 +1,190 @@
+import threading
+import time
+
+from dateutil.relativedelta import relativedelta
+
+from django.conf import settings
+from django.db import OperationalError, models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.cache import get_account_type, write_through_balance
+from accounts.models import UserBankAccount
+from transactions.constants import DEPOSIT, WITHDRAWAL
+from transactions.models import Transaction
+from transactions.outbox import TRANSACTION_POSTED, record
+
+
+class InsufficientFunds(Exception):
+    """
+    Raised when the overdraft guard rejects a withdrawal.
+    """
+
+
+class PostingStats:
+    """
+    Process wide counters for the posting engine.
+
+    ``rejected`` counts postings refused by the overdraft guard and
+    ``conflicts`` counts attempts that hit a locked database and
+    had to be retried.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.postings = 0
+            self.rejected = 0
+            self.conflicts = 0
+            self.busy_seconds = 0.0
+
+    def record(self, elapsed, posted=False, rejected=False, conflicts=0):
+        with self._lock:
+            self.busy_seconds += elapsed
+            self.conflicts += conflicts
+            if posted:
+                self.postings += 1
+            if rejected:
+                self.rejected += 1
+
+    @property
+    def throughput(self):
+        """
+        Successful postings per second of time spent posting.
+        """
+        if not self.busy_seconds:
+            return 0.0
+        return self.postings / self.busy_seconds
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'postings': self.postings,
+                'rejected': self.rejected,
+                'conflicts': self.conflicts,
+                'busy_seconds': self.busy_seconds,
+                'throughput': (
+                    self.postings / self.busy_seconds
+                    if self.busy_seconds else 0.0
+                ),
+            }
+
+
+posting_stats = PostingStats()
+
+
+def _apply_posting(account, amount, transaction_type):
+    accounts = UserBankAccount.objects.filter(pk=account.pk)
+    changes = {}
+
+    if transaction_type == WITHDRAWAL:
+        # The overdraft guard lives in the WHERE clause, so the check
+        # and the debit happen in one statement.
+        accounts = accounts.filter(balance__gte=amount)
+        changes['balance'] = F('balance') - amount
+    else:
+        changes['balance'] = F('balance') + amount
+
+    if transaction_type == DEPOSIT:
+        today = timezone.localdate()
+        next_interest_month = int(
+            12 / get_account_type(
+                account.account_type_id
+            ).interest_calculation_per_year
+        )
+        changes['initial_deposit_date'] = Coalesce(
+            F('initial_deposit_date'),
+            Value(today, output_field=models.DateField()),
+        )
+        changes['interest_start_date'] = Coalesce(
+            F('interest_start_date'),
+            Value(
+                today + relativedelta(months=+next_interest_month),
+                output_field=models.DateField()
+            ),
+        )
+
+    with transaction.atomic():
+        if not accounts.update(**changes):
+            raise InsufficientFunds(
+                'You can not withdraw more than your account balance'
+            )
+
+        balance, initial_deposit_date, interest_start_date = (
+            UserBankAccount.objects.filter(pk=account.pk).values_list(
+                'balance', 'initial_deposit_date', 'interest_start_date'
+            ).get()
+        )
+        transaction_obj = Transaction.objects.create(
+            account=account,
+            amount=amount,
+            transaction_type=transaction_type,
+            balance_after_transaction=balance
+        )
+        # Everything else a posting triggers runs after commit, off the
+        # request, from the outbox
+        record(TRANSACTION_POSTED, {
+            'transaction_id': transaction_obj.pk,
+            'account_id': account.pk,
+            'user_id': account.user_id,
+            'transaction_type': transaction_type,
+            'amount': str(amount),
+            'balance': str(balance),
+            'timestamp': transaction_obj.timestamp.isoformat(),
+        })
+        write_through_balance(account.user_id, balance)
+
+    account.balance = balance
+    account.initial_deposit_date = initial_deposit_date
+    account.interest_start_date = interest_start_date
+    return transaction_obj
+
+
+def post_transaction(account, amount, transaction_type):
+    """
+    Apply a deposit or withdrawal to ``account`` and record it.
+
+    The balance change is a single conditional ``UPDATE`` and the
+    ``Transaction`` row is inserted in the same database transaction,
+    so concurrent postings on one account can not lose updates.
+    A ``transaction.posted`` outbox event is written in that transaction
+    too. ``account`` is refreshed in place with the new balance.
+    """
+    if amount <= 0:
+        raise ValueError('Posting amount must be positive')
+
+    max_retries = settings.POSTING_MAX_RETRIES
+    # Retrying is only safe when we own the whole transaction.
+    can_retry = not transaction.get_connection().in_atomic_block
+    conflicts = 0
+    started = time.perf_counter()
+
+    while True:
+        try:
+            transaction_obj = _apply_posting(
+                account, amount, transaction_type
+            )
+        except InsufficientFunds:
+            posting_stats.record(
+                time.perf_counter() - started,
+                rejected=True,
+                conflicts=conflicts
+            )
+            raise
+        except OperationalError:
+            conflicts += 1
+            if not can_retry or conflicts > max_retries:
+                posting_stats.record(
+                    time.perf_counter() - started, conflicts=conflicts
+                )
+                raise
+            continue
+
+        posting_stats.record(
+            time.perf_counter() - started, posted=True, conflicts=conflicts
+        )
+        return transaction_obj
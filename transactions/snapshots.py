@@ -0,0 +1,221 @@
+import datetime
+import logging
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, OuterRef, Subquery
+from django.utils import timezone
+
+from accounts.models import UserBankAccount
+from transactions.models import (
+    DailyBalanceSnapshot,
+    SnapshotProgress,
+    Transaction,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+def start_of_day(date):
+    return timezone.make_aware(
+        datetime.datetime.combine(date, datetime.time())
+    )
+
+
+def closing_balances(rows):
+    """
+    ``{(account_id, date): balance}`` from
+    ``(account_id, timestamp, pk, balance_after_transaction)`` rows.
+
+    The closing balance of a day is the balance after its last
+    transaction by ``(timestamp, pk)``; rows may come in any order.
+    """
+    latest = {}
+    for account_id, timestamp, pk, balance in rows:
+        key = (account_id, timezone.localtime(timestamp).date())
+        if key not in latest or (timestamp, pk) > latest[key][0]:
+            latest[key] = ((timestamp, pk), balance)
+
+    return {key: balance for key, (_, balance) in latest.items()}
+
+
+def rebuild_snapshots(start_date=None, end_date=None, start_pk=None,
+                      end_pk=None, account_ids=None):
+    """
+    Recompute the snapshots between ``start_date`` and ``end_date``
+    (inclusive) for accounts with ``start_pk <= pk < end_pk``, or only
+    for the accounts in ``account_ids``.
+
+    A day's snapshot only depends on that day's transactions, so the
+    window is replaced as a whole in one transaction. Returns the
+    number of snapshots written.
+    """
+    transactions = Transaction.objects.order_by()
+    snapshots = DailyBalanceSnapshot.objects.all()
+
+    if start_date is not None:
+        transactions = transactions.filter(
+            timestamp__gte=start_of_day(start_date)
+        )
+        snapshots = snapshots.filter(date__gte=start_date)
+    if end_date is not None:
+        transactions = transactions.filter(
+            timestamp__lt=start_of_day(end_date + datetime.timedelta(days=1))
+        )
+        snapshots = snapshots.filter(date__lte=end_date)
+    if start_pk is not None:
+        transactions = transactions.filter(account_id__gte=start_pk)
+        snapshots = snapshots.filter(account_id__gte=start_pk)
+    if end_pk is not None:
+        transactions = transactions.filter(account_id__lt=end_pk)
+        snapshots = snapshots.filter(account_id__lt=end_pk)
+    if account_ids is not None:
+        transactions = transactions.filter(account_id__in=account_ids)
+        snapshots = snapshots.filter(account_id__in=account_ids)
+
+    balances = closing_balances(
+        transactions.values_list(
+            'account_id', 'timestamp', 'pk', 'balance_after_transaction'
+        ).iterator(chunk_size=settings.SNAPSHOT_BATCH_SIZE)
+    )
+
+    with transaction.atomic():
+        snapshots.delete()
+        DailyBalanceSnapshot.objects.bulk_create(
+            (
+                DailyBalanceSnapshot(
+                    account_id=account_id, date=date, balance=balance
+                )
+                for (account_id, date), balance in balances.items()
+            ),
+            batch_size=settings.SNAPSHOT_BATCH_SIZE
+        )
+
+    return len(balances)
+
+
+def rebuild_days(accounts_by_day):
+    """
+    Rebuild the snapshots of ``{date: account_ids}``. Returns the number
+    of snapshots written.
+    """
+    return sum(
+        rebuild_snapshots(
+            start_date=date, end_date=date, account_ids=sorted(account_ids)
+        )
+        for date, account_ids in sorted(accounts_by_day.items())
+    )
+
+
+def refresh_posted_snapshots(events):
+    """
+    Outbox consumer rebuilding the snapshots of the days and accounts
+    the posted transactions of ``events`` fall on.
+    """
+    accounts_by_day = defaultdict(set)
+    for event in events:
+        timestamp = datetime.datetime.fromisoformat(event.payload['timestamp'])
+        accounts_by_day[timezone.localtime(timestamp).date()].add(
+            event.payload['account_id']
+        )
+    rebuild_days(accounts_by_day)
+
+
+def record_progress(last_transaction_id):
+    """
+    Record that the snapshots reflect every transaction up to
+    ``last_transaction_id``, e.g. after a backfill.
+    """
+    SnapshotProgress.objects.update_or_create(pk=1, defaults={
+        'last_transaction_id': last_transaction_id,
+        'pending_transaction_id': last_transaction_id,
+    })
+
+
+def refresh_new_snapshots(accounts_per_batch=None):
+    """
+    Rebuild the snapshots of the days and accounts that transactions
+    written since the previous call fall on, one range of
+    ``accounts_per_batch`` account ids at a time. Returns the number of
+    snapshots written.
+
+    Catches the writes that do not go through the outbox (imports,
+    interest runs, admin edits). Each call refreshes the transactions
+    that already existed at the previous call, so a transaction still
+    uncommitted when the newest id was read is not skipped.
+    """
+    accounts_per_batch = accounts_per_batch or settings.SNAPSHOT_BATCH_SIZE
+    latest = Transaction.objects.aggregate(latest=Max('pk'))['latest'] or 0
+    progress = SnapshotProgress.objects.filter(pk=1).first()
+    if progress is None:
+        logger.warning(
+            'Balance snapshots were never backfilled, '
+            'run the backfill_balance_snapshots command'
+        )
+        record_progress(latest)
+        return 0
+
+    transactions = Transaction.objects.filter(
+        pk__gt=progress.last_transaction_id,
+        pk__lte=progress.pending_transaction_id
+    ).order_by()
+    batches = transactions.annotate(
+        batch=F('account_id') / accounts_per_batch
+    ).values_list('batch', flat=True).distinct()
+
+    written = 0
+    for batch in sorted(batches):
+        accounts_by_day = defaultdict(set)
+        for account_id, timestamp in transactions.filter(
+            account_id__gte=batch * accounts_per_batch,
+            account_id__lt=(batch + 1) * accounts_per_batch
+        ).values_list('account_id', 'timestamp').iterator(
+            chunk_size=settings.SNAPSHOT_BATCH_SIZE
+        ):
+            accounts_by_day[timezone.localtime(timestamp).date()].add(
+                account_id
+            )
+        written += rebuild_days(accounts_by_day)
+
+    SnapshotProgress.objects.filter(pk=1).update(
+        last_transaction_id=progress.pending_transaction_id,
+        pending_transaction_id=max(latest, progress.pending_transaction_id)
+    )
+    return written
+
+
+def balance_as_of(account, date):
+    """
+    Closing balance of ``account`` on ``date``, from the snapshots, or
+    ``None`` when the account had transactions by then that no snapshot
+    reflects yet (the snapshots were not backfilled).
+    """
+    balance = DailyBalanceSnapshot.objects.filter(
+        account=account, date__lte=date
+    ).order_by('-date').values_list('balance', flat=True).first()
+
+    if balance is None:
+        if Transaction.objects.filter(
+            account=account,
+            timestamp__lt=start_of_day(date + datetime.timedelta(days=1))
+        ).exists():
+            return None
+        return Decimal(0)
+    return balance
+
+
+def balances_as_of(date):
+    """
+    Every account annotated with its closing balance on ``date``
+    (``None`` for accounts without transactions by then).
+    """
+    return UserBankAccount.objects.annotate(
+        balance_as_of=Subquery(
+            DailyBalanceSnapshot.objects.filter(
+                account=OuterRef('pk'), date__lte=date
+            ).order_by('-date').values('balance')[:1]
+        )
+    )
@@ -1,50 +1,123 @@
+import datetime
+import logging
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, OperationalError
 from django.utils import timezone
 
-from celery import shared_task
-from accounts.models import UserBankAccount
-from transactions.constants import INTEREST
-from transactions.models import Transaction
+from celery import chord, shared_task
+from transactions.interest import run_interest, shard_ranges
+from transactions.outbox import purge_processed, relay
+from transactions.snapshots import refresh_new_snapshots
+
+
+logger = logging.getLogger(__name__)
+
+
+def _serialize_summary(summary):
+    summary['interest'] = str(summary['interest'])
+    return summary
+
+
+@shared_task
+def calculate_interest(max_chunks=None):
+    """
+    Credit this month's interest to due accounts in one task.
+
+    With ``max_chunks`` only that many chunks are processed; the next
+    call carries on from the accounts still missing from the ledger.
+    """
+    return _serialize_summary(run_interest(max_chunks=max_chunks))
+
+
+@shared_task(
+    autoretry_for=(IntegrityError, OperationalError),
+    retry_backoff=True,
+    max_retries=5
+)
+def calculate_interest_shard(today, start_pk, end_pk):
+    """
+    Credit interest to the accounts with ``start_pk <= pk < end_pk``.
+
+    Accounts already in the ``InterestRun`` ledger for the period are
+    skipped, so a failed shard can be retried on its own without paying
+    interest twice.
+    """
+    summary = run_interest(
+        today=datetime.date.fromisoformat(today),
+        start_pk=start_pk,
+        end_pk=end_pk
+    )
+    summary.update({'start_pk': start_pk, 'end_pk': end_pk})
+    return _serialize_summary(summary)
 
 
 @shared_task
-def calculate_interest():
-    accounts = UserBankAccount.objects.filter(
-        balance__gt=0,
-        interest_start_date__lte=timezone.now(),
-        initial_deposit_date__isnull=False
-    ).select_related('account_type')
-
-    this_month = timezone.now().month
-    print(f"Current month: {this_month}")  # Debug statement
-
-    created_transactions = []
-    updated_accounts = []
-
-    for account in accounts:
-        print(f"Processing account: {account.account_no}")  # Debug statement
-        print(f"Account balance: {account.balance}")  # Debug statement
-        print(f"Interest calculation months: {account.get_interest_calculation_months()}")  # Debug statement
-
-        if this_month in account.get_interest_calculation_months():
-            interest = account.account_type.calculate_interest(account.balance)
-            print(f"Calculated interest: {interest}")  # Debug statement
-
-            account.balance += interest
-            account.save()
-
-            transaction_obj = Transaction(
-                account=account,
-                transaction_type=INTEREST,
-                amount=interest,
-                balance_after_transaction=account.balance  # Ensure this field is set
-            )
-            created_transactions.append(transaction_obj)
-            updated_accounts.append(account)
-
-            print(f"Updated balance: {account.balance}")  # Debug statement
-
-    if created_transactions:
-        Transaction.objects.bulk_create(created_transactions)
-
-    if updated_accounts:
-        UserBankAccount.objects.bulk_update(updated_accounts, ['balance'])
+def summarize_interest(results, today):
+    """
+    Add up the shard summaries of one interest run.
+    """
+    totals = {
+        'today': today,
+        'shards': len(results),
+        'accounts': sum(result['accounts'] for result in results),
+        'interest': str(sum(
+            (Decimal(result['interest']) for result in results),
+            Decimal(0)
+        )),
+    }
+    logger.info('Interest run finished: %s', totals)
+    return totals
+
+
+@shared_task
+def calculate_interest_fanout(shard_size=None):
+    """
+    Split the month-end interest run into shards of the account id
+    space and run them in parallel as a chord.
+    """
+    today = timezone.localdate().isoformat()
+    shards = shard_ranges(shard_size or settings.INTEREST_SHARD_SIZE)
+
+    if not shards:
+        return {'today': today, 'shards': 0}
+
+    result = chord(
+        calculate_interest_shard.s(today, start_pk, end_pk)
+        for start_pk, end_pk in shards
+    )(summarize_interest.s(today))
+
+    return {'today': today, 'shards': len(shards), 'chord_id': result.id}
+
+
+@shared_task
+def update_balance_snapshots():
+    """
+    Refresh the daily balance snapshots of the transactions written
+    since the previous run that did not go through the outbox.
+    """
+    return refresh_new_snapshots()
+
+
+@shared_task(
+    soft_time_limit=settings.OUTBOX_RELAY_SOFT_TIME_LIMIT,
+    time_limit=settings.OUTBOX_RELAY_TIME_LIMIT
+)
+def relay_outbox(max_batches=None):
+    """
+    Deliver pending outbox events to their consumers in batches, then
+    delete delivered events older than ``OUTBOX_RETENTION_DAYS``.
+
+    A run that is stopped at its time limit leaves the events it had
+    claimed to the next run once their lease has expired.
+    """
+    summary = relay(max_batches=max_batches)
+    summary['purged'] = purge_processed(
+        timezone.now() - datetime.timedelta(
+            days=settings.OUTBOX_RETENTION_DAYS
+        )
+    )
+    if summary['failed']:
+        logger.warning('Outbox relay: %s', summary)
+    return summary
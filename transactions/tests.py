@@ -1,12 +1,38 @@
-from django.test import TestCase  # Imports Django's testing framework for writing tests
+from asgiref.sync import async_to_sync, sync_to_async  # Calls the async client from sync code and back
+from django.db import IntegrityError  # Raised by the interest ledger's unique constraint
+from django.db.models import Sum  # Aggregates transaction amounts
+import json  # Parses NDJSON export lines
+import os  # Removes temporary import files
+import tempfile  # Writes temporary import files
+import time  # Measures and simulates slow consumers
+from io import StringIO  # Captures management command output
+from urllib.parse import urlencode  # Encodes form posts of the async client
+
+from django.core.management import CommandError, call_command  # Runs management commands
+from django.test import TestCase, override_settings  # Imports Django's testing framework for writing tests
 from django.urls import reverse  # Helps in generating URLs from view names
 from django.utils import timezone  # Provides timezone-aware date/time functions
+from accounts.cache import account_types  # This process's copy of the account types
 from accounts.models import User, UserBankAccount, BankAccountType  # Imports models for user and bank accounts
-from transactions.models import Transaction  # Imports the Transaction model
-from transactions.forms import DepositForm, WithdrawForm  # Imports forms for deposit and withdrawal actions
+from accounts.numbers import is_valid_account_number  # Checks allocated account numbers
+from transactions.models import DailyBalanceSnapshot, InterestRun, OutboxEvent, Transaction  # Imports the transaction models
+from transactions.forms import DepositForm, TransactionDateRangeForm, WithdrawForm  # Imports forms for deposit and withdrawal actions
 from transactions.constants import DEPOSIT, WITHDRAWAL, INTEREST  # Imports constants for transaction types
-from transactions.tasks import calculate_interest  # Imports task function for calculating interest
+from transactions.tasks import (  # Imports the interest and outbox tasks
+    calculate_interest,
+    calculate_interest_fanout,
+    calculate_interest_shard,
+    relay_outbox,
+    summarize_interest,
+    update_balance_snapshots,
+)
+from transactions.interest import due_accounts, interest_period, run_interest, shard_ranges  # Imports the chunked interest engine
+from transactions.snapshots import balance_as_of, balances_as_of, rebuild_snapshots  # Imports the balance snapshots
+from transactions.services import InsufficientFunds, post_transaction, posting_stats  # Imports the posting engine
+from transactions.outbox import TRANSACTION_POSTED, relay  # Imports the outbox relay
 from django.conf import settings  # Accesses project settings
+from banking_system.celery import app as celery_app  # Celery app used by the tasks
+from celery.exceptions import SoftTimeLimitExceeded  # Raised in a task at its soft time limit
 from decimal import Decimal  # Provides precise decimal arithmetic
 from dateutil.relativedelta import relativedelta  # Allows date manipulation by specific time intervals
 
@@ -192,3 +218,677 @@ class CalculateInterestTaskTest(TestCase):  # Defines tests for interest calcula
         self.assertGreater(self.account.balance, Decimal('1000.00'))  # Checks if balance increased
 
     
+
+class PostingServiceTest(TestCase):  # Defines tests for the atomic posting engine
+    def setUp(self):  # Sets up an account with a known balance
+        user = User.objects.create_user(email='testuser@example.com', password='testpass')  # Creates a test user
+        account_type = BankAccountType.objects.create(
+            name='Saving',
+            maximum_withdrawal_amount=5000,
+            annual_interest_rate=5.0,
+            interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.account = UserBankAccount.objects.create(
+            user=user,
+            account_type=account_type,
+            balance=1000.00,
+            account_no='1234567890'
+        )  # Creates a bank account for the user
+        posting_stats.reset()  # Starts every test with empty counters
+
+    def test_deposit_updates_balance_and_records_transaction(self):
+        transaction_obj = post_transaction(self.account, Decimal('250.00'), DEPOSIT)
+        self.assertEqual(self.account.balance, Decimal('1250.00'))  # In-memory account is refreshed
+        self.assertEqual(transaction_obj.balance_after_transaction, Decimal('1250.00'))
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1250.00'))  # Balance is persisted
+        self.assertIsNotNone(self.account.initial_deposit_date)  # First deposit starts the interest clock
+        self.assertGreater(self.account.interest_start_date, self.account.initial_deposit_date)
+
+    def test_deposit_keeps_existing_interest_dates(self):
+        start = timezone.localdate() - relativedelta(months=6)
+        UserBankAccount.objects.filter(pk=self.account.pk).update(
+            initial_deposit_date=start, interest_start_date=start
+        )
+        post_transaction(self.account, Decimal('10.00'), DEPOSIT)
+        self.assertEqual(self.account.initial_deposit_date, start)  # Dates are only set once
+        self.assertEqual(self.account.interest_start_date, start)
+
+    def test_withdraw_rejected_by_overdraft_guard(self):
+        with self.assertRaises(InsufficientFunds):
+            post_transaction(self.account, Decimal('1000.01'), WITHDRAWAL)
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1000.00'))  # Balance is untouched
+        self.assertFalse(Transaction.objects.exists())  # No row is written for a rejected posting
+        self.assertEqual(posting_stats.snapshot()['rejected'], 1)
+
+    def test_stale_account_can_not_overdraw(self):
+        stale = UserBankAccount.objects.get(pk=self.account.pk)  # Second copy loaded before the first withdrawal
+        post_transaction(self.account, Decimal('800.00'), WITHDRAWAL)
+        with self.assertRaises(InsufficientFunds):
+            post_transaction(stale, Decimal('800.00'), WITHDRAWAL)  # The in-memory balance still says 1000
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('200.00'))
+
+    def test_stats_report_throughput(self):
+        post_transaction(self.account, Decimal('100.00'), DEPOSIT)
+        post_transaction(self.account, Decimal('100.00'), WITHDRAWAL)
+        stats = posting_stats.snapshot()
+        self.assertEqual(stats['postings'], 2)
+        self.assertEqual(stats['conflicts'], 0)
+        self.assertGreater(stats['throughput'], 0)
+
+
+class InterestAccountsMixin:  # Accounts shared by the interest tests; defines no tests itself
+    def setUp(self):  # Sets up accounts on different interest schedules
+        self.monthly = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Interest every month
+        self.quarterly = BankAccountType.objects.create(
+            name='Current', maximum_withdrawal_amount=5000, annual_interest_rate=3.5, interest_calculation_per_year=4
+        )  # Interest every 3 months
+        self.accounts = []
+        for i, (account_type, start_month) in enumerate([
+            (self.monthly, 1), (self.monthly, 7), (self.monthly, 11),
+            (self.quarterly, 1), (self.quarterly, 2), (self.quarterly, 4),
+        ]):
+            user = User.objects.create_user(email=f'user{i}@example.com', password='testpass')
+            self.accounts.append(UserBankAccount.objects.create(
+                user=user,
+                account_type=account_type,
+                balance=Decimal('1234.56') * (i + 1),
+                initial_deposit_date=timezone.datetime(2019, 1, 1).date(),
+                interest_start_date=timezone.datetime(2020, start_month, 1).date(),
+                account_no=1000 + i
+            ))
+
+    def due_this_month(self):  # Reference count of accounts due in the current month
+        month = timezone.localdate().month
+        return sum(month in account.get_interest_calculation_months() for account in self.accounts)
+
+
+class InterestEngineTest(InterestAccountsMixin, TestCase):  # Defines tests for the chunked interest engine
+    def test_due_accounts_match_interest_calculation_months(self):
+        for month in range(1, 13):
+            today = timezone.datetime(2021, month, 15).date()
+            expected = {
+                account.pk for account in self.accounts
+                if month in account.get_interest_calculation_months()
+            }  # The Python implementation is the reference
+            self.assertEqual(set(due_accounts(today).values_list('pk', flat=True)), expected, month)
+
+    def test_run_interest_in_chunks(self):
+        today = timezone.datetime(2021, 7, 15).date()  # Due: monthly 1 and 7, quarterly 1 and 4
+        summary = run_interest(today=today, chunk_size=1)
+        self.assertEqual(summary['accounts'], 4)
+        self.assertEqual(len(summary['chunks']), 4)  # One chunk per due account
+        self.assertTrue(all(chunk['rows_per_sec'] > 0 for chunk in summary['chunks']))
+
+        for account in self.accounts:
+            before = account.balance
+            account.refresh_from_db()
+            if 7 in account.get_interest_calculation_months():
+                interest = account.account_type.calculate_interest(before)
+                self.assertEqual(account.balance, before + interest)  # Same rounding as the scalar method
+                transaction_obj = account.transactions.get(transaction_type=INTEREST)
+                self.assertEqual(transaction_obj.amount, interest)
+                self.assertEqual(transaction_obj.balance_after_transaction, account.balance)
+            else:
+                self.assertEqual(account.balance, before)
+                self.assertFalse(account.transactions.exists())
+        self.assertEqual(summary['interest'], Transaction.objects.aggregate(total=Sum('amount'))['total'])
+
+    def test_rerun_does_not_credit_twice(self):
+        first = run_interest()
+        second = run_interest()  # Same period again, e.g. after a crash
+        self.assertEqual(first['accounts'], self.due_this_month())
+        self.assertEqual(second['accounts'], 0)
+        self.assertEqual(Transaction.objects.filter(transaction_type=INTEREST).count(), self.due_this_month())
+
+    def test_batches_resume_from_the_ledger(self):
+        today = timezone.datetime(2021, 7, 15).date()
+        first = run_interest(today=today, chunk_size=1, max_chunks=3)  # Stop part-way through the period
+        self.assertEqual(first['accounts'], 3)
+        rest = run_interest(today=today, chunk_size=1)  # Picks up the remaining account
+        self.assertEqual(rest['accounts'], 1)
+        self.assertEqual(InterestRun.objects.filter(period=interest_period(today)).count(), 4)
+        self.assertEqual(run_interest(today=today)['chunks'], [])  # Nothing left to scan
+
+    def test_rates_are_read_from_the_database(self):
+        today = timezone.datetime(2021, 7, 15).date()
+        account_types()  # This process's copy, before the change
+        BankAccountType.objects.filter(pk=self.monthly.pk).update(annual_interest_rate=12)  # Changed by another process
+        run_interest(today=today)
+        self.monthly.refresh_from_db()
+        interest = self.accounts[0].transactions.get(transaction_type=INTEREST).amount
+        self.assertEqual(interest, self.monthly.calculate_interest(Decimal('1234.56')))  # Credited at the new rate
+
+    def test_ledger_rejects_second_credit(self):
+        today = timezone.datetime(2021, 7, 15).date()
+        run_interest(today=today)
+        with self.assertRaises(IntegrityError):
+            InterestRun.objects.create(
+                account=self.accounts[0], period=interest_period(today), amount=0
+            )  # Unique per account and period
+
+
+class InterestFanoutTest(InterestAccountsMixin, TestCase):  # Reuses the accounts of the engine tests
+    def test_shard_ranges_cover_all_accounts(self):
+        pks = sorted(account.pk for account in self.accounts)
+        shards = shard_ranges(4)
+        self.assertEqual(shards[0][0], pks[0])
+        self.assertEqual(shards[-1][1], pks[-1] + 1)
+        for (_, end), (start, _) in zip(shards, shards[1:]):
+            self.assertEqual(end, start)  # Shards are contiguous and never overlap
+
+    def test_retrying_a_shard_is_idempotent(self):
+        today = timezone.localdate().isoformat()
+        results = [
+            calculate_interest_shard(today, start, end)
+            for start, end in shard_ranges(2)
+        ]
+        retried = calculate_interest_shard(today, *shard_ranges(2)[0])  # Retry the first shard only
+        self.assertEqual(retried['accounts'], 0)
+
+        totals = summarize_interest(results, today)
+        self.assertEqual(totals['accounts'], self.due_this_month())
+        self.assertEqual(
+            Decimal(totals['interest']),
+            Transaction.objects.aggregate(total=Sum('amount'))['total']
+        )
+
+    def test_fanout_dispatches_chord(self):
+        celery_app.conf.task_always_eager = True  # Runs the chord in-process
+        try:
+            result = calculate_interest_fanout(shard_size=2)
+        finally:
+            celery_app.conf.task_always_eager = False
+        self.assertEqual(result['shards'], 3)
+        self.assertTrue(Transaction.objects.filter(transaction_type=INTEREST).exists())
+
+
+@override_settings(TRANSACTION_REPORT_PAGE_SIZE=3)  # Small pages to force several of them
+class TransactionReportPaginationTest(TestCase):  # Defines tests for the keyset-paginated report
+    def setUp(self):  # Sets up an account with a short history and logs in
+        user = User.objects.create_user(email='testuser@example.com', password='testpass')  # Creates a test user
+        account_type = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.account = UserBankAccount.objects.create(
+            user=user, account_type=account_type, balance=1000.00, account_no='1234567890'
+        )  # Creates a bank account for the user
+        self.transactions = [
+            Transaction.objects.create(
+                account=self.account, amount=i, transaction_type=DEPOSIT, balance_after_transaction=1000 + i
+            )
+            for i in range(1, 8)
+        ]  # Seven rows, several sharing a timestamp
+        self.client.login(email='testuser@example.com', password='testpass')  # Logs in as the test user
+
+    def test_pages_walk_the_whole_history_once(self):
+        url = reverse('transactions:transaction_report')
+        seen = []
+        query = ''
+        while True:
+            response = self.client.get(f'{url}?{query}')
+            self.assertEqual(response.status_code, 200)
+            page = response.context['object_list']
+            self.assertLessEqual(len(page), 3)
+            seen.extend(transaction_obj.pk for transaction_obj in page)
+            query = response.context['next_query']
+            if not query:
+                break
+        self.assertEqual(seen, [transaction_obj.pk for transaction_obj in self.transactions])  # Oldest first, no gaps or repeats
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('transactions:transaction_report'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+
+class TransactionDateRangeFormTest(TestCase):  # Defines tests for the report's date-range filter
+    def test_timestamp_range_is_half_open(self):
+        form = TransactionDateRangeForm(data={'daterange': '2024-01-01 - 2024-01-31'})
+        self.assertTrue(form.is_valid())
+        start, end = form.get_timestamp_range()
+        self.assertEqual(start, timezone.make_aware(timezone.datetime(2024, 1, 1)))
+        self.assertEqual(end, timezone.make_aware(timezone.datetime(2024, 2, 1)))  # Whole last day is included
+
+    def test_no_range(self):
+        form = TransactionDateRangeForm(data={})
+        form.is_valid()
+        self.assertIsNone(form.get_timestamp_range())
+
+
+class TransactionExportViewTest(TestCase):  # Defines tests for the streaming statement export
+    def setUp(self):  # Sets up an account with a few transactions and logs in
+        user = User.objects.create_user(email='testuser@example.com', password='testpass')  # Creates a test user
+        account_type = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.account = UserBankAccount.objects.create(
+            user=user, account_type=account_type, balance=1000.00, account_no='1234567890'
+        )  # Creates a bank account for the user
+        for amount, transaction_type in [(100, DEPOSIT), (50, WITHDRAWAL), (5, INTEREST)]:
+            Transaction.objects.create(
+                account=self.account, amount=amount, transaction_type=transaction_type, balance_after_transaction=1000
+            )
+        self.client.login(email='testuser@example.com', password='testpass')  # Logs in as the test user
+
+    def test_csv_export(self):
+        response = self.client.get(reverse('transactions:transaction_export'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)  # The body is streamed, not built in memory
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0], 'timestamp,transaction_type,amount,balance_after_transaction')
+        self.assertEqual(len(lines), 4)
+        self.assertIn('Withdrawal,50.00,1000.00', lines[2])
+
+    def test_ndjson_export(self):
+        response = self.client.get(reverse('transactions:transaction_export'), {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['transaction_type'] for row in rows], ['Deposit', 'Withdrawal', 'Interest'])
+        self.assertEqual(rows[0]['amount'], '100.00')
+
+    def test_date_range_filter(self):
+        response = self.client.get(reverse('transactions:transaction_export'), {
+            'format': 'ndjson', 'daterange': '2000-01-01 - 2000-12-31',
+        })  # No transactions in that year
+        self.assertEqual(b''.join(response.streaming_content), b'')
+
+    def test_unknown_format(self):
+        response = self.client.get(reverse('transactions:transaction_export'), {'format': 'xml'})
+        self.assertEqual(response.status_code, 400)
+
+
+class DailyBalanceSnapshotTest(TestCase):  # Defines tests for the materialized daily balances
+    def setUp(self):  # Sets up an account with transactions over three days
+        self.user = User.objects.create_user(email='testuser@example.com', password='testpass')  # Creates a test user
+        account_type = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.account = UserBankAccount.objects.create(
+            user=self.user, account_type=account_type, balance=1250.00, account_no='1234567890'
+        )  # Creates a bank account for the user
+        self.day = timezone.localdate() - relativedelta(days=10)
+        for days, hour, balance in [(0, 9, 1100), (0, 17, 1050), (2, 12, 1300), (3, 8, 1250)]:
+            transaction_obj = Transaction.objects.create(
+                account=self.account, amount=50, transaction_type=DEPOSIT, balance_after_transaction=balance
+            )
+            Transaction.objects.filter(pk=transaction_obj.pk).update(
+                timestamp=timezone.make_aware(timezone.datetime.combine(
+                    self.day + relativedelta(days=days), timezone.datetime.min.time()
+                ).replace(hour=hour))
+            )  # Moves the transaction into the past
+
+    def test_rebuild_and_lookup(self):
+        self.assertEqual(rebuild_snapshots(), 3)  # One snapshot per active day
+        self.assertEqual(balance_as_of(self.account, self.day - relativedelta(days=1)), Decimal('0'))
+        self.assertEqual(balance_as_of(self.account, self.day), Decimal('1050'))  # Last transaction of the day wins
+        self.assertEqual(balance_as_of(self.account, self.day + relativedelta(days=1)), Decimal('1050'))  # Quiet day
+        self.assertEqual(balance_as_of(self.account, self.day + relativedelta(days=2)), Decimal('1300'))
+        account = balances_as_of(self.day + relativedelta(days=2)).get(pk=self.account.pk)
+        self.assertEqual(account.balance_as_of, Decimal('1300'))
+
+    def test_rebuild_window_replaces_only_that_window(self):
+        rebuild_snapshots()
+        Transaction.objects.filter(balance_after_transaction=1250).update(balance_after_transaction=1200)
+        rebuild_snapshots(start_date=self.day + relativedelta(days=3))  # Incremental refresh of the last day
+        self.assertEqual(DailyBalanceSnapshot.objects.count(), 3)
+        self.assertEqual(balance_as_of(self.account, self.day + relativedelta(days=3)), Decimal('1200'))
+
+    def test_backfill_command(self):
+        out = StringIO()
+        call_command('backfill_balance_snapshots', stdout=out)
+        self.assertIn('Wrote 3 snapshots', out.getvalue())
+
+    def test_report_opening_and_closing_balances(self):
+        rebuild_snapshots()
+        self.client.login(email='testuser@example.com', password='testpass')  # Logs in as the test user
+        first = self.day + relativedelta(days=1)
+        last = self.day + relativedelta(days=2)
+        response = self.client.get(reverse('transactions:transaction_report'), {
+            'daterange': f'{first.isoformat()} - {last.isoformat()}',
+        })
+        self.assertEqual(response.context['opening_balance'], Decimal('1050'))
+        self.assertEqual(response.context['closing_balance'], Decimal('1300'))
+        self.assertContains(response, 'Opening Balance')
+
+    def test_report_hides_balances_without_backfill(self):
+        self.client.login(email='testuser@example.com', password='testpass')  # Logs in as the test user
+        first = self.day + relativedelta(days=1)
+        response = self.client.get(reverse('transactions:transaction_report'), {
+            'daterange': f'{first.isoformat()} - {first.isoformat()}',
+        })
+        self.assertIsNone(response.context['opening_balance'])  # Unknown rather than 0
+        self.assertIsNone(response.context['closing_balance'])
+        self.assertNotContains(response, 'Opening Balance')
+
+    def test_task_refreshes_only_new_transactions(self):
+        call_command('backfill_balance_snapshots', stdout=StringIO())
+        Transaction.objects.filter(balance_after_transaction=1300).update(balance_after_transaction=1, amount=1)  # Not a new transaction
+        late = Transaction.objects.create(
+            account=self.account, amount=50, transaction_type=DEPOSIT, balance_after_transaction=1350
+        )
+        Transaction.objects.filter(pk=late.pk).update(
+            timestamp=timezone.make_aware(timezone.datetime.combine(self.day + relativedelta(days=5), timezone.datetime.min.time()))
+        )  # Written by an import, past the outbox
+        self.assertEqual(update_balance_snapshots(), 0)  # Left for the next run, in case an older id is uncommitted
+        self.assertEqual(update_balance_snapshots(), 1)  # Only the day of the new transaction
+        self.assertEqual(balance_as_of(self.account, self.day + relativedelta(days=5)), Decimal('1350'))
+        self.assertEqual(balance_as_of(self.account, self.day + relativedelta(days=2)), Decimal('1300'))  # Not rebuilt
+        self.assertEqual(update_balance_snapshots(), 0)  # Nothing new
+
+    def test_task_waits_for_the_backfill(self):
+        self.assertEqual(update_balance_snapshots(), 0)
+        self.assertFalse(DailyBalanceSnapshot.objects.exists())
+
+
+class ImportTransactionsCommandTest(TestCase):  # Defines tests for the bulk ledger import
+    def setUp(self):  # Sets up two empty accounts to import into
+        account_type = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.accounts = [
+            UserBankAccount.objects.create(
+                user=User.objects.create_user(email=f'user{i}@example.com', password='testpass'),
+                account_type=account_type,
+                account_no=1000 + i
+            )
+            for i in range(2)
+        ]  # Two accounts with a zero balance
+
+    def import_file(self, content, suffix, **options):
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False) as f:
+            f.write(content)
+        self.addCleanup(os.remove, f.name)
+        out, err = StringIO(), StringIO()
+        call_command('import_transactions', f.name, stdout=out, stderr=err, **options)
+        return out.getvalue(), err.getvalue()
+
+    def test_csv_import_recomputes_balances(self):
+        out, err = self.import_file(
+            'account_no,timestamp,transaction_type,amount\n'
+            '1000,2015-01-01T10:00:00,Deposit,500\n'
+            '1001,2015-01-01T11:00:00,deposit,100.5\n'
+            '1000,2015-02-01T10:00:00,Withdrawal,200\n'
+            '1000,2015-03-01T10:00:00,3,1.25\n',
+            '.csv', batch_size=2
+        )
+        self.assertIn('Imported 4 transactions, rejected 0', out)
+        self.accounts[0].refresh_from_db()
+        self.assertEqual(self.accounts[0].balance, Decimal('301.25'))  # 500 - 200 + 1.25
+        history = list(self.accounts[0].transactions.values_list('balance_after_transaction', flat=True))
+        self.assertEqual(history, [Decimal('500'), Decimal('300'), Decimal('301.25')])  # Running balance across batches
+        first = self.accounts[0].transactions.first()
+        self.assertEqual(first.timestamp, timezone.make_aware(timezone.datetime(2015, 1, 1, 10)))  # Original timestamp kept
+
+    def test_ndjson_import_rejects_invalid_rows(self):
+        out, err = self.import_file(
+            '{"account_no": 1001, "timestamp": "2015-01-01T10:00:00", "transaction_type": "Deposit", "amount": "50"}\n'
+            '{"account_no": 9999, "timestamp": "2015-01-01T10:00:00", "transaction_type": "Deposit", "amount": "50"}\n'
+            '{"account_no": 1001, "timestamp": "2015-01-02T10:00:00", "transaction_type": "Withdrawal", "amount": "80"}\n'
+            '{"account_no": 1001, "timestamp": "yesterday", "transaction_type": "Deposit", "amount": "50"}\n'
+            'not json\n',
+            '.ndjson'
+        )
+        self.assertIn('Imported 1 transactions, rejected 4', out)
+        self.assertIn('line 2: unknown account 9999', err)
+        self.assertIn('line 3: withdrawal of 80.00 exceeds balance', err)  # No overdrafts
+        self.accounts[1].refresh_from_db()
+        self.assertEqual(self.accounts[1].balance, Decimal('50'))
+
+    def test_rejects_unusable_amounts(self):
+        out, err = self.import_file(
+            'account_no,timestamp,transaction_type,amount\n'
+            '1000,2015-01-01T10:00:00,Deposit,NaN\n'
+            '1000,2015-01-01T10:00:00,Deposit,Infinity\n'
+            '1000,2015-01-01T10:00:00,Deposit,1e20\n'
+            '1000,2015-01-01T10:00:00,Deposit,-5\n'
+            '1000,2015-01-02T10:00:00,Deposit,10\n',
+            '.csv'
+        )
+        self.assertIn('Imported 1 transactions, rejected 4', out)  # The import goes on after bad amounts
+        self.assertIn('line 2: amount must be positive', err)  # NaN
+        self.assertIn('line 3: amount must be positive', err)  # Infinity
+        self.assertIn('line 4: Ensure that there are no more than', err)  # Wider than the column
+        self.assertIn('line 5: amount must be positive', err)
+
+    def test_too_many_errors_abort(self):
+        with self.assertRaises(CommandError):
+            self.import_file('account_no,timestamp,transaction_type,amount\n1000,bad,Deposit,1\n', '.csv', max_errors=0)
+
+    def test_first_deposit_starts_interest(self):
+        self.import_file(
+            'account_no,timestamp,transaction_type,amount\n'
+            '1000,2015-01-10T10:00:00,Deposit,500\n'
+            '1000,2015-03-01T10:00:00,Deposit,10\n',
+            '.csv'
+        )
+        self.accounts[0].refresh_from_db()
+        self.assertEqual(self.accounts[0].initial_deposit_date, timezone.datetime(2015, 1, 10).date())  # Date of the first deposit
+        self.assertEqual(self.accounts[0].interest_start_date, timezone.datetime(2015, 2, 10).date())  # One monthly interval later
+        self.accounts[1].refresh_from_db()
+        self.assertIsNone(self.accounts[1].initial_deposit_date)  # Untouched accounts keep no dates
+
+    def test_rejects_rows_before_latest_transaction(self):
+        self.import_file('account_no,timestamp,transaction_type,amount\n1000,2015-02-01T10:00:00,Deposit,100\n', '.csv')
+        out, err = self.import_file(
+            'account_no,timestamp,transaction_type,amount\n'
+            '1000,2015-01-01T10:00:00,Deposit,50\n'
+            '1000,2015-03-01T10:00:00,Deposit,20\n'
+            '1000,2015-02-15T10:00:00,Withdrawal,10\n',
+            '.csv'
+        )
+        self.assertIn('Imported 1 transactions, rejected 2', out)
+        self.assertIn('line 2: 2015-01-01T10:00:00', err)  # Older than the earlier import
+        self.assertIn('line 4: 2015-02-15T10:00:00', err)  # Older than a row of the same file
+        self.accounts[0].refresh_from_db()
+        self.assertEqual(self.accounts[0].balance, Decimal('120'))
+        history = list(self.accounts[0].transactions.values_list('balance_after_transaction', flat=True))
+        self.assertEqual(history, [Decimal('100'), Decimal('120')])  # Running balances stay in timestamp order
+
+
+class SeedBankCommandTest(TestCase):  # Defines tests for the synthetic data generator
+    def seed(self, **options):
+        options = {'users': 5, 'tx_per_account': 8, 'until': timezone.datetime(2024, 1, 1).date(), 'batch_size': 2, **options}
+        call_command('seed_bank', stdout=StringIO(), **options)
+
+    def history(self):
+        return list(Transaction.objects.order_by('account__user__email', 'timestamp', 'pk').values_list(
+            'account__user__email', 'amount', 'transaction_type', 'timestamp'
+        ))  # Everything generated, independent of primary keys
+
+    def test_seeds_consistent_accounts(self):
+        self.seed()
+        self.assertEqual(User.objects.count(), 5)
+        self.assertEqual(Transaction.objects.count(), 40)  # 5 accounts x 8 transactions
+        self.assertTrue(BankAccountType.objects.count() > 1)  # Accounts are spread over several types
+        for account in UserBankAccount.objects.all():
+            history = list(account.transactions.order_by('timestamp', 'pk'))
+            self.assertEqual(history[0].transaction_type, DEPOSIT)  # Every account opens with a deposit
+            self.assertEqual(history[-1].balance_after_transaction, account.balance)  # Balance matches the history
+            self.assertTrue(all(t.balance_after_transaction >= 0 for t in history))  # No overdrafts
+            self.assertEqual(account.initial_deposit_date, timezone.localdate(history[0].timestamp))
+            self.assertTrue(is_valid_account_number(account.account_no))  # Numbers come from the allocator
+        self.assertTrue(self.client.login(email='user0@example.com', password='password'))  # Shared password hash works
+
+    def test_same_seed_produces_same_data(self):
+        self.seed()
+        first = self.history()
+        Transaction.objects.all().delete()
+        User.objects.all().delete()
+        self.seed(batch_size=5)  # Batch size does not change the data
+        self.assertEqual(self.history(), first)
+
+    def test_refuses_existing_customers(self):
+        self.seed(users=1)
+        with self.assertRaises(CommandError):
+            self.seed(users=1)
+        self.seed(users=1, start=1)  # Continues after an earlier seeding
+        self.assertEqual(User.objects.count(), 2)
+
+
+delivered_events = []  # Events seen by record_consumer
+
+
+def record_consumer(events):  # Outbox consumer used by the tests
+    delivered_events.extend(event.payload['transaction_id'] for event in events)
+
+
+def failing_consumer(events):  # Outbox consumer that is always down
+    raise ConnectionError('Consumer is down')
+
+
+def stuck_consumer(events):  # Outbox consumer that never answers
+    time.sleep(60)
+
+
+def out_of_time_consumer(events):  # Outbox consumer interrupted by the task's soft time limit
+    raise SoftTimeLimitExceeded()
+
+
+@override_settings(OUTBOX_CONSUMERS={TRANSACTION_POSTED: ['transactions.tests.record_consumer']})
+class OutboxRelayTest(TestCase):  # Defines tests for the transactional outbox
+    def setUp(self):  # Sets up an account with a known balance
+        user = User.objects.create_user(email='testuser@example.com', password='testpass')  # Creates a test user
+        account_type = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.account = UserBankAccount.objects.create(
+            user=user, account_type=account_type, balance=1000.00, account_no='1234567890'
+        )  # Creates a bank account for the user
+        delivered_events.clear()
+
+    def test_posting_writes_an_event(self):
+        transaction_obj = post_transaction(self.account, Decimal('100.00'), DEPOSIT)
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.topic, TRANSACTION_POSTED)
+        self.assertEqual(event.payload['transaction_id'], transaction_obj.pk)
+        self.assertEqual(event.payload['balance'], '1100.00')
+        self.assertIsNone(event.processed_at)  # Nothing is delivered inside the request
+        with self.assertRaises(InsufficientFunds):
+            post_transaction(self.account, Decimal('5000.00'), WITHDRAWAL)
+        self.assertEqual(OutboxEvent.objects.count(), 1)  # A rejected posting leaves no event
+
+    def test_relay_delivers_in_batches(self):
+        postings = [post_transaction(self.account, Decimal('10.00'), DEPOSIT) for _ in range(5)]
+        summary = relay(batch_size=2)
+        self.assertEqual(summary, {'batches': 3, 'delivered': 5, 'failed': 0})
+        self.assertEqual(delivered_events, [t.pk for t in postings])  # In posting order
+        self.assertFalse(OutboxEvent.objects.filter(processed_at__isnull=True).exists())
+        self.assertEqual(relay()['delivered'], 0)  # Delivered once only
+
+    @override_settings(OUTBOX_CONSUMERS={TRANSACTION_POSTED: ['transactions.tests.failing_consumer']}, OUTBOX_MAX_ATTEMPTS=2)
+    def test_failing_consumer_is_retried_with_backoff(self):
+        post_transaction(self.account, Decimal('10.00'), DEPOSIT)
+        with self.assertLogs('transactions.outbox', 'ERROR'):
+            self.assertEqual(relay(), {'batches': 1, 'delivered': 0, 'failed': 1})
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.attempts, 1)
+        self.assertIn('Consumer is down', event.last_error)
+        self.assertGreater(event.locked_until, timezone.now())  # Backing off
+        self.assertEqual(relay()['failed'], 0)  # Not retried before the backoff ends
+        OutboxEvent.objects.update(locked_until=None)
+        with self.assertLogs('transactions.outbox', 'ERROR') as logs:
+            relay()
+        self.assertIn('gave up after 2 attempts', logs.output[-1])
+        OutboxEvent.objects.update(locked_until=None)
+        self.assertEqual(relay()['failed'], 0)  # Left for inspection
+        self.assertEqual(post_transaction(self.account, Decimal('10.00'), DEPOSIT).amount, Decimal('10.00'))  # Postings go on
+
+    @override_settings(OUTBOX_CONSUMERS={TRANSACTION_POSTED: ['transactions.tests.stuck_consumer']}, OUTBOX_CONSUMER_TIMEOUT=0.1)
+    def test_stuck_consumer_times_out(self):
+        post_transaction(self.account, Decimal('10.00'), DEPOSIT)
+        started = time.monotonic()
+        with self.assertLogs('transactions.outbox', 'ERROR'):
+            self.assertEqual(relay(), {'batches': 1, 'delivered': 0, 'failed': 1})
+        self.assertLess(time.monotonic() - started, 10)  # Interrupted, not waited for
+        self.assertIn('ConsumerTimeout', OutboxEvent.objects.get().last_error)
+        self.assertEqual(post_transaction(self.account, Decimal('10.00'), DEPOSIT).amount, Decimal('10.00'))
+
+    @override_settings(OUTBOX_CONSUMERS={TRANSACTION_POSTED: ['transactions.tests.out_of_time_consumer']})
+    def test_soft_time_limit_stops_the_relay(self):
+        post_transaction(self.account, Decimal('10.00'), DEPOSIT)
+        with self.assertRaises(SoftTimeLimitExceeded):
+            relay()
+        event = OutboxEvent.objects.get()
+        self.assertEqual(event.last_error, '')  # Not counted as a failing consumer
+        self.assertGreater(event.locked_until, timezone.now())  # Left to the lease
+
+    def test_relay_task_has_time_limits(self):
+        self.assertEqual(relay_outbox.soft_time_limit, settings.OUTBOX_RELAY_SOFT_TIME_LIMIT)
+        self.assertEqual(relay_outbox.time_limit, settings.OUTBOX_RELAY_TIME_LIMIT)
+        self.assertLess(settings.OUTBOX_CONSUMER_TIMEOUT, settings.OUTBOX_LEASE_SECONDS)  # A stuck batch costs one lease at most
+
+    @override_settings(OUTBOX_CONSUMERS={TRANSACTION_POSTED: ['transactions.snapshots.refresh_posted_snapshots']})
+    def test_snapshots_are_refreshed_from_the_outbox(self):
+        post_transaction(self.account, Decimal('100.00'), DEPOSIT)
+        self.assertFalse(DailyBalanceSnapshot.objects.exists())
+        relay_outbox()
+        snapshot = DailyBalanceSnapshot.objects.get()
+        self.assertEqual(snapshot.date, timezone.localdate())
+        self.assertEqual(snapshot.balance, Decimal('1100.00'))
+
+    def test_task_purges_old_events(self):
+        post_transaction(self.account, Decimal('10.00'), DEPOSIT)
+        relay()
+        OutboxEvent.objects.update(processed_at=timezone.now() - relativedelta(days=settings.OUTBOX_RETENTION_DAYS + 1))
+        self.assertEqual(relay_outbox()['purged'], 1)
+        self.assertFalse(OutboxEvent.objects.exists())
+
+
+@override_settings(ROOT_URLCONF='banking_system.asgi_urls')  # Serves the async views, as under ASGI
+class AsyncTransactionViewsTest(TestCase):  # Defines tests for the async transaction views
+    def setUp(self):  # Sets up an account and logs the async client in
+        user = User.objects.create_user(email='testuser@example.com', password='testpass')  # Creates a test user
+        account_type = BankAccountType.objects.create(
+            name='Saving', maximum_withdrawal_amount=5000, annual_interest_rate=5.0, interest_calculation_per_year=12
+        )  # Creates a "Saving" account type with specific limits
+        self.account = UserBankAccount.objects.create(
+            user=user, account_type=account_type, balance=1000.00, account_no='1234567890'
+        )  # Creates a bank account for the user
+        self.async_client.login(email='testuser@example.com', password='testpass')  # Logs in as the test user
+
+    def post(self, name, data):  # Django 3.2's AsyncClient reads multipart bodies wrongly, send the form urlencoded
+        return self.async_client.post(
+            reverse(name), urlencode(data), content_type='application/x-www-form-urlencoded'
+        )
+
+    async def test_deposit(self):
+        response = await self.async_client.get(reverse('transactions:deposit_money'))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Deposit Money to Your Account')
+        response = await self.post('transactions:deposit_money', {
+            'amount': 200, 'transaction_type': DEPOSIT,
+        })
+        self.assertRedirects(response, reverse('transactions:transaction_report'), fetch_redirect_response=False)
+
+    async def test_withdraw(self):
+        response = await self.post('transactions:withdraw_money', {
+            'amount': 5000, 'transaction_type': WITHDRAWAL,
+        })  # More than the balance
+        self.assertEqual(response.status_code, 200)  # The form is shown again with the error
+        self.assertContains(response, 'You can not withdraw more than your account balance')
+        response = await self.post('transactions:withdraw_money', {
+            'amount': 100, 'transaction_type': WITHDRAWAL,
+        })
+        self.assertEqual(response.status_code, 302)
+
+    async def test_report(self):
+        response = await self.async_client.get(reverse('transactions:transaction_report'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('db;dur=', response['Server-Timing'])  # Queries run in worker threads are counted too
+
+    async def test_login_required(self):
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('transactions:deposit_money'))
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(settings.LOGIN_URL, response['Location'])
+
+    def test_balances_after_async_postings(self):
+        async_to_sync(self.post)('transactions:deposit_money', {'amount': 200, 'transaction_type': DEPOSIT})
+        async_to_sync(self.post)('transactions:withdraw_money', {'amount': 50, 'transaction_type': WITHDRAWAL})
+        self.account.refresh_from_db()
+        self.assertEqual(self.account.balance, Decimal('1150.00'))
+        self.assertEqual(self.account.transactions.count(), 2)
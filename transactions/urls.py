@@ -1,6 +1,11 @@
 from django.urls import path
 
-from .views import DepositMoneyView, WithdrawMoneyView, TransactionRepostView
+from .views import (
+    DepositMoneyView,
+    TransactionExportView,
+    TransactionRepostView,
+    WithdrawMoneyView,
+)
 
 
 app_name = 'transactions'
@@ -8,6 +13,7 @@ app_name = 'transactions'
 
 urlpatterns = [
     path("deposit/", DepositMoneyView.as_view(), name="deposit_money"),
+    path("export/", TransactionExportView.as_view(), name="transaction_export"),
     path("report/", TransactionRepostView.as_view(), name="transaction_report"),
     path("withdraw/", WithdrawMoneyView.as_view(), name="withdraw_money"),
 ]
@@ -1,29 +1,49 @@
-from dateutil.relativedelta import relativedelta
+import csv
+import datetime
+import json
 
+from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import (
+    Http404,
+    HttpResponseBadRequest,
+    HttpResponseRedirect,
+    StreamingHttpResponse,
+)
 from django.urls import reverse_lazy
 from django.utils import timezone
+from django.views import View
 from django.views.generic import CreateView, ListView
 
-from transactions.constants import DEPOSIT, WITHDRAWAL
+from transactions.constants import (
+    DEPOSIT,
+    TRANSACTION_TYPE_CHOICES,
+    WITHDRAWAL,
+)
 from transactions.forms import (
     DepositForm,
     TransactionDateRangeForm,
     WithdrawForm,
 )
 from transactions.models import Transaction
+from transactions.pagination import keyset_page
+from transactions.services import InsufficientFunds, post_transaction
+from transactions.snapshots import balance_as_of
+
+
+TRANSACTION_TYPES = dict(TRANSACTION_TYPE_CHOICES)
 
 
 class TransactionRepostView(LoginRequiredMixin, ListView):
     template_name = 'transactions/transaction_report.html'
     model = Transaction
-    form_data = {}
+    timestamp_range = None
 
     def get(self, request, *args, **kwargs):
         form = TransactionDateRangeForm(request.GET or None)
         if form.is_valid():
-            self.form_data = form.cleaned_data
+            self.timestamp_range = form.get_timestamp_range()
 
         return super().get(request, *args, **kwargs)
 
@@ -32,27 +52,151 @@ class TransactionRepostView(LoginRequiredMixin, ListView):
             account=self.request.user.account
         )
 
-        daterange = self.form_data.get("daterange")
+        if self.timestamp_range:
+            start, end = self.timestamp_range
+            queryset = queryset.filter(timestamp__gte=start, timestamp__lt=end)
 
-        if daterange:
-            queryset = queryset.filter(timestamp__date__range=daterange)
-
-        return queryset.distinct()
+        return queryset
 
     def get_context_data(self, **kwargs):
+        try:
+            page, next_cursor = keyset_page(
+                self.object_list,
+                self.request.GET.get('cursor'),
+                settings.TRANSACTION_REPORT_PAGE_SIZE
+            )
+        except ValueError:
+            raise Http404('Invalid cursor')
+
+        next_query = None
+        if next_cursor:
+            query = self.request.GET.copy()
+            query['cursor'] = next_cursor
+            next_query = query.urlencode()
+
+        kwargs['object_list'] = page
         context = super().get_context_data(**kwargs)
         context.update({
             'account': self.request.user.account,
-            'form': TransactionDateRangeForm(self.request.GET or None)
+            'form': TransactionDateRangeForm(self.request.GET or None),
+            'next_query': next_query,
         })
+        context.update(self.get_range_balances())
 
         return context
 
+    def get_range_balances(self):
+        """
+        Opening and closing balance of the selected date range, read
+        from the daily balance snapshots.
+        """
+        if not self.timestamp_range:
+            return {}
+
+        account = self.request.user.account
+        start, end = self.timestamp_range
+        last_day = (end - datetime.timedelta(days=1)).date()
+
+        if last_day >= timezone.localdate():
+            # Today's snapshot may not be refreshed yet.
+            closing_balance = account.balance
+        else:
+            closing_balance = balance_as_of(account, last_day)
+
+        return {
+            'opening_balance': balance_as_of(
+                account, start.date() - datetime.timedelta(days=1)
+            ),
+            'closing_balance': closing_balance,
+        }
+
+
+class Echo:
+    """
+    File-like object whose ``write`` just returns the value, so
+    ``csv.writer`` can produce lines for a streaming response.
+    """
+
+    def write(self, value):
+        return value
+
+
+class TransactionExportView(LoginRequiredMixin, View):
+    """
+    Stream the account's transactions as CSV or NDJSON.
+
+    Rows are read through a server-side cursor in
+    ``TRANSACTION_EXPORT_CHUNK_SIZE`` batches, so memory use does not
+    grow with the length of the history.
+    """
+    fields = (
+        'timestamp',
+        'transaction_type',
+        'amount',
+        'balance_after_transaction',
+    )
+    content_types = {
+        'csv': 'text/csv',
+        'ndjson': 'application/x-ndjson',
+    }
+
+    def get(self, request, *args, **kwargs):
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in self.content_types:
+            return HttpResponseBadRequest('Unsupported export format')
+
+        queryset = Transaction.objects.filter(
+            account=request.user.account
+        ).order_by('timestamp', 'pk')
+
+        form = TransactionDateRangeForm(request.GET or None)
+        if form.is_valid():
+            start, end = form.get_timestamp_range()
+            queryset = queryset.filter(timestamp__gte=start, timestamp__lt=end)
+
+        # The rows are read after the view returns; bind the database
+        # the router picks for this request now.
+        queryset = queryset.using(queryset.db)
+        rows = queryset.values_list(*self.fields).iterator(
+            chunk_size=settings.TRANSACTION_EXPORT_CHUNK_SIZE
+        )
+        stream = getattr(self, f'stream_{export_format}')(rows)
+
+        response = StreamingHttpResponse(
+            stream, content_type=self.content_types[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="statement-{request.user.account}.'
+            f'{export_format}"'
+        )
+        return response
+
+    def stream_csv(self, rows):
+        writer = csv.writer(Echo())
+        yield writer.writerow(self.fields)
+        for timestamp, transaction_type, amount, balance in rows:
+            yield writer.writerow((
+                timestamp.isoformat(),
+                TRANSACTION_TYPES[transaction_type],
+                amount,
+                balance,
+            ))
+
+    def stream_ndjson(self, rows):
+        for timestamp, transaction_type, amount, balance in rows:
+            yield json.dumps({
+                'timestamp': timestamp.isoformat(),
+                'transaction_type': TRANSACTION_TYPES[transaction_type],
+                'amount': str(amount),
+                'balance_after_transaction': str(balance),
+            }) + '\n'
+
 
 class TransactionCreateMixin(LoginRequiredMixin, CreateView):
     template_name = 'transactions/transaction_form.html'
     model = Transaction
     title = ''
+    success_message = ''
     success_url = reverse_lazy('transactions:transaction_report')
 
     def get_form_kwargs(self):
@@ -70,65 +214,42 @@ class TransactionCreateMixin(LoginRequiredMixin, CreateView):
 
         return context
 
-
-class DepositMoneyView(TransactionCreateMixin):
-    form_class = DepositForm
-    title = 'Deposit Money to Your Account'
-
-    def get_initial(self):
-        initial = {'transaction_type': DEPOSIT}
-        return initial
-
     def form_valid(self, form):
         amount = form.cleaned_data.get('amount')
-        account = self.request.user.account
 
-        if not account.initial_deposit_date:
-            now = timezone.now()
-            next_interest_month = int(
-                12 / account.account_type.interest_calculation_per_year
-            )
-            account.initial_deposit_date = now
-            account.interest_start_date = (
-                now + relativedelta(
-                    months=+next_interest_month
-                )
+        try:
+            self.object = post_transaction(
+                account=self.request.user.account,
+                amount=amount,
+                transaction_type=form.cleaned_data.get('transaction_type')
             )
-
-        account.balance += amount
-        account.save(
-            update_fields=[
-                'initial_deposit_date',
-                'balance',
-                'interest_start_date'
-            ]
-        )
+        except InsufficientFunds as e:
+            form.add_error('amount', str(e))
+            return self.form_invalid(form)
 
         messages.success(
             self.request,
-            f'{amount}$ was deposited to your account successfully'
+            self.success_message.format(amount=amount)
         )
 
-        return super().form_valid(form)
+        return HttpResponseRedirect(self.get_success_url())
+
+
+class DepositMoneyView(TransactionCreateMixin):
+    form_class = DepositForm
+    title = 'Deposit Money to Your Account'
+    success_message = '{amount}$ was deposited to your account successfully'
+
+    def get_initial(self):
+        initial = {'transaction_type': DEPOSIT}
+        return initial
 
 
 class WithdrawMoneyView(TransactionCreateMixin):
     form_class = WithdrawForm
     title = 'Withdraw Money from Your Account'
+    success_message = 'Successfully withdrawn {amount}$ from your account'
 
     def get_initial(self):
         initial = {'transaction_type': WITHDRAWAL}
         return initial
-
-    def form_valid(self, form):
-        amount = form.cleaned_data.get('amount')
-
-        self.request.user.account.balance -= form.cleaned_data.get('amount')
-        self.request.user.account.save(update_fields=['balance'])
-
-        messages.success(
-            self.request,
-            f'Successfully withdrawn {amount}$ from your account'
-        )
-
-        return super().form_valid(form)